@@ -0,0 +1,30 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import os
+
+from lambdalib.interface import sim_trace
+
+
+def pytest_addoption(parser):
+    group = parser.getgroup("lambdalib")
+    group.addoption("--vcd", action="store_true", default=False,
+                    help="Write VCD waveforms for simulation tests")
+    group.addoption("--vcd-compress", action="store_true", default=False,
+                    help="Write gzip compressed VCD waveforms")
+    group.addoption("--vcd-window", type=str, default=None,
+                    help="Restrict selective traces to a cycle window 'start:stop'")
+    group.addoption("--vcd-last", type=int, default=None,
+                    help="Only keep the last N cycles of selective traces")
+
+
+def pytest_configure(config):
+    # Options are forwarded through the environment so that testbenches
+    # calling `trace_vcd` pick them up without any fixture plumbing.
+    if config.getoption("vcd"):
+        os.environ[sim_trace.ENV_ENABLE] = "1"
+    if config.getoption("vcd_compress"):
+        os.environ[sim_trace.ENV_COMPRESS] = "1"
+    if config.getoption("vcd_window"):
+        os.environ[sim_trace.ENV_WINDOW] = config.getoption("vcd_window")
+    if config.getoption("vcd_last"):
+        os.environ[sim_trace.ENV_LAST] = str(config.getoption("vcd_last"))
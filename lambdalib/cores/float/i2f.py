@@ -78,6 +78,7 @@ class Int2Float(Elaboratable):
 
 from amaranth.sim import *
 from ...interface.stream_sim import *
+from ...interface.sim_trace import *
 
 
 def test_i2f():
@@ -103,7 +104,7 @@ def test_i2f():
     sim.add_clock(1e-6)
     sim.add_sync_process(tx.sync_process)
     sim.add_sync_process(rx.sync_process)
-    with sim.write_vcd("tests/test_i2f.vcd"):
+    with trace_vcd(sim, "tests/test_i2f.vcd"):
         sim.run()
 
 
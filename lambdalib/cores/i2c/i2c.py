@@ -8,12 +8,85 @@
 # Based on I2C code from Glasgow
 # I2C reference: https://www.nxp.com/docs/en/user-guide/UM10204.pdf
 
-from amaranth import Elaboratable, Module, Signal, Cat, C
+from math import ceil
+
+from amaranth import Elaboratable, Module, Signal, Cat, C, Mux
 from amaranth.lib.cdc import FFSynchronizer
 from amaranth.hdl.rec import Record, DIR_FANIN, DIR_FANOUT
 
 
-__all__ = ["I2CBus", "I2CInitiator"]
+__all__ = ["I2CBus", "I2CInitiator", "I2C_MODES", "I2C_PERIOD_WIDTH", "i2c_timing"]
+
+
+# SCL frequency, minimum SCL low and high times, from UM10204 tables 10 and 11
+I2C_MODES = {
+    "standard":   (100e3, 4.7e-6,  4.0e-6),
+    "fast":       (400e3, 1.3e-6,  0.6e-6),
+    "fast-plus":  (1e6,   0.5e-6,  0.26e-6),
+    "high-speed": (3.4e6, 160e-9,  60e-9),
+}
+
+
+def _mode_cycles(sys_clk_freq, mode):
+    freq, t_low, t_high = I2C_MODES[mode]
+    period_cyc = ceil(sys_clk_freq / freq)
+    low_cyc = ceil(t_low * sys_clk_freq)
+    high_cyc = max(period_cyc - low_cyc, ceil(t_high * sys_clk_freq))
+    if low_cyc + high_cyc < 4:
+        raise ValueError(f"System clock of {sys_clk_freq} Hz too slow for {mode} mode")
+    return low_cyc + high_cyc, low_cyc
+
+
+def i2c_timing(sys_clk_freq, mode="fast"):
+    """ I2CInitiator timing parameters of an I2C bus mode.
+
+    The SCL low and high times are the minimum ones of the mode, the
+    remaining time of the bus period is given to the high time.
+    Hs-mode also returns the Fast-mode timing used to send the master code.
+
+    :param sys_clk_freq:
+        System clock frequency, in Hz.
+    :param mode:
+        One of ``I2C_MODES``: "standard", "fast", "fast-plus" or "high-speed".
+
+    :returns:
+        A dict of ``period_cyc``, ``low_cyc``, ``hs_period_cyc`` and ``hs_low_cyc``
+        keyword arguments for I2CInitiator, or the wrappers around it.
+    """
+    if mode not in I2C_MODES:
+        raise ValueError(f"Unknown I2C mode {mode!r}, expected one of {list(I2C_MODES)}")
+
+    if mode == "high-speed":
+        period_cyc, low_cyc = _mode_cycles(sys_clk_freq, "fast")
+        hs_period_cyc, hs_low_cyc = _mode_cycles(sys_clk_freq, mode)
+        return dict(period_cyc=period_cyc, low_cyc=low_cyc,
+                    hs_period_cyc=hs_period_cyc, hs_low_cyc=hs_low_cyc)
+
+    period_cyc, low_cyc = _mode_cycles(sys_clk_freq, mode)
+    return dict(period_cyc=period_cyc, low_cyc=low_cyc)
+
+
+# Width of the run time period and low time registers
+I2C_PERIOD_WIDTH = 16
+
+
+def _phase_limits(period_cyc, low_cyc):
+    """ Timer limits of the SCL low and high phases, each lasting half of
+    the SCL low or high time. """
+    if low_cyc is None:
+        return period_cyc // 4, period_cyc // 4
+    if not 0 < low_cyc < period_cyc:
+        raise ValueError(f"low_cyc must be in [1, {period_cyc - 1}], got {low_cyc}")
+    return (low_cyc + 1) // 2 - 1, (period_cyc - low_cyc + 1) // 2 - 1
+
+
+def _timing_reset(period_cyc, low_cyc):
+    """ Reset values of the run time bus period and SCL low time, with the
+    same phases as the fixed timing of ``_phase_limits``. """
+    if low_cyc is not None:
+        return period_cyc, low_cyc
+    low_phase, high_phase = _phase_limits(period_cyc, None)
+    return 2 * (low_phase + high_phase + 1), 2 * low_phase + 1
 
 
 class I2CBus(Record):
@@ -91,6 +164,16 @@ class I2CInitiator(Elaboratable):
     Generates start and stop conditions, and transmits and receives octets.
     Clock stretching is supported.
 
+    The SCL low and high times are equal unless ``low_cyc`` is given, see
+    ``i2c_timing`` for the timing of the standard bus modes. The high time
+    only starts once SCL is seen high, so it is extended by the rise time,
+    the SCL synchronization latency and devices stretching the clock.
+
+    Hs-mode is enabled by ``hs_period_cyc``: each transfer from an idle bus
+    starts with the master code, sent with the ``period_cyc`` timing and
+    not acknowledged, then a repeated start switches to the Hs timing until
+    the next stop.
+
     :param period_cyc:
         Bus clock period, as a multiple of system clock period.
     :type period_cyc: int
@@ -98,6 +181,23 @@ class I2CInitiator(Elaboratable):
         If true, SCL will be monitored for devices stretching the clock. Otherwise,
         only internally generated SCL is considered.
     :type clk_stretch: bool
+    :param low_cyc:
+        SCL low time, as a multiple of system clock period. The high time is the
+        rest of ``period_cyc``.
+    :type low_cyc: int
+    :param hs_period_cyc:
+        Hs-mode bus clock period, as a multiple of system clock period.
+    :type hs_period_cyc: int
+    :param hs_low_cyc:
+        Hs-mode SCL low time, as a multiple of system clock period.
+    :type hs_low_cyc: int
+    :param master_code:
+        Hs-mode master code, ``0000 1XXX`` with ``XXX`` the 3 bit master code.
+    :type master_code: int
+    :param programmable:
+        If true, the bus period and SCL low time are given at run time by ``period``
+        and ``low``, reset to the timing given by ``period_cyc`` and ``low_cyc``.
+    :type programmable: bool
 
     :attr busy:
         Busy flag. Low if the state machine is idle, high otherwise.
@@ -124,11 +224,42 @@ class I2CInitiator(Elaboratable):
         Received data octet.
     :attr ack_i:
         Acknowledge bit to be transmitted. Latched immediately after ``read`` is asserted.
+    :attr hs:
+        High when the bus runs with the Hs-mode timing.
+    :attr period:
+        Bus clock period, as a multiple of system clock period, with ``programmable``.
+        Latched while ``busy`` is low, along with ``low``.
+    :attr low:
+        SCL low time, as a multiple of system clock period, with ``programmable``.
+        Must be in ``[1, period - 1]``.
     """
-    def __init__(self, pads, period_cyc, clk_stretch=True):
+    def __init__(self, pads, period_cyc, clk_stretch=True, low_cyc=None,
+                 hs_period_cyc=None, hs_low_cyc=None, master_code=0,
+                 programmable=False):
         self.bus         = I2CBusDriver(pads)
         self.period_cyc  = int(period_cyc)
         self.clk_stretch = clk_stretch
+        self.low_cyc     = low_cyc
+        self.hs_period_cyc = hs_period_cyc
+        self.hs_low_cyc  = hs_low_cyc
+        self.master_code = master_code
+
+        self._phases = _phase_limits(self.period_cyc, low_cyc)
+        self._hs_phases = None
+        if hs_period_cyc is not None:
+            if not 0 <= master_code < 8:
+                raise ValueError(f"master_code must be in [0, 7], got {master_code}")
+            self._hs_phases = _phase_limits(int(hs_period_cyc), hs_low_cyc)
+
+        self.period = None
+        self.low    = None
+        if programmable:
+            period_reset, low_reset = _timing_reset(self.period_cyc, low_cyc)
+            if period_reset >= 2**I2C_PERIOD_WIDTH:
+                raise ValueError(f"period_cyc must be less than {2**I2C_PERIOD_WIDTH}, "
+                                 f"got {self.period_cyc}")
+            self.period = Signal(I2C_PERIOD_WIDTH, reset=period_reset)
+            self.low    = Signal(I2C_PERIOD_WIDTH, reset=low_reset)
 
         self.busy   = Signal(reset=1)
         self.start  = Signal()
@@ -139,26 +270,53 @@ class I2CInitiator(Elaboratable):
         self.write  = Signal()
         self.data_o = Signal(8)
         self.ack_i  = Signal()
+        self.hs     = Signal()
 
     def elaborate(self, platform):
         m = Module()
 
         m.submodules.bus = bus = self.bus
 
-        timer = Signal(range(self.period_cyc))
+        # Each step of the state machine lasts one phase, half of the
+        # SCL low or high time, depending on the current SCL level.
+        low_phase, high_phase = self._phases
+        phases = [low_phase, high_phase]
+        if self.period is not None:
+            # Run time timing, updated between operations
+            phases.append(2**I2C_PERIOD_WIDTH - 1)
+            low_phase  = Signal(I2C_PERIOD_WIDTH, reset=low_phase)
+            high_phase = Signal(I2C_PERIOD_WIDTH, reset=high_phase)
+            with m.If(~self.busy):
+                m.d.sync += [
+                    low_phase .eq((self.low - 1) >> 1),
+                    high_phase.eq((self.period - self.low - 1) >> 1),
+                ]
+        if self._hs_phases is not None:
+            hs_low_phase, hs_high_phase = self._hs_phases
+            phases += [hs_low_phase, hs_high_phase]
+            low_phase = Mux(self.hs, hs_low_phase, low_phase)
+            high_phase = Mux(self.hs, hs_high_phase, high_phase)
+
+        timer = Signal(range(max(phases) + 1))
+        limit = Signal.like(timer)
         stb   = Signal()
 
-        with m.If((timer == 0) | ~self.busy):
-            m.d.sync += timer.eq(self.period_cyc // 4)
-        with m.Elif((not self.clk_stretch) | (bus.scl_o == bus.scl_i)):
-            m.d.sync += timer.eq(timer - 1)
+        m.d.comb += limit.eq(Mux(bus.scl_o, high_phase, low_phase))
+
+        # Only a released SCL can be held by another device: the low phases
+        # do not wait for the SCL synchronization.
+        with m.If(stb | ~self.busy):
+            m.d.sync += timer.eq(0)
+        with m.Elif((not self.clk_stretch) | ~(bus.scl_o & ~bus.scl_i)):
+            m.d.sync += timer.eq(timer + 1)
 
-        m.d.comb += stb.eq(timer == 0)
+        m.d.comb += stb.eq(timer >= limit)
 
         bitno   = Signal(range(8))
         r_shreg = Signal(8)
         w_shreg = Signal(8)
         r_ack   = Signal()
+        hs_code = Signal()
 
         with m.FSM() as fsm:
             self._fsm = fsm
@@ -190,6 +348,13 @@ class I2CInitiator(Elaboratable):
             with m.State("IDLE"):
                 m.d.sync += self.busy.eq(1)
                 with m.If(self.start):
+                    if self._hs_phases is not None:
+                        # Send the master code first
+                        with m.If(~self.hs):
+                            m.d.sync += [
+                                hs_code.eq(1),
+                                w_shreg.eq(0b00001000 | self.master_code),
+                            ]
                     with m.If(bus.scl_i & bus.sda_i):
                         m.next = "START-SDA-L"
                     with m.Elif(~bus.scl_i):
@@ -218,9 +383,13 @@ class I2CInitiator(Elaboratable):
                 self.bus.sda_o.eq(1)
             )
             scl_h("START-SCL-H", "START-SDA-L")
-            stb_x("START-SDA-L", "IDLE",
-                self.bus.sda_o.eq(0)
-            )
+            with m.State("START-SDA-L"):
+                with m.If(stb):
+                    m.d.sync += self.bus.sda_o.eq(0)
+                    with m.If(hs_code):
+                        m.next = "WRITE-DATA-SCL-L"
+                    with m.Else():
+                        m.next = "IDLE"
             # stop
             scl_l("STOP-SCL-L",  "STOP-SDA-L")
             stb_x("STOP-SDA-L",  "STOP-SCL-H",
@@ -228,7 +397,8 @@ class I2CInitiator(Elaboratable):
             )
             scl_h("STOP-SCL-H",  "STOP-SDA-H")
             stb_x("STOP-SDA-H",  "IDLE",
-                self.bus.sda_o.eq(1)
+                self.bus.sda_o.eq(1),
+                self.hs.eq(0)
             )
             # write data
             scl_l("WRITE-DATA-SCL-L", "WRITE-DATA-SDA-X")
@@ -250,7 +420,18 @@ class I2CInitiator(Elaboratable):
             scl_h("WRITE-ACK-SCL-H", "WRITE-ACK-SDA-N",
                 self.ack_o.eq(~self.bus.sda_i)
             )
-            stb_x("WRITE-ACK-SDA-N", "IDLE")
+            with m.State("WRITE-ACK-SDA-N"):
+                with m.If(stb):
+                    # The master code is not acknowledged, switch
+                    # to Hs-mode with a repeated start.
+                    with m.If(hs_code):
+                        m.d.sync += [
+                            hs_code.eq(0),
+                            self.hs.eq(1),
+                        ]
+                        m.next = "START-SCL-L"
+                    with m.Else():
+                        m.next = "IDLE"
             # read data
             scl_l("READ-DATA-SCL-L", "READ-DATA-SDA-H")
             stb_x("READ-DATA-SDA-H", "READ-DATA-SCL-H",
@@ -4,23 +4,26 @@ from amaranth import *
 
 from ...interface import stream
 from .stream import *
+from .i2c import i2c_timing
 from ..mem.stream import *
 
 
 class I2CRegisterInit(Elaboratable):
     """Sends an init sequence to an I2C device. I2C writer
     can be exposed for further usage (eg. readjusting 
-    parameters after init)."""
+    parameters after init). The bus runs at `i2c_freq`, or
+    with the timing of `i2c_mode` when given, see `i2c_timing`."""
     def __init__(self,
                  sys_clk_freq, i2c_addr, regs_data,
                  i2c_freq=400e3, i2c_pins=None,
-                 expose_writer=False):
+                 expose_writer=False, i2c_mode=None):
 
         self.sys_clk_freq = sys_clk_freq
         self.i2c_addr = i2c_addr
         self.regs_data = regs_data
         self.i2c_freq = i2c_freq
         self.i2c_pins = i2c_pins
+        self.i2c_mode = i2c_mode
         self.done = Signal()  # Asserted when init sequence has been sent
 
         if expose_writer:
@@ -44,8 +47,11 @@ class I2CRegisterInit(Elaboratable):
         mem_data = self.regs_data_to_mem(self.regs_data)
         m.submodules.mem = mem = MemoryStreamReader(8, mem_data)
 
-        i2c_period = (self.sys_clk_freq // self.i2c_freq)
-        m.submodules.writer = writer = I2CWriterStream(self.i2c_pins, i2c_period)
+        if self.i2c_mode is not None:
+            timing = i2c_timing(self.sys_clk_freq, self.i2c_mode)
+        else:
+            timing = dict(period_cyc=self.sys_clk_freq // self.i2c_freq)
+        m.submodules.writer = writer = I2CWriterStream(self.i2c_pins, **timing)
 
         with m.If(mem.source.valid & mem.source.ready & mem.source.last):
             m.d.sync += self.done.eq(1)
@@ -4,6 +4,7 @@ from amaranth import *
 
 from ...interface import stream
 from .stream import *
+from .i2c import I2C_PERIOD_WIDTH, i2c_timing
 
 
 __all__ = [
@@ -14,6 +15,10 @@ __all__ = [
 STATUS_OK   = 0
 STATUS_ERR  = 1
 
+# Reads from the reserved addresses of the Hs-mode master codes
+HEADER_CONFIG       = (0x04 << 1) | 1
+HEADER_WRITE_READ   = (0x05 << 1) | 1
+
 class I2CProto(Elaboratable):
     """ Protocol oriented wrapper around the bidirectional I2CStream.
 
@@ -47,15 +52,53 @@ class I2CProto(Elaboratable):
         <- `source.data` ... `source.data`
             data read    ...  data read
 
+    When writing then reading, e.g. a register address then its values,
+    with a repeated start in between and a single status:
+        -> `sink.data`
+            HEADER_WRITE_READ
+        -> `sink.data`
+            header, write
+        -> `sink.data`
+            write length
+        -> `sink.data`
+            read length, at least 1
+        -> `sink.data` ... `sink.data`
+            data write ...  data write
+        <- `source.data`
+            status
+        <- `source.data` ... `source.data`
+            data read    ...  data read
+
+    When configuring the bus clock, with `programmable`:
+        -> `sink.data`
+            HEADER_CONFIG
+        -> `sink.data`
+            length, 4
+        -> `sink.data` ... `sink.data`
+            bus period, SCL low time: in system clock cycles,
+            16 bits little endian each
+        <- `source.data`
+            status, error on an invalid configuration
+
+    The bus starts at `i2c_freq`, or with the timing of `i2c_mode` when
+    given, e.g. "fast-plus" or "high-speed", see `i2c_timing`. With
+    `programmable`, a new bus clock applies from the next transaction,
+    letting each device of a mixed bus run at its top speed. The Hs-mode
+    timing is not changed. Otherwise the configuration is drained and
+    rejected with an error status.
     """
     def __init__(self,
                  sys_clk_freq,
                  i2c_freq=400e3,
                  i2c_pins=None,
+                 i2c_mode=None,
+                 programmable=False,
                  **kwargs):
         self.sys_clk_freq = sys_clk_freq
         self.i2c_freq = i2c_freq
         self.i2c_pins = i2c_pins
+        self.i2c_mode = i2c_mode
+        self.programmable = programmable
         self.kwargs = kwargs
 
         self.sink = stream.Endpoint([("data", 8)])
@@ -64,13 +107,25 @@ class I2CProto(Elaboratable):
     def elaborate(self, platform):
         m = Module()
 
-        i2c_period = (self.sys_clk_freq // self.i2c_freq)
-        m.submodules.i2c = i2c = I2CStream(self.i2c_pins, i2c_period, **self.kwargs)
+        if self.i2c_mode is not None:
+            timing = i2c_timing(self.sys_clk_freq, self.i2c_mode)
+        else:
+            timing = dict(period_cyc=self.sys_clk_freq // self.i2c_freq)
+        m.submodules.i2c = i2c = I2CStream(self.i2c_pins, programmable=self.programmable,
+                                           **timing, **self.kwargs)
 
         header = Signal(8)
         length = Signal(8)
         status = Signal()
 
+        # Write then read, with a repeated start
+        combined  = Signal()
+        rd_length = Signal(8)
+
+        config = Signal(2 * I2C_PERIOD_WIDTH)
+        config_period = config[:I2C_PERIOD_WIDTH]
+        config_low = config[I2C_PERIOD_WIDTH:]
+
         r_wn = header[0]
         # addr = header[1:8]
 
@@ -79,30 +134,86 @@ class I2CProto(Elaboratable):
             with m.State("HEADER"):
                 m.d.comb += self.sink.ready.eq(1)
                 with m.If(self.sink.valid):
-                    m.d.sync += header.eq(self.sink.data)
+                    m.d.sync += [
+                        header.eq(self.sink.data),
+                        combined.eq(self.sink.data == HEADER_WRITE_READ),
+                    ]
+                    with m.If(self.sink.data == HEADER_WRITE_READ):
+                        m.next = "DEVICE"
+                    with m.Else():
+                        m.next = "LENGTH"
+
+            with m.State("DEVICE"):
+                m.d.comb += self.sink.ready.eq(1)
+                with m.If(self.sink.valid):
+                    m.d.sync += header.eq(self.sink.data & ~1)
                     m.next = "LENGTH"
 
+            with m.State("RD_LENGTH"):
+                m.d.comb += self.sink.ready.eq(1)
+                with m.If(self.sink.valid):
+                    m.d.sync += rd_length.eq(self.sink.data)
+                    m.next = "ADDR"
+
             with m.State("LENGTH"):
                 m.d.comb += self.sink.ready.eq(1)
                 with m.If(self.sink.valid):
                     m.d.sync += length.eq(self.sink.data)
-                    m.next = "ADDR"
+                    with m.If(header == HEADER_CONFIG):
+                        if self.programmable:
+                            m.d.sync += status.eq(Mux(self.sink.data == len(config) // 8,
+                                                      STATUS_OK, STATUS_ERR))
+                        else:
+                            m.d.sync += status.eq(STATUS_ERR)
+                        m.next = "CONFIG"
+                    with m.Elif(combined):
+                        m.next = "RD_LENGTH"
+                    with m.Else():
+                        m.next = "ADDR"
+
+            with m.State("CONFIG"):
+                with m.If(length >= 1):
+                    m.d.comb += self.sink.ready.eq(1)
+                    with m.If(self.sink.valid):
+                        m.d.sync += length.eq(length - 1)
+                        if self.programmable:
+                            m.d.sync += config.eq(Cat(config[8:], self.sink.data))
+                with m.Else():
+                    if self.programmable:
+                        with m.If((status == STATUS_OK) &
+                                  (config_low >= 1) & (config_low < config_period)):
+                            m.d.sync += [
+                                i2c.period.eq(config_period),
+                                i2c.low.eq(config_low),
+                            ]
+                        with m.Else():
+                            m.d.sync += status.eq(STATUS_ERR)
+                    m.next = "STATUS"
 
             with m.State("ADDR"):
                 m.d.comb += [
                     i2c.sink.r_wn.eq(0), # Write chip address
                     i2c.sink.data.eq(header),
                     i2c.sink.last.eq(length == 0),
+                    i2c.sink.restart.eq(combined & ~r_wn & (length == 0)),
                     i2c.sink.valid.eq(1),
                 ]
                 with m.If(i2c.sink.ready):
                     with m.If(i2c.error):
+                        # No data to drop when reading
+                        with m.If(r_wn):
+                            m.d.sync += length.eq(0)
                         m.next = "ERROR"
 
                     with m.Elif(r_wn):
                         m.next = "OK"
                     with m.Elif(length >= 1):
                         m.next = "WRITE"
+                    with m.Elif(combined):
+                        m.d.sync += [
+                            header.eq(header | 1),
+                            length.eq(rd_length),
+                        ]
                     with m.Else():
                         m.d.sync += status.eq(STATUS_OK)
                         m.next = "STATUS"
@@ -142,7 +253,8 @@ class I2CProto(Elaboratable):
                     i2c.sink.r_wn.eq(0),
                     i2c.sink.data.eq(self.sink.data),
                     i2c.sink.last.eq(length == 1),
-                    i2c.sink.valid.eq(1),
+                    i2c.sink.restart.eq(combined & (length == 1)),
+                    i2c.sink.valid.eq(self.sink.valid),
                 ]
                 with m.If(i2c.sink.ready):
                     m.d.comb += self.sink.ready.eq(1)
@@ -150,6 +262,13 @@ class I2CProto(Elaboratable):
 
                     with m.If(i2c.error):
                         m.next = "ERROR"
+                    with m.Elif((length == 1) & combined):
+                        # Read phase, after a repeated start
+                        m.d.sync += [
+                            header.eq(header | 1),
+                            length.eq(rd_length),
+                        ]
+                        m.next = "ADDR"
                     with m.Elif(length == 1):
                         m.d.sync += status.eq(STATUS_OK)
                         m.next = "STATUS"
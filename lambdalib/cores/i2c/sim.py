@@ -0,0 +1,132 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import *
+from amaranth.sim import *
+
+
+__all__ = ["I2CTargetSim"]
+
+
+class I2CTargetSim:
+    """ Behavioral model of an I2C target device for simulation.
+
+    Resolves the open drain `scl` and `sda` lines from the initiator pins
+    (as driven by `I2CBusDriver`) and its own `sda` pull down, and answers
+    as a simple register based device at `addr`:
+        - a write sets the register pointer with the first data byte,
+          following bytes are written to `regs` at incrementing addresses.
+        - a read returns `regs` from the register pointer, incrementing.
+
+    Unknown addresses are not acknowledged.
+
+    `pins` is the object given to the I2C core, with `scl` and `sda`
+    having `i`, `o` and `oe` signals.
+    """
+    def __init__(self, pins, addr, regs=None, size=256):
+        self.pins = pins
+        self.addr = addr
+        self.regs = regs if regs is not None else [0] * size
+        self.ptr = 0
+
+    def _load(self):
+        byte = self.regs[self.ptr % len(self.regs)]
+        self.ptr += 1
+        return 0, byte, not (byte >> 7)
+
+    def _line(self, pin, pull=False):
+        if hasattr(pin, "oe"):
+            driven_low = (yield pin.oe) and not (yield pin.o)
+        else:
+            driven_low = not (yield pin.o)
+        return int(not (driven_low or pull))
+
+    def sync_process(self):
+        pins = self.pins
+
+        yield Passive()
+
+        pull = False
+        state = "IDLE"
+        prev_scl = prev_sda = 1
+        bitno = 0
+        byte = 0
+        first = True
+        r_wn = 0
+        acked = False
+
+        while True:
+            scl = yield from self._line(pins.scl)
+            sda = yield from self._line(pins.sda, pull)
+            yield pins.scl.i.eq(scl)
+            yield pins.sda.i.eq(sda)
+
+            # Start or repeated start
+            if scl and prev_scl and prev_sda and not sda:
+                state = "ADDR"
+                bitno = 0
+                byte = 0
+                pull = False
+
+            # Stop
+            elif scl and prev_scl and not prev_sda and sda:
+                state = "IDLE"
+                pull = False
+
+            # Rising edge: sample
+            elif scl and not prev_scl:
+                if state in ("ADDR", "WRITE") and bitno < 8:
+                    byte = (byte << 1) | sda
+                    bitno += 1
+                elif state == "READ" and bitno == 8:
+                    acked = not sda
+
+            # Falling edge: setup
+            elif not scl and prev_scl:
+                if state in ("ADDR", "WRITE") and bitno == 8:
+                    if state == "ADDR":
+                        acked = (byte >> 1) == self.addr
+                        r_wn = byte & 1
+                        first = True
+                    else:
+                        acked = True
+                        if first:
+                            self.ptr = byte
+                            first = False
+                        else:
+                            self.regs[self.ptr % len(self.regs)] = byte
+                            self.ptr += 1
+                    pull = acked
+                    bitno = 9
+
+                elif state in ("ADDR", "WRITE") and bitno == 9:
+                    # End of our acknowledge
+                    pull = False
+                    bitno = 0
+                    byte = 0
+                    if not acked:
+                        state = "IDLE"
+                    elif state == "ADDR" and r_wn:
+                        state = "READ"
+                        bitno, byte, pull = self._load()
+                    elif state == "ADDR":
+                        state = "WRITE"
+
+                elif state == "READ" and bitno < 7:
+                    bitno += 1
+                    pull = not ((byte >> (7 - bitno)) & 1)
+
+                elif state == "READ" and bitno == 7:
+                    # Release the line for the initiator acknowledge
+                    bitno = 8
+                    pull = False
+
+                elif state == "READ" and bitno == 8:
+                    if acked:
+                        bitno, byte, pull = self._load()
+                    else:
+                        state = "IDLE"
+                        pull = False
+
+            prev_scl = scl
+            prev_sda = sda
+            yield
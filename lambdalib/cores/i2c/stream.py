@@ -4,6 +4,7 @@ from amaranth import *
 
 from ...interface import stream
 from .i2c import *
+from .i2c import _timing_reset
 
 
 __all__ = [
@@ -18,12 +19,21 @@ __all__ = [
 i2c_stream_description = [
     ("r_wn", 1),
     ("data", 8),
+    ("restart", 1),
 ]
 i2c_writer_description = [
     ("data", 8),
 ]
 
 
+def _timing_registers(period_cyc, low_cyc=None):
+    """ Run time bus period and SCL low time, see `I2CInitiator`. """
+    period_reset, low_reset = _timing_reset(int(period_cyc), low_cyc)
+    period = Signal(I2C_PERIOD_WIDTH, reset=period_reset)
+    low = Signal(I2C_PERIOD_WIDTH, reset=low_reset)
+    return period, low
+
+
 class I2CStage:
     ADDR_DEV = 0
     ADDR_REG = 1
@@ -41,6 +51,8 @@ class I2CStream(Elaboratable):
                 for read: N/A
         `last`: 1 to indicate this is the last I2C transfer,
                 I2C stop will be sent at the end of this transaction.
+        `restart`: with `last`, end the transaction without I2C stop,
+                the next one begins with a repeated start instead.
 
     Source stream description:
         `data`: for read: 8 bits read from SDA
@@ -84,6 +96,7 @@ class I2CStream(Elaboratable):
             r_wn == 0
             data == register address
             last == 1   <--- I2C STOP
+            (restart == 1   <--- or I2C repeated START, keeping the bus)
 
         Step 3: Write I2C chip address
             r_wn == 0
@@ -106,13 +119,41 @@ class I2CStream(Elaboratable):
 
             source.data == nth register value
             source.last == 1
+
+    Command queue
+    =============
+
+    With `queue_depth`, the sink is buffered by a FIFO of that many
+    transfers, so that whole transactions can be queued while the bus is
+    busy. `error` is then reported when the NAKed transfer leaves the
+    queue rather than along with `sink.ready`, producers that check it
+    (I2CProto, SSD1306) use the default unbuffered sink. The queued
+    transfers following a NAK are dropped up to the end of their
+    transaction.
+
+    The start of the next transaction is issued as soon as the previous
+    stop completes.
+
+    Bus clock
+    =========
+
+    With `programmable`, the bus period and SCL low time are set at run
+    time by `period` and `low`, in system clock cycles, and take effect
+    from the next I2C operation. `period_cyc` and `low_cyc` are their
+    reset values.
     """
 
-    def __init__(self, pins, period_cyc, **kwargs):
+    def __init__(self, pins, period_cyc, queue_depth=0, programmable=False, **kwargs):
         self.pins = pins
         self.period_cyc = period_cyc
+        self.queue_depth = queue_depth
         self.kwargs = kwargs
 
+        self.period = None
+        self.low    = None
+        if programmable:
+            self.period, self.low = _timing_registers(period_cyc, kwargs.get("low_cyc"))
+
         self.error  = Signal()
         self.sink   = stream.Endpoint(i2c_stream_description)
         self.source = stream.Endpoint([
@@ -120,34 +161,49 @@ class I2CStream(Elaboratable):
         ])
 
     def elaborate(self, platform):
-        sink = self.sink
         source = self.source
 
         m = Module()
 
-        i2c = I2CInitiator(self.pins, self.period_cyc, **self.kwargs)
+        i2c = I2CInitiator(self.pins, self.period_cyc,
+                           programmable=self.period is not None, **self.kwargs)
         m.submodules.i2c = i2c
+        if self.period is not None:
+            m.d.comb += [
+                i2c.period.eq(self.period),
+                i2c.low.eq(self.low),
+            ]
+
+        if self.queue_depth:
+            queue = stream.SyncFIFO(i2c_stream_description, self.queue_depth)
+            m.submodules.queue = queue
+            m.d.comb += self.sink.connect(queue.sink)
+            sink = queue.source
+        else:
+            sink = self.sink
 
         last_r = Signal()
+        restart_r = Signal()
 
         # Drive the i2c core
         with m.FSM():
 
+            # Start, or repeated start when the previous
+            # transaction ended without stop.
             with m.State("IDLE"):
-                with m.If(~i2c.busy):
-                    with m.If(sink.valid):
-                        m.next = "START"
-
-            with m.State("START"):
-                m.d.comb += i2c.start.eq(1)
-                m.next = "_WAIT_START"
+                with m.If(~i2c.busy & sink.valid):
+                    m.d.comb += i2c.start.eq(1)
+                    m.next = "_WAIT_START"
 
             with m.State("_WAIT_START"):
                 with m.If(~i2c.busy):
                     m.next = "XFER"
 
             with m.State("XFER"):
-                m.d.sync += last_r.eq(sink.last)
+                m.d.sync += [
+                    last_r.eq(sink.last),
+                    restart_r.eq(sink.restart),
+                ]
 
                 with m.If(sink.valid):
                     # Read
@@ -174,12 +230,21 @@ class I2CStream(Elaboratable):
                     # We were NAKed
                     with m.If(~i2c.ack_o):
                         m.d.comb += self.error.eq(1)
-                        m.next = "STOP"
+                        if self.queue_depth:
+                            # Drop the rest of the queued transaction
+                            with m.If(last_r):
+                                m.next = "STOP"
+                            with m.Else():
+                                m.next = "FLUSH"
+                        else:
+                            m.next = "STOP"
 
                     # We were ACKed
                     with m.Else():
 
-                        with m.If(last_r):
+                        with m.If(last_r & restart_r):
+                            m.next = "IDLE"
+                        with m.Elif(last_r):
                             m.next = "STOP"
                         with m.Else():
                             m.next = "XFER"
@@ -193,18 +258,30 @@ class I2CStream(Elaboratable):
                     ]
                     with m.If(source.ready):
 
-                        with m.If(last_r):
+                        with m.If(last_r & restart_r):
+                            m.next = "IDLE"
+                        with m.Elif(last_r):
                             m.next = "STOP"
                         with m.Else():
                             m.next = "XFER"
 
+            with m.State("FLUSH"):
+                m.d.comb += sink.ready.eq(1)
+                with m.If(sink.valid & sink.last):
+                    m.next = "STOP"
+
             with m.State("STOP"):
                 m.d.comb += i2c.stop.eq(1)
                 m.next = "_WAIT_STOP"
 
+            # Chain the next queued transaction
             with m.State("_WAIT_STOP"):
                 with m.If(~i2c.busy):
-                    m.next = "IDLE"
+                    with m.If(sink.valid):
+                        m.d.comb += i2c.start.eq(1)
+                        m.next = "_WAIT_START"
+                    with m.Else():
+                        m.next = "IDLE"
 
         return m
 
@@ -223,12 +300,20 @@ class I2CWriterStream(Elaboratable):
         always stopped on the 3rd step after writing one register value.
 
         As such, this module cannot be used to write a burst of registers.
+
+    With `programmable`, the bus clock is set at run time by `period`
+    and `low`, see I2CStream.
     """
-    def __init__(self, pins, period_cyc, **kwargs):
+    def __init__(self, pins, period_cyc, programmable=False, **kwargs):
         self.pins = pins
         self.period_cyc = period_cyc
         self.kwargs = kwargs
 
+        self.period = None
+        self.low    = None
+        if programmable:
+            self.period, self.low = _timing_registers(period_cyc, kwargs.get("low_cyc"))
+
         self.sink = stream.Endpoint(i2c_writer_description)
 
     def elaborate(self, platform):
@@ -236,8 +321,14 @@ class I2CWriterStream(Elaboratable):
 
         m = Module()
 
-        i2c = I2CInitiator(self.pins, self.period_cyc, **self.kwargs)
+        i2c = I2CInitiator(self.pins, self.period_cyc,
+                           programmable=self.period is not None, **self.kwargs)
         m.submodules.i2c = i2c
+        if self.period is not None:
+            m.d.comb += [
+                i2c.period.eq(self.period),
+                i2c.low.eq(self.low),
+            ]
 
         stage = Signal(i2c_stage_dw)
         retry = Signal()
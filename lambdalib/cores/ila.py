@@ -1,9 +1,198 @@
 from amaranth import *  # type: ignore
+from amaranth.hdl.rec import Record
 from lambdalib.interface import stream
 from lambdalib.cores.mem.stream import MemoryStream
-from lambdalib.cores.serial import AsyncSerialTXStream
+from lambdalib.cores.regs import StreamRegs
+from lambdalib.cores.serial import AsyncSerialStream
+from lambdalib.interface.stream_utils import Arbiter
 
-__all__ = ["ILA"]
+__all__ = ["ILA", "ILAHub", "ILATrigger", "ila_header", "ila_trigger_layout"]
+
+
+# Host commands
+CMD_ARM     = 0x01  # Clear the buffer and wait for a new trigger
+CMD_FORCE   = 0x02  # Trigger as soon as the pre-trigger samples are stored
+CMD_ABORT   = 0x03  # Stop the capture without readout
+CMD_STATUS  = 0x04  # Reply with one status byte
+CMD_READ    = 0x05  # Read the buffer out again
+CMD_TRIGGER = 0x06  # Write the programmable trigger configuration
+
+# Status byte
+STATUS_ARMED     = 0x01  # Waiting for the trigger
+STATUS_TRIGGERED = 0x02  # Recording the post-trigger samples
+STATUS_CAPTURED  = 0x04  # A complete capture is stored
+STATUS_FILLED    = 0x08  # The pre-trigger samples are stored
+
+# Capture description header
+HEADER_MAGIC          = b"ILA1"
+HEADER_FLAG_RLE       = 0x01
+HEADER_FLAG_TIMESTAMP = 0x02
+
+
+def ila_header(layout, depth: int, pre_trigger: int, clk_freq: int,
+               decimation: int = 1, rle_width: int = 0,
+               timestamp_width: int = 0) -> bytes:
+    """Description of a capture, sent before its readout.
+
+    All the fields are little endian:
+        magic: "ILA1"
+        flags: 1 byte, HEADER_FLAG_RLE, HEADER_FLAG_TIMESTAMP
+        depth, pre_trigger, clk_freq: 4 bytes each
+        decimation: 2 bytes
+        rle_width, timestamp_width, number of signals: 1 byte each
+        then for each signal, LSB first: 2 bytes of width, 1 byte of name
+        length and the ASCII name
+    """
+    flags = 0
+    if rle_width:
+        flags |= HEADER_FLAG_RLE
+    if timestamp_width:
+        flags |= HEADER_FLAG_TIMESTAMP
+
+    data = bytearray(HEADER_MAGIC)
+    data += bytes([flags])
+    for value, size in [(depth, 4), (pre_trigger, 4), (clk_freq, 4),
+                        (decimation, 2), (rle_width, 1), (timestamp_width, 1),
+                        (len(layout), 1)]:
+        data += value.to_bytes(size, byteorder='little')
+    for name, width in layout:
+        name = name.encode("ascii")
+        data += width.to_bytes(2, byteorder='little')
+        data += bytes([len(name)]) + name
+    return bytes(data)
+
+
+def ila_trigger_layout(width: int, counter_width: int = 16):
+    """Layout of one trigger stage configuration record."""
+    return [
+        ("value",   width),
+        ("mask",    width),
+        ("edge",    width),
+        ("count",   counter_width),
+        ("timeout", counter_width),
+    ]
+
+
+class ILATrigger(Elaboratable):
+    """Runtime programmable multi-stage trigger unit.
+
+    The trigger is a sequence of up to `stages` stages. Each stage matches
+    the `data` input against its configuration:
+    - `value` / `mask`: the masked bits of `data` must equal `value`,
+      a zero mask matches any value.
+    - `edge`: when non zero, at least one of these bits must have changed
+      since the previous cycle, e.g. a rising edge of bit k is matched
+      with `edge`, `mask` and `value` bit k set.
+    - `count`: number of matches needed to complete the stage (0 or 1
+      complete it on the first match).
+    - `timeout`: when non zero, the stage must complete within this number
+      of cycles after the previous one, otherwise the sequence restarts
+      from the first stage. Ignored for the first stage.
+
+    `trigger` pulses on the sample that completes the last stage, e.g.
+    "A then B within N cycles" is a stage matching A followed by a stage
+    matching B with a timeout of N.
+
+    The configuration is written as bytes to the `sink` stream, so that it
+    can be changed from the host without rebuilding the design: one
+    `ila_trigger_layout` record per stage, packed LSB first and padded to a
+    multiple of 8 bits, with `last` set on the final byte of the final
+    stage. The number of stages written sets the length of the sequence.
+    The trigger is disabled until a configuration is written.
+
+    Parameters:
+        width: Width of the data to match
+        stages: Maximum number of stages
+        counter_width: Width of the match counters and timeouts
+
+    Attributes:
+        data: Input data to match
+        trigger: Output pulse when the sequence completes
+        sink: Configuration byte stream
+    """
+    def __init__(self, width: int, stages: int = 2, counter_width: int = 16):
+        self._width = width
+        self._stages = stages
+        self._layout = ila_trigger_layout(width, counter_width)
+
+        self.data = Signal(width)
+        self.trigger = Signal()
+        self.sink = stream.Endpoint([("data", 8)])
+
+    def elaborate(self, platform) -> Module:
+        m = Module()
+
+        # Configuration records, assembled from the byte stream
+        record_width = sum(width for _, width in self._layout)
+        aligned_width = ((record_width + 7) // 8) * 8
+
+        m.submodules.upconverter = upconverter = stream._UpConverter(
+            nbits_from=8,
+            nbits_to=aligned_width,
+            ratio=aligned_width // 8,
+            reverse=False
+        )
+        m.submodules.regs = regs = StreamRegs(self._layout, self._stages)
+
+        m.d.comb += [
+            self.sink.connect(upconverter.sink),
+            upconverter.source.connect(regs.sink, exclude={"payload"}),
+            regs.sink.payload.eq(upconverter.source.data[:record_width]),
+        ]
+
+        nstages = Signal(range(self._stages + 1))
+        index = Signal(range(self._stages))
+        configure = Signal()
+
+        m.d.comb += configure.eq(regs.sink.valid & regs.sink.ready)
+        with m.If(configure):
+            with m.If(regs.sink.last | (index == self._stages - 1)):
+                m.d.sync += nstages.eq(index + 1)
+                m.d.sync += index.eq(0)
+            with m.Else():
+                m.d.sync += nstages.eq(0)
+                m.d.sync += index.eq(index + 1)
+
+        # Stage matching
+        prev = Signal(self._width)
+        m.d.sync += prev.eq(self.data)
+
+        matches = Array(Signal(name=f"match_{i}") for i in range(self._stages))
+        for i in range(self._stages):
+            value_ok = ((self.data ^ regs.value[i]) & regs.mask[i]) == 0
+            edge_ok = ((self.data ^ prev) & regs.edge[i]) != 0
+            m.d.comb += matches[i].eq(value_ok & ((regs.edge[i] == 0) | edge_ok))
+
+        # Sequencer
+        stage = Signal(range(self._stages))
+        hits = Signal.like(regs.count[0])
+        timer = Signal.like(regs.timeout[0])
+
+        count = regs.count[stage]
+        timeout = regs.timeout[stage]
+        complete = matches[stage] & (hits + 1 >= count)
+        expired = (stage != 0) & (timeout != 0) & (timer >= timeout - 1)
+
+        m.d.sync += timer.eq(timer + 1)
+
+        with m.If(configure | (nstages == 0)):
+            m.d.sync += [stage.eq(0), hits.eq(0), timer.eq(0)]
+
+        with m.Elif(complete):
+            m.d.sync += [hits.eq(0), timer.eq(0)]
+            with m.If(stage == nstages - 1):
+                m.d.comb += self.trigger.eq(1)
+                m.d.sync += stage.eq(0)
+            with m.Else():
+                m.d.sync += stage.eq(stage + 1)
+
+        with m.Elif(expired):
+            m.d.sync += [stage.eq(0), hits.eq(0), timer.eq(0)]
+
+        with m.Elif(matches[stage]):
+            m.d.sync += hits.eq(hits + 1)
+
+        return m
 
 
 class ILA(Elaboratable):
@@ -13,96 +202,692 @@ class ILA(Elaboratable):
     It captures data on a trigger signal and allows reading it out later via
     a serial interface at 115200 baud (or any other baudrate if specified).
 
+    Samples are written continuously into a circular buffer, so that the
+    capture also covers what happened before the trigger: `pre_trigger`
+    samples before the trigger are kept (e.g. `depth // 4` for a trigger
+    at 25% of the capture), followed by the trigger sample and the next
+    ones up to `depth` samples. The trigger is only accepted once the
+    pre-trigger samples are stored. Readout starts from the oldest sample.
+
     An accompagnying tool can be used to read the captured data from the serial
     port and generate a VCD file for waveform analysis:
 
         ila.py --depth 65536 --layout "data:8,valid:1,ready:1" \
                /dev/tty.usbserial-102 capture.vcd
 
-    The ILA operates in four states:
-    - IDLE: Waiting for a trigger signal
-    - CAPTURE: Recording incoming data into memory
+    The trigger is the `trigger` input, or'ed with an optional runtime
+    programmable `ILATrigger` matching `data_in` when `trigger_stages` is
+    non zero. Its configuration bytes are written to `trigger_config`,
+    or by the host with CMD_TRIGGER (`--trigger`).
+
+    With `rle` enabled, runs of identical samples are stored as a single
+    (sample, repeat count) entry, so that slowly changing signals are
+    captured over a much longer window: `depth` and `pre_trigger` then
+    count entries instead of samples, and the trigger is accepted without
+    waiting for the pre-trigger entries. The readout starts with two
+    entry-sized little endian words, the number of entries and the index
+    of the entry starting with the trigger sample, followed by the
+    entries (sample, then `rle_width` bits of repeat count minus one).
+    The host tool expands them back to one sample per cycle (`--rle`).
+
+    Samples are only stored while the `qualifier` input is high (it is by
+    default), e.g. on stream handshakes, so that sparse events are
+    observed over a long time. The trigger sample is always stored.
+    With `timestamp_width` non zero, the value of a free running cycle
+    counter is stored after each sample, so that the host tool places
+    the stored samples at their actual time (`--timestamp-width`). It
+    must not wrap between two stored samples.
+
+    With `decimation` set to n, only one cycle every n is sampled (and
+    qualified), e.g. to observe slow phenomena over a long window
+    (`--decimation` for the host tool). Timestamps still count cycles.
+
+    The capture runs in the `domain` clock domain, e.g. "usb" or "ulpi"
+    to observe a fast interface at full rate: `data_in`, `trigger` and
+    `qualifier` belong to this domain, and the memory is written there.
+    The host link (readout, commands and `trigger_config`) stays in the
+    `sync` domain, crossed with asynchronous FIFOs.
+
+    When `data_width` is a list of (name, width) signals, they are driven
+    through the `probes` record and each readout starts with a description
+    of the capture (see `ila_header`): the layout, depth, trigger position
+    and sampling clock. The host tool then configures itself, without
+    `--depth` or `--layout`:
+
+        ila = ILA([("scl", 1), ("sda", 1)], depth=4096, sys_clk_freq=...)
+        m.d.comb += ila.probes.scl.eq(scl)
+
+    The readout goes to the serial `tx` output by default. With
+    `readout="stream"` the captured bytes are sent to the `source` stream
+    instead, with `last` set on the final byte, e.g. to connect to the IN
+    endpoint of a `USBGenericDevice` for a much faster download:
+
+        m.d.comb += ila.source.connect(usb.sink)
+
+        ila.py --usb ffff:1234 --depth 65536 --layout "data:8" capture.vcd
+
+    The ILA operates in five states:
+    - IDLE: Recording pre-trigger samples, waiting for a trigger signal
+    - CAPTURE: Recording post-trigger samples into memory
     - REWIND: Preparing to read out captured data
-    - READOUT: Streaming captured data via serial interface
+    - READOUT: Streaming captured data via serial interface or stream
+    - DONE: Holding the capture, waiting for a host command
+
+    The ILA is armed out of reset and reads the capture out once complete.
+    The host then controls it with single byte commands received on the
+    serial `rx` input (or the `sink` stream with `readout="stream"`):
+    - CMD_ARM: clear the buffer and wait for a new trigger
+    - CMD_FORCE: trigger as soon as the pre-trigger samples are stored
+    - CMD_ABORT: stop the capture, without readout
+    - CMD_STATUS: reply with a status byte made of the STATUS_* flags
+    - CMD_READ: read the buffer out again, once DONE. Nothing is sent
+      for an empty buffer, but the run-length encoded header of 0 entries
+    - CMD_TRIGGER: followed by a length byte and that many bytes of
+      configuration for the programmable trigger (see `encode_trigger`),
+      forwarded like `trigger_config`, which must then be left idle.
+      The bytes are dropped without programmable trigger.
+    Commands are not processed during the readout, and a status reply is
+    always sent before a readout starts.
 
     Parameters:
-        data_width: Width of the data bus to capture (in bits)
+        data_width: Width of the data bus to capture (in bits), or a list
+            of (name, width) signals, LSB first, for a self-describing capture
         depth: Number of samples to capture in memory
         sys_clk_freq: System clock frequency for serial baud rate calculation
+        baudrate: Serial baud rate
+        pre_trigger: Number of samples kept before the trigger
+        trigger_stages: Number of stages of the programmable trigger, 0 for none
+        rle: Run-length encode the capture
+        rle_width: Width of the run-length repeat counts (multiple of 8)
+        readout: "serial" for the `tx` output, "stream" for the `source` stream
+        timestamp_width: Width of the sample timestamps (multiple of 8), 0 for none
+        decimation: Store one sample every `decimation` cycles
+        domain: Clock domain of the capture
+        clk_freq: Frequency of the capture clock, defaults to sys_clk_freq
 
     Attributes:
         data_in: Input signal to capture
+        probes: Record of the named signals to capture, instead of `data_in`
         trigger: Signal to start data capture
+        cross_trigger: Trigger from other ILAs, see `ILAHub`
+        triggered: Pulse when the trigger is accepted
+        qualifier: Store the sample when high
+        trigger_config: Configuration stream of the programmable trigger
         tx: Serial output for data readout
+        rx: Serial input for host commands
+        source: Byte stream for data readout
+        sink: Byte stream for host commands
     """
-    def __init__(self, data_width: int, depth: int, sys_clk_freq: int, baudrate: int = 115200):
+    def __init__(self, data_width, depth: int, sys_clk_freq: int, baudrate: int = 115200,
+                 pre_trigger: int = 0, trigger_stages: int = 0,
+                 rle: bool = False, rle_width: int = 16, readout: str = "serial",
+                 timestamp_width: int = 0, decimation: int = 1, domain: str = "sync",
+                 clk_freq: int = None):
+        layout = None
+        if not isinstance(data_width, int):
+            layout = [(name, width) for name, width in data_width]
+            if not 0 < len(layout) < 256:
+                raise ValueError(f"Between 1 and 255 signals are supported, got {len(layout)}")
+            for name, width in layout:
+                if not 0 < len(name.encode("ascii")) < 256 or not 0 < width < 2**16:
+                    raise ValueError(f"Invalid signal ({name!r}, {width})")
+            data_width = sum(width for _, width in layout)
+
+        if not 0 <= pre_trigger < depth:
+            raise ValueError(f"pre_trigger must be in [0, {depth - 1}], got {pre_trigger}")
+        if readout not in ("serial", "stream"):
+            raise ValueError(f"readout must be 'serial' or 'stream', got {readout!r}")
+        if rle and rle_width % 8:
+            raise ValueError(f"rle_width must be a multiple of 8, got {rle_width}")
+        if decimation < 1:
+            raise ValueError(f"decimation must be at least 1, got {decimation}")
+        if timestamp_width % 8:
+            raise ValueError(f"timestamp_width must be a multiple of 8, got {timestamp_width}")
+        if rle and timestamp_width:
+            raise ValueError("Timestamps are not supported with rle")
+        if rle and depth.bit_length() > ((data_width + 7) // 8) * 8 + rle_width:
+            raise ValueError("depth too large for the run-length encoded header")
+
         self._data_width = data_width
         self._depth = depth
         self._sys_clk_freq = sys_clk_freq
         self._baudrate = baudrate
+        self._pre_trigger = pre_trigger
+        self._rle = rle
+        self._rle_width = rle_width
+        self._readout = readout
+        self._timestamp_width = timestamp_width
+        self._decimation = decimation
+        self._domain = domain
+
+        self._header = None
+        self.probes = None
+        if layout is not None:
+            self._header = ila_header(
+                layout, depth, pre_trigger,
+                clk_freq if clk_freq is not None else sys_clk_freq,
+                decimation=decimation,
+                rle_width=rle_width if rle else 0,
+                timestamp_width=timestamp_width,
+            )
+            self.probes = Record(layout, name="probes")
 
         self.data_in = Signal(data_width)
         self.trigger = Signal()
+        self.qualifier = Signal(reset=1)
+        self.cross_trigger = Signal()
+        self.triggered = Signal()
         self.tx      = Signal()
+        self.rx      = Signal(reset=1)
+        self.source  = stream.Endpoint([("data", 8)])
+        self.sink    = stream.Endpoint([("data", 8)])
+
+        self._trigger_unit = None
+        if trigger_stages:
+            self._trigger_unit = ILATrigger(data_width, stages=trigger_stages)
+            self.trigger_config = stream.Endpoint([("data", 8)])
 
     def elaborate(self, platform) -> Module:
         m = Module()
 
         # Calculate upper multiple of 8 for better data alignment
         aligned_width = ((self._data_width + 7) // 8) * 8
-        
-        m.submodules.mem = mem = MemoryStream(dw=aligned_width, depth=self._depth)
-        
+
+        # Run-length encoded entries store the repeat count after the sample
+        entry_width = aligned_width
+        if self._rle:
+            entry_width += self._rle_width
+
+        # Timestamped samples store the cycle counter after the sample
+        entry_width += self._timestamp_width
+
+        # Arming clears the buffer
+        clear = Signal()
+        m.submodules.mem = mem = ResetInserter(clear)(
+            MemoryStream(dw=entry_width, depth=self._depth, circular=True))
+        m.d.comb += mem.watermark.eq(self._pre_trigger)
+
         # Pad input data to aligned width
         padded_data = Signal(aligned_width)
         m.d.comb += padded_data[:self._data_width].eq(self.data_in)
-        m.d.comb += [
-            mem.sink.data.eq(padded_data),
-        ]
-        
+        if self.probes is not None:
+            m.d.comb += self.data_in.eq(self.probes)
+
         m.submodules.downconverter = downconverter = stream._DownConverter(
-            nbits_from=aligned_width,
+            nbits_from=entry_width,
             nbits_to=8,
-            ratio=aligned_width // 8,
+            ratio=entry_width // 8,
             reverse=False
         )
 
-        m.submodules.tx = tx = AsyncSerialTXStream(
-            o=self.tx,
-            divisor=self._sys_clk_freq // self._baudrate,
-        )
-        m.d.comb += downconverter.source.connect(tx.sink)
+        # Host link: commands in, status replies and readout out
+        command = stream.Endpoint([("data", 8)])
+        output = stream.Endpoint([("data", 8)])
+
+        # Decimated and qualified samples are stored
+        qualifier = Signal()
+        if self._decimation > 1:
+            prescaler = Signal(range(self._decimation))
+            with m.If(prescaler == 0):
+                m.d.sync += prescaler.eq(self._decimation - 1)
+            with m.Else():
+                m.d.sync += prescaler.eq(prescaler - 1)
+            m.d.comb += qualifier.eq(self.qualifier & (prescaler == 0))
+        else:
+            m.d.comb += qualifier.eq(self.qualifier)
+
+        # The readout owns the output while running
+        readout = Signal()
+        reply = Signal(8)
+        reply_valid = Signal()
+
+        # Capture description, sent before the readout when known
+        describe = Signal()
+        header = self._header or bytes(1)
+        description = Array(Const(byte, 8) for byte in header)
+        description_index = Signal(range(len(header)))
+
+        with m.If(describe):
+            m.d.comb += [
+                output.valid.eq(1),
+                output.data.eq(description[description_index]),
+            ]
+        with m.Elif(readout):
+            m.d.comb += downconverter.source.connect(output)
+        with m.Else():
+            m.d.comb += [
+                output.valid.eq(reply_valid),
+                output.data.eq(reply),
+                output.last.eq(1),
+            ]
+            with m.If(output.ready):
+                m.d.sync += reply_valid.eq(0)
+
+        # Commands are accepted by the states that handle them,
+        # one at a time while no reply is pending.
+        accept = Signal()
+        m.d.comb += command.ready.eq(accept & ~reply_valid)
+        received = command.valid & command.ready
+
+        def is_command(cmd):
+            return received & (command.data == cmd)
+
+        arm = Signal()
+        forced = Signal()
+        captured = Signal()
+
+        # External and programmable triggers
+        trigger = Signal()
+        if self._trigger_unit is not None:
+            m.submodules.trigger = self._trigger_unit
+            m.d.comb += [
+                self._trigger_unit.data.eq(self.data_in),
+                trigger.eq(self.trigger | self._trigger_unit.trigger | forced |
+                           self.cross_trigger),
+            ]
+        else:
+            m.d.comb += trigger.eq(self.trigger | forced | self.cross_trigger)
+
+        # Samples (or entries) to record from the trigger, included
+        post_trigger = self._depth - self._pre_trigger
+        count = Signal(range(self._depth + 1))
+
+        if self._rle:
+            # Run-length encoder: a run of identical samples is stored as a
+            # single entry when it ends. The trigger sample always starts
+            # a new run, so that its position is known after expansion.
+            run_value = Signal(aligned_width)
+            run_count = Signal(self._rle_width)
+            run_open = Signal()
+            new_run = Signal()
+            record = Signal()
+            force = Signal()
+
+            m.d.comb += [
+                new_run.eq(~run_open | force | (padded_data != run_value) |
+                           (run_count == 2**self._rle_width - 1)),
+                mem.sink.data.eq(Cat(run_value, run_count)),
+            ]
+            with m.If(record):
+                with m.If(new_run):
+                    m.d.comb += mem.sink.valid.eq(run_open)
+                    m.d.sync += [
+                        run_value.eq(padded_data),
+                        run_count.eq(0),
+                        run_open.eq(1),
+                    ]
+                with m.Else():
+                    m.d.sync += run_count.eq(run_count + 1)
+
+            entries = Signal.like(mem.level)
+            rle_header = Array([entries, entries - post_trigger])
+            rle_header_index = Signal()
+        elif self._timestamp_width:
+            timestamp = Signal(self._timestamp_width)
+            m.d.sync += timestamp.eq(timestamp + 1)
+            m.d.comb += mem.sink.data.eq(Cat(padded_data, timestamp))
+        else:
+            m.d.comb += mem.sink.data.eq(padded_data)
 
-        count = Signal(range(self._depth))
+        # Nothing to read out, e.g. aborted before the first sample
+        empty = Signal()
 
-        with m.FSM():
+        with m.FSM() as fsm:
             with m.State("IDLE"):
-                m.d.sync += count.eq(0)
+                m.d.sync += count.eq(1)
 
-                with m.If(self.trigger):
-                    m.d.comb += mem.sink.valid.eq(1)
-                    m.d.sync += count.eq(count + 1)
-                    m.next = "CAPTURE"
+                if self._rle:
+                    # Entries are only stored when a run ends, so the
+                    # trigger is accepted at any time.
+                    m.d.comb += [
+                        record.eq(qualifier | trigger),
+                        force.eq(trigger),
+                    ]
+                    with m.If(trigger):
+                        m.d.comb += self.triggered.eq(1)
+                        m.d.sync += forced.eq(0)
+                        m.next = "CAPTURE"
+                else:
+                    # Wait for the pre-trigger samples to be recorded
+                    start = trigger & mem.almost_full
+                    m.d.comb += mem.sink.valid.eq(qualifier | start)
+                    with m.If(start):
+                        m.d.comb += self.triggered.eq(1)
+                        m.d.sync += forced.eq(0)
+                        if post_trigger == 1:
+                            m.d.sync += captured.eq(1)
+                            m.next = "REWIND"
+                        else:
+                            m.next = "CAPTURE"
+
+                m.d.comb += accept.eq(1)
+                with m.If(is_command(CMD_FORCE)):
+                    m.d.sync += forced.eq(1)
+                with m.If(is_command(CMD_ARM)):
+                    m.d.comb += arm.eq(1)
+                    m.next = "IDLE"
+                with m.If(is_command(CMD_ABORT)):
+                    m.next = "DONE"
 
             with m.State("CAPTURE"):
-                m.d.comb += mem.sink.valid.eq(1)
-                m.d.sync += count.eq(count + 1)
-                with m.If(count == self._depth - 1):
-                    m.next = "REWIND"
+                if self._rle:
+                    # Store the last run instead of starting a new one
+                    with m.If(qualifier):
+                        with m.If(new_run & (count == post_trigger)):
+                            m.d.comb += mem.sink.valid.eq(1)
+                            m.d.sync += captured.eq(1)
+                            m.next = "REWIND"
+                        with m.Else():
+                            m.d.comb += record.eq(1)
+                            with m.If(new_run):
+                                m.d.sync += count.eq(count + 1)
+                else:
+                    m.d.comb += mem.sink.valid.eq(qualifier)
+                    with m.If(qualifier):
+                        m.d.sync += count.eq(count + 1)
+                        with m.If(count == post_trigger - 1):
+                            m.d.sync += captured.eq(1)
+                            m.next = "REWIND"
+
+                m.d.comb += accept.eq(1)
+                with m.If(is_command(CMD_ARM)):
+                    m.d.comb += arm.eq(1)
+                    m.next = "IDLE"
+                with m.If(is_command(CMD_ABORT)):
+                    m.next = "DONE"
 
             with m.State("REWIND"):
-                m.d.comb += mem.rewind.eq(1)
-                m.d.sync += count.eq(0)
-                m.next = "READOUT"
+                # Let a pending status reply out first
+                with m.If(~reply_valid):
+                    m.d.comb += mem.rewind.eq(1)
+                    m.d.sync += empty.eq(mem.level == 0)
+                    if self._rle:
+                        # An empty capture is sent as a header of 0 entries
+                        m.d.sync += [
+                            entries.eq(mem.level),
+                            rle_header_index.eq(0),
+                        ]
+                        if self._header is not None:
+                            m.d.sync += description_index.eq(0)
+                            m.next = "DESCRIBE"
+                        else:
+                            m.next = "RLE-HEADER"
+                    else:
+                        with m.If(mem.level == 0):
+                            m.next = "DONE"
+                        with m.Else():
+                            if self._header is not None:
+                                m.d.sync += description_index.eq(0)
+                                m.next = "DESCRIBE"
+                            else:
+                                m.next = "READOUT"
+
+            if self._header is not None:
+                # Capture description
+                with m.State("DESCRIBE"):
+                    m.d.comb += describe.eq(1)
+                    with m.If(output.ready):
+                        m.d.sync += description_index.eq(description_index + 1)
+                        with m.If(description_index == len(self._header) - 1):
+                            if self._rle:
+                                m.next = "RLE-HEADER"
+                            else:
+                                m.next = "READOUT"
+
+            if self._rle:
+                # Number of entries and index of the trigger entry
+                with m.State("RLE-HEADER"):
+                    m.d.comb += [
+                        readout.eq(1),
+                        downconverter.sink.valid.eq(1),
+                        downconverter.sink.data.eq(rle_header[rle_header_index]),
+                    ]
+                    with m.If(downconverter.sink.ready):
+                        m.d.sync += rle_header_index.eq(1)
+                        with m.If(rle_header_index == 1):
+                            with m.If(empty):
+                                m.next = "DONE"
+                            with m.Else():
+                                m.next = "READOUT"
 
             with m.State("READOUT"):
-                m.d.comb += mem.source.connect(downconverter.sink)
-                with m.If(mem.source.valid & downconverter.sink.ready):
-                    m.d.sync += count.eq(count + 1)
-                with m.If(count == self._depth - 1):
-                    m.next = "STUCK"
-
-            with m.State("STUCK"):
-                pass
+                m.d.comb += [
+                    readout.eq(1),
+                    mem.source.connect(downconverter.sink),
+                ]
+                with m.If(mem.source.valid & downconverter.sink.ready &
+                          mem.source.last):
+                    m.next = "DONE"
+
+            with m.State("DONE"):
+                m.d.comb += accept.eq(1)
+                with m.If(is_command(CMD_ARM)):
+                    m.d.comb += arm.eq(1)
+                    m.next = "IDLE"
+                with m.If(is_command(CMD_READ)):
+                    m.next = "REWIND"
+
+        # Restart from an empty buffer
+        with m.If(arm):
+            m.d.comb += clear.eq(1)
+            m.d.sync += [
+                forced.eq(0),
+                captured.eq(0),
+            ]
+            if self._rle:
+                m.d.sync += run_open.eq(0)
+
+        with m.If(is_command(CMD_STATUS)):
+            m.d.sync += [
+                reply.eq(Cat(fsm.ongoing("IDLE"),
+                             fsm.ongoing("CAPTURE"),
+                             captured,
+                             mem.almost_full)),
+                reply_valid.eq(1),
+            ]
+
+        return self._elaborate_link(m, command, output)
+
+    def _elaborate_link(self, capture: Module, command, output) -> Module:
+        """Connect the capture logic, running in the capture domain, to the
+        host link in the `sync` domain."""
+        m = Module()
+
+        if self._readout == "serial":
+            m.submodules.serial = serial = AsyncSerialStream(
+                divisor=self._sys_clk_freq // self._baudrate,
+            )
+            m.d.comb += [
+                serial.serial.rx.i.eq(self.rx),
+                self.tx.eq(serial.serial.tx.o),
+            ]
+            link_source, link_sink = serial.source, serial.sink
+        else:
+            link_source, link_sink = self.sink, self.source
+
+        # Sinks of the commands and trigger configuration, in `sync`
+        trigger_sink = None
+        if self._domain == "sync":
+            m.submodules.capture = capture
+            command_sink = command
+            m.d.comb += output.connect(link_sink)
+            if self._trigger_unit is not None:
+                trigger_sink = self._trigger_unit.sink
+        else:
+            m.submodules.capture = DomainRenamer(self._domain)(capture)
+
+            m.submodules.command_cdc = command_cdc = stream.AsyncFIFO(
+                [("data", 8)], 8, w_domain="sync", r_domain=self._domain)
+            m.submodules.output_cdc = output_cdc = stream.AsyncFIFO(
+                [("data", 8)], 8, w_domain=self._domain, r_domain="sync")
+            command_sink = command_cdc.sink
+            m.d.comb += [
+                command_cdc.source.connect(command),
+                output.connect(output_cdc.sink),
+                output_cdc.source.connect(link_sink),
+            ]
+
+            if self._trigger_unit is not None:
+                m.submodules.trigger_cdc = trigger_cdc = stream.AsyncFIFO(
+                    [("data", 8)], 8, w_domain="sync", r_domain=self._domain)
+                trigger_sink = trigger_cdc.sink
+                m.d.comb += trigger_cdc.source.connect(self._trigger_unit.sink)
+
+        # Take the trigger configuration out of the host commands
+        remaining = Signal(8)
+        config = stream.Endpoint([("data", 8)])
+        if trigger_sink is None:
+            m.d.comb += config.ready.eq(1)
+
+        with m.FSM(name="link"):
+            with m.State("COMMAND"):
+                with m.If(link_source.data == CMD_TRIGGER):
+                    m.d.comb += link_source.ready.eq(1)
+                    with m.If(link_source.valid):
+                        m.next = "LENGTH"
+                with m.Else():
+                    m.d.comb += link_source.connect(command_sink)
+                if trigger_sink is not None:
+                    m.d.comb += self.trigger_config.connect(trigger_sink)
+
+            with m.State("LENGTH"):
+                m.d.comb += link_source.ready.eq(1)
+                with m.If(link_source.valid):
+                    m.d.sync += remaining.eq(link_source.data)
+                    with m.If(link_source.data != 0):
+                        m.next = "CONFIG"
+                    with m.Else():
+                        m.next = "COMMAND"
+
+            with m.State("CONFIG"):
+                m.d.comb += [
+                    config.valid.eq(link_source.valid),
+                    config.data.eq(link_source.data),
+                    config.last.eq(remaining == 1),
+                    link_source.ready.eq(config.ready),
+                ]
+                if trigger_sink is not None:
+                    m.d.comb += config.connect(trigger_sink)
+                with m.If(link_source.valid & link_source.ready):
+                    m.d.sync += remaining.eq(remaining - 1)
+                    with m.If(remaining == 1):
+                        m.next = "COMMAND"
+
+        return m
+
+
+class ILAHub(Elaboratable):
+    """Read several ILAs out through a single link.
+
+    The ILAs, built with `readout="stream"`, are elaborated by the hub and
+    read out one after another through a `stream_utils.Arbiter`. Each
+    readout, or status reply, is preceded by a tag byte with the index of
+    the ILA in `ilas`. Host commands are sent to all the ILAs, e.g. a
+    CMD_STATUS gets one tagged reply per ILA, and a CMD_TRIGGER programs
+    the trigger of every ILA with the same configuration.
+
+    With `cross_trigger`, the trigger of any ILA also triggers the others
+    one cycle later, so that all the captures cover the same event. The
+    ILAs must then capture in the same clock domain.
+
+    The host tool writes all the captures into one VCD file, one scope
+    per ILA (`--ila name depth pre_trigger layout [options]`, once per
+    ILA, or `--hub count` when the ILAs are built with named signals).
+
+    Parameters:
+        ilas: List of ILA instances
+        sys_clk_freq: System clock frequency for serial baud rate calculation
+        baudrate: Serial baud rate
+        readout: "serial" for the `tx` output, "stream" for the `source` stream
+        cross_trigger: Trigger all the ILAs together
+
+    Attributes:
+        tx: Serial output for data readout
+        rx: Serial input for host commands
+        source: Byte stream for data readout
+        sink: Byte stream for host commands
+    """
+    def __init__(self, ilas, sys_clk_freq: int, baudrate: int = 115200,
+                 readout: str = "serial", cross_trigger: bool = True):
+        if not 0 < len(ilas) <= 256:
+            raise ValueError(f"Between 1 and 256 ILAs are supported, got {len(ilas)}")
+        if any(ila._readout != "stream" for ila in ilas):
+            raise ValueError("ILAs must be built with readout='stream'")
+        if readout not in ("serial", "stream"):
+            raise ValueError(f"readout must be 'serial' or 'stream', got {readout!r}")
+        if cross_trigger and len({ila._domain for ila in ilas}) > 1:
+            raise ValueError("Cross triggered ILAs must capture in the same clock domain")
+
+        self._ilas = list(ilas)
+        self._sys_clk_freq = sys_clk_freq
+        self._baudrate = baudrate
+        self._readout = readout
+        self._cross_trigger = cross_trigger
+
+        self.tx      = Signal()
+        self.rx      = Signal(reset=1)
+        self.source  = stream.Endpoint([("data", 8)])
+        self.sink    = stream.Endpoint([("data", 8)])
+
+    def elaborate(self, platform) -> Module:
+        m = Module()
+
+        command = stream.Endpoint([("data", 8)])
+        output = stream.Endpoint([("data", 8)])
+
+        if self._readout == "serial":
+            m.submodules.serial = serial = AsyncSerialStream(
+                divisor=self._sys_clk_freq // self._baudrate,
+            )
+            m.d.comb += [
+                serial.serial.rx.i.eq(self.rx),
+                self.tx.eq(serial.serial.tx.o),
+                serial.source.connect(command),
+                output.connect(serial.sink),
+            ]
+        else:
+            m.d.comb += [
+                self.sink.connect(command),
+                output.connect(self.source),
+            ]
+
+        # Prepend the tag to each transaction of the ILAs
+        tagged = []
+        for i, ila in enumerate(self._ilas):
+            m.submodules[f"ila{i}"] = ila
+
+            source = stream.Endpoint([("data", 8)], name=f"tagged{i}")
+            header = Signal(reset=1, name=f"header{i}")
+            with m.If(header):
+                m.d.comb += [
+                    source.valid.eq(ila.source.valid),
+                    source.data.eq(i),
+                ]
+                with m.If(source.valid & source.ready):
+                    m.d.sync += header.eq(0)
+            with m.Else():
+                m.d.comb += ila.source.connect(source)
+                with m.If(ila.source.valid & ila.source.ready &
+                          ila.source.last):
+                    m.d.sync += header.eq(1)
+            tagged.append(source)
+
+        m.submodules.arbiter = Arbiter(tagged, output)
+
+        # Broadcast the commands, once all the ILAs can take them
+        all_ready = Cat(ila.sink.ready for ila in self._ilas).all()
+        m.d.comb += command.ready.eq(all_ready)
+        for ila in self._ilas:
+            m.d.comb += [
+                ila.sink.data.eq(command.data),
+                ila.sink.valid.eq(command.valid & all_ready),
+            ]
+
+        # Registered to avoid a combinational loop through the ILAs
+        if self._cross_trigger and len(self._ilas) > 1:
+            domain = self._ilas[0]._domain
+            for ila in self._ilas:
+                others = [o.triggered for o in self._ilas if o is not ila]
+                m.d[domain] += ila.cross_trigger.eq(Cat(others).any())
 
         return m
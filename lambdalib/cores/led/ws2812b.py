@@ -97,6 +97,7 @@ class WS2812B(Elaboratable):
 
 from amaranth.sim import *
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 
 
 def test():
@@ -112,7 +113,7 @@ def test():
 
     sim.add_clock(1e-6)
     sim.add_sync_process(tx.sync_process)
-    with sim.write_vcd("test_ws2812b.vcd"):
+    with trace_vcd(sim, "test_ws2812b.vcd"):
         sim.run()
 
 
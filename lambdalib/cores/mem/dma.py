@@ -0,0 +1,217 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import *
+from amaranth_soc import wishbone
+
+from ...interface import stream
+
+
+__all__ = [
+    "dma_descriptor_layout",
+    "StreamToWishbone",
+    "WishboneToStream",
+]
+
+
+# Wishbone B4 cycle type identifiers
+CTI_CLASSIC     = 0b000
+CTI_CONST_BURST = 0b001
+CTI_INCR_BURST  = 0b010
+CTI_END_BURST   = 0b111
+
+
+def dma_descriptor_layout(addr_width, length_width=16):
+    return [
+        ("addr",    addr_width),    # Word address of the first transfer
+        ("length",  length_width),  # Number of words, 0 is ignored
+        ("fixed",   1),             # Keep the same address, e.g. a FIFO register
+    ]
+
+
+class _DMA(Elaboratable):
+    def __init__(self, width, addr_width, granularity, length_width,
+                 pipelined, max_pending):
+        self.width = width
+        self.addr_width = addr_width
+        self.granularity = granularity
+        self.pipelined = pipelined
+        self.max_pending = max_pending
+
+        self.desc = stream.Endpoint(dma_descriptor_layout(addr_width,
+                                                          length_width))
+        self.busy = Signal()
+
+        features = {"cti", "bte"}
+        if pipelined:
+            features.add("stall")
+
+        self.bus = wishbone.Interface(
+            addr_width=addr_width,
+            data_width=width,
+            granularity=granularity,
+            features=features,
+        )
+
+    def _request(self, m, issue):
+        """ Drive the bus request side from the current descriptor,
+        `issue` is high when a word can be requested. Returns the accepted
+        request and completed transfer strobes, and the number of requests
+        not acked yet. """
+        bus = self.bus
+        desc = self.desc
+
+        addr = Signal.like(desc.addr)
+        fixed = Signal()
+        remaining = Signal.like(desc.length)  # Words left to request
+        pending = Signal(range(self.max_pending + 1))
+
+        accept = Signal()
+        response = Signal()
+        last = remaining == 1
+
+        m.d.comb += [
+            bus.cyc.eq((remaining != 0) | (pending != 0)),
+            bus.adr.eq(addr),
+            bus.sel.eq(2**len(bus.sel) - 1),
+            bus.bte.eq(0),  # Linear burst
+        ]
+
+        if self.pipelined:
+            # Pipelined mode: a new request every cycle the slave
+            # does not stall, acks come back later.
+            m.d.comb += [
+                bus.stb.eq(issue & (remaining != 0) &
+                           (pending < self.max_pending)),
+                accept.eq(bus.stb & ~bus.stall),
+                response.eq(bus.ack),
+            ]
+        else:
+            # Registered feedback bursts: the slave sees the next
+            # address in advance from the cycle type and can ack
+            # one word per cycle.
+            m.d.comb += [
+                bus.stb.eq(issue & (remaining != 0)),
+                accept.eq(bus.stb & bus.ack),
+                response.eq(accept),
+            ]
+            with m.If(last):
+                m.d.comb += bus.cti.eq(CTI_END_BURST)
+            with m.Elif(fixed):
+                m.d.comb += bus.cti.eq(CTI_CONST_BURST)
+            with m.Else():
+                m.d.comb += bus.cti.eq(CTI_INCR_BURST)
+
+        with m.If(accept):
+            m.d.sync += remaining.eq(remaining - 1)
+            with m.If(~fixed):
+                m.d.sync += addr.eq(addr + 1)
+
+        if self.pipelined:
+            with m.If(accept & ~response):
+                m.d.sync += pending.eq(pending + 1)
+            with m.Elif(~accept & response):
+                m.d.sync += pending.eq(pending - 1)
+
+        # Load a new descriptor once the previous one is complete
+        m.d.comb += [
+            desc.ready.eq(~bus.cyc),
+            self.busy.eq(bus.cyc),
+        ]
+        with m.If(desc.valid & desc.ready):
+            m.d.sync += [
+                addr.eq(desc.addr),
+                fixed.eq(desc.fixed),
+                remaining.eq(desc.length),
+            ]
+
+        return accept, response, pending
+
+
+class StreamToWishbone(_DMA):
+    """ Write a data stream to a Wishbone bus.
+
+    Each descriptor received on the `desc` stream moves `length` words
+    from the `sink` stream to the bus, starting at the word address
+    `addr`, incrementing it unless `fixed` is set. Descriptors are
+    processed in order, the next one is loaded once all the writes of
+    the current one are acknowledged.
+
+    By default the words are written with Wishbone B4 registered feedback
+    bursts (incrementing or constant address cycle types), so that a
+    burst capable slave acks one word per cycle. With `pipelined=True`
+    the bus uses pipelined mode instead and keeps up to `max_pending`
+    writes in flight.
+
+    `busy` is high while a descriptor is being processed.
+    """
+    def __init__(self, width=32, addr_width=30, granularity=8,
+                 length_width=16, pipelined=False, max_pending=16):
+        super().__init__(width, addr_width, granularity, length_width,
+                         pipelined, max_pending)
+        self.sink = stream.Endpoint([("data", width)])
+
+    def elaborate(self, platform):
+        sink = self.sink
+        bus = self.bus
+
+        m = Module()
+
+        accept, _, _ = self._request(m, issue=sink.valid)
+
+        m.d.comb += [
+            bus.we.eq(1),
+            bus.dat_w.eq(sink.data),
+            sink.ready.eq(accept),
+        ]
+
+        return m
+
+
+class WishboneToStream(_DMA):
+    """ Read a data stream from a Wishbone bus.
+
+    Each descriptor received on the `desc` stream reads `length` words
+    from the bus, starting at the word address `addr`, incrementing it
+    unless `fixed` is set, and sends them to the `source` stream with
+    `last` set on the final word of the descriptor.
+
+    Read data goes through a FIFO of `max_pending` words: requests are
+    only issued when there is room for their response, so the bus is
+    never stalled by the `source` stream and bursts run at one word per
+    cycle as long as the FIFO is drained. Bus modes are the same as for
+    `StreamToWishbone`.
+    """
+    def __init__(self, width=32, addr_width=30, granularity=8,
+                 length_width=16, pipelined=False, max_pending=16):
+        super().__init__(width, addr_width, granularity, length_width,
+                         pipelined, max_pending)
+        self.fifo = stream.SyncFIFO([("data", width)], max_pending,
+                                    buffered=True)
+        self.source = self.fifo.source
+
+    def elaborate(self, platform):
+        bus = self.bus
+
+        m = Module()
+        m.submodules.fifo = fifo = self.fifo
+
+        # Responses still to come plus stored words must fit the FIFO
+        room = Signal()
+        _, response, pending = self._request(m, issue=room)
+        m.d.comb += room.eq(fifo.level + pending < fifo.depth)
+
+        # Tag the final response of the descriptor
+        acked = Signal.like(self.desc.length)
+        with m.If(self.desc.valid & self.desc.ready):
+            m.d.sync += acked.eq(self.desc.length)
+        with m.Elif(response):
+            m.d.sync += acked.eq(acked - 1)
+
+        m.d.comb += [
+            bus.we.eq(0),
+            fifo.sink.valid.eq(response),
+            fifo.sink.data.eq(bus.dat_r),
+            fifo.sink.last.eq(acked == 1),
+        ]
+
+        return m
@@ -2,6 +2,7 @@
 
 from amaranth import *
 from amaranth.sim import *
+from amaranth.utils import bits_for, log2_int
 
 from ...interface import stream
 from ...interface.stream_sim import *
@@ -9,7 +10,9 @@ from ...interface.stream_sim import *
 
 __all__ = [
     "MemoryStream",
+    "MemoryStreamPingPong",
     "MemoryStreamReader",
+    "rle_encode",
 ]
 
 
@@ -26,18 +29,51 @@ class MemoryStream(Elaboratable):
     - Rewind the MemoryStream by setting `rewind` to 1.
     - Read at most n values from the `source` stream.
 
+    A sub-range can be replayed by setting `offset` and `length` along
+    with `rewind`: reading then starts at `offset` and `last` is set
+    after `length` values (or at the end of the written data).
+    A `length` of 0 reads up to the end of the written data.
+
+    Occupancy is reported for producers to size their bursts:
+    - `level` is the number of values stored and readable. Writing after
+      a rewind starts again from the beginning of the memory.
+    - `full` is set when `depth` values are written since the last
+      rewind, further writes are refused (`sink.ready` low).
+    - `overflow` is set when a value is presented while full, e.g. by a
+      producer that does not check `sink.ready`, and is held until the
+      next rewind.
+    - `almost_full` is set when the values written since the last rewind
+      reach the programmable `watermark`, which defaults to `depth`.
+
+    With `circular=True` the memory is a ring buffer: writes are never
+    refused and overwrite the oldest values once `depth` values are
+    stored, `full` then stays set. A rewind does not restart writing,
+    reading starts from the oldest stored value (plus `offset`), so that
+    the last `depth` values can be read in order, e.g. for pre-trigger
+    capture. `level` and `almost_full` count all the values written,
+    up to `depth`. Apply a reset to clear the buffer.
+
     The output stream is buffered by default, e.g. a sync gate is added
     to the output stream for critical path reduction, with an additional
     clock cycle delay cost at the beginning of the read operation.
     """
-    def __init__(self, dw, depth, buffered=True):
+    def __init__(self, dw, depth, buffered=True, circular=False):
         self.dw = dw
         self.depth = depth
         self.buffered = buffered
+        self.circular = circular
 
         self.rewind = Signal()
+        self.offset = Signal(range(depth))
+        self.length = Signal(range(depth + 1))
         self.sink = stream.Endpoint([("data", dw)], name="sink_mem_i")
 
+        self.level = Signal(range(depth + 1))
+        self.full = Signal()
+        self.overflow = Signal()
+        self.watermark = Signal(range(depth + 1), reset=depth)
+        self.almost_full = Signal()
+
         if self.buffered:
             self.buffer = ResetInserter(self.rewind)(
                                 stream.PipeValid([("data", dw)]))
@@ -59,26 +95,49 @@ class MemoryStream(Elaboratable):
         m.submodules.mem_wp = mem_wp = mem.write_port()
         m.submodules.mem_rp = mem_rp = mem.read_port(transparent=False)
 
-        addr_wr = Signal.like(mem_wp.addr)
+        addr_wr = Signal(range(self.depth + 1))
         addr_rd = Signal.like(mem_rp.addr)
         addr_nxt = Signal.like(mem_rp.addr)
 
-        level = Signal(range(self.depth + 1))
-        underflow = (addr_rd >= level)
-        last = addr_rd == (level - 1)
+        level = self.level
+
+        # End of the replayed range, bounded by the written data
+        end = Signal(range(2 * self.depth + 1), reset=self.depth)
+        stop = Signal(range(self.depth + 1))
+        with m.If(end < level):
+            m.d.comb += stop.eq(end)
+        with m.Else():
+            m.d.comb += stop.eq(level)
+
+        underflow = (addr_rd >= stop)
+        last = addr_rd == (stop - 1)
 
-        # Rewind the memory to the beginning
+        # Rewind the memory to the beginning of the range
         with m.If(self.rewind):
-            m.d.sync += addr_wr.eq(0)
-            m.d.sync += addr_rd.eq(0)
-            m.d.comb += addr_nxt.eq(0)
+            if not self.circular:
+                m.d.sync += addr_wr.eq(0)
+            m.d.sync += self.overflow.eq(0)
+            m.d.sync += addr_rd.eq(self.offset)
+            m.d.comb += addr_nxt.eq(self.offset)
+            with m.If(self.length != 0):
+                m.d.sync += end.eq(self.offset + self.length)
+            with m.Else():
+                m.d.sync += end.eq(self.depth)
 
         # We increment the address when writing or reading,
         # and we already present the next address to the read memory port
         # to anticipate one clock cycle.
         with m.Elif(sink.valid & sink.ready):
-            m.d.sync += addr_wr.eq(addr_wr + 1)
-            m.d.sync += level.eq(addr_wr + 1)
+            if self.circular:
+                with m.If(addr_wr == self.depth - 1):
+                    m.d.sync += addr_wr.eq(0)
+                with m.Else():
+                    m.d.sync += addr_wr.eq(addr_wr + 1)
+                with m.If(level != self.depth):
+                    m.d.sync += level.eq(level + 1)
+            else:
+                m.d.sync += addr_wr.eq(addr_wr + 1)
+                m.d.sync += level.eq(addr_wr + 1)
 
         with m.Elif(source.valid & source.ready):
             m.d.comb += addr_nxt.eq(addr_rd + 1)
@@ -91,13 +150,42 @@ class MemoryStream(Elaboratable):
         m.d.comb += [
             mem_wp.addr.eq(addr_wr),
             mem_wp.data.eq(sink.data),
-            mem_wp.en.eq(sink.valid),
-            sink.ready.eq(~self.rewind),
+            mem_wp.en.eq(sink.valid & sink.ready),
         ]
 
+        # Occupancy
+        if self.circular:
+            m.d.comb += [
+                sink.ready.eq(~self.rewind),
+                self.full.eq(level == self.depth),
+                self.almost_full.eq(level >= self.watermark),
+            ]
+        else:
+            m.d.comb += [
+                sink.ready.eq(~self.rewind & ~self.full),
+                self.full.eq(addr_wr == self.depth),
+                self.almost_full.eq(addr_wr >= self.watermark),
+            ]
+            with m.If(sink.valid & self.full & ~self.rewind):
+                m.d.sync += self.overflow.eq(1)
+
+        # Read addresses are relative to the oldest value of the ring
+        if self.circular:
+            base = Signal.like(addr_wr)
+            addr_mem = Signal(range(2 * self.depth))
+            m.d.comb += [
+                base.eq(Mux(self.full, addr_wr, 0)),
+                addr_mem.eq(addr_nxt + base),
+            ]
+            with m.If(addr_mem >= self.depth):
+                m.d.comb += mem_rp.addr.eq(addr_mem - self.depth)
+            with m.Else():
+                m.d.comb += mem_rp.addr.eq(addr_mem)
+        else:
+            m.d.comb += mem_rp.addr.eq(addr_nxt)
+
         # Read
         m.d.comb += [
-            mem_rp.addr.eq(addr_nxt),
             mem_rp.en.eq(1),
             source.valid.eq(~self.rewind & ~sink.valid & ~underflow),
             source.data.eq(mem_rp.data),
@@ -107,6 +195,156 @@ class MemoryStream(Elaboratable):
         return m
 
 
+class MemoryStreamPingPong(Elaboratable):
+    """ Double buffered memory with a stream interface.
+
+    The memory is split into two banks of `depth` elements: one frame is
+    written into one bank while the previous frame is read from the other
+    one, so that filling and draining happen at the same time.
+
+    A frame is complete when its `last` element is written, when the
+    bank is full, or when `swap` is asserted (the frame then ends at the
+    last written element). The writer then moves to the other bank, and
+    is backpressured while that bank is still being read.
+
+    The reader waits for a complete frame, reads it with `last` set on
+    its final element and then releases the bank. When `repeat` is set,
+    the reader keeps replaying the same frame until the next one is
+    complete, e.g. to refresh a display from a framebuffer.
+
+    The output stream is buffered by default, e.g. a sync gate is added
+    to the output stream for critical path reduction.
+    """
+    def __init__(self, dw, depth, buffered=True, repeat=False):
+        self.dw = dw
+        self.depth = depth
+        self.buffered = buffered
+        self.repeat = repeat
+
+        self.swap = Signal()
+        self.sink = stream.Endpoint([("data", dw)], name="sink_mem_i")
+
+        if self.buffered:
+            self.buffer = stream.PipeValid([("data", dw)])
+            self.source = self.buffer.source
+        else:
+            self.source = stream.Endpoint([("data", dw)])
+
+    def elaborate(self, platform):
+        sink = self.sink
+        source = self.buffer.sink if self.buffered else self.source
+
+        m = Module()
+
+        # Synchronous buffer for outgoing memory reads
+        if self.buffered:
+            m.submodules.buffer = self.buffer
+
+        mem = Memory(depth=2 * self.depth, width=self.dw)
+        m.submodules.mem_wp = mem_wp = mem.write_port()
+        m.submodules.mem_rp = mem_rp = mem.read_port(transparent=False)
+
+        # Per bank state: complete frame available and its length
+        full   = Array([Signal(name=f"full_{i}") for i in range(2)])
+        full_d = Array([Signal(name=f"full_d_{i}") for i in range(2)])
+        level  = Array([Signal(range(self.depth + 1), name=f"level_{i}")
+                        for i in range(2)])
+
+        for i in range(2):
+            m.d.sync += full_d[i].eq(full[i])
+
+        # Write side
+        wr_bank = Signal()
+        wr_addr = Signal(range(self.depth))
+        wr_last = (wr_addr == self.depth - 1) | sink.last
+
+        m.d.comb += [
+            mem_wp.addr.eq(Cat(wr_addr, wr_bank)),
+            mem_wp.data.eq(sink.data),
+            mem_wp.en.eq(sink.valid & sink.ready),
+            sink.ready.eq(~full[wr_bank]),
+        ]
+
+        with m.If(sink.valid & sink.ready):
+            with m.If(wr_last):
+                m.d.sync += [
+                    full[wr_bank].eq(1),
+                    level[wr_bank].eq(wr_addr + 1),
+                    wr_bank.eq(~wr_bank),
+                    wr_addr.eq(0),
+                ]
+            with m.Else():
+                m.d.sync += wr_addr.eq(wr_addr + 1)
+
+        with m.Elif(self.swap & ~full[wr_bank] & (wr_addr != 0)):
+            m.d.sync += [
+                full[wr_bank].eq(1),
+                level[wr_bank].eq(wr_addr),
+                wr_bank.eq(~wr_bank),
+                wr_addr.eq(0),
+            ]
+
+        # Read side
+        rd_bank = Signal()
+        rd_addr = Signal(range(self.depth))
+        nxt_bank = Signal()
+        nxt_addr = Signal.like(rd_addr)
+        rd_last = (rd_addr == level[rd_bank] - 1)
+
+        m.d.comb += [
+            nxt_bank.eq(rd_bank),
+            nxt_addr.eq(rd_addr),
+        ]
+
+        with m.If(source.valid & source.ready):
+            with m.If(rd_last):
+                m.d.comb += nxt_addr.eq(0)
+
+                # Keep replaying the current frame until the next one
+                # is complete, or release the bank.
+                if self.repeat:
+                    with m.If(full[~rd_bank]):
+                        m.d.comb += nxt_bank.eq(~rd_bank)
+                        m.d.sync += full[rd_bank].eq(0)
+                else:
+                    m.d.comb += nxt_bank.eq(~rd_bank)
+                    m.d.sync += full[rd_bank].eq(0)
+
+            with m.Else():
+                m.d.comb += nxt_addr.eq(rd_addr + 1)
+
+        m.d.sync += [
+            rd_bank.eq(nxt_bank),
+            rd_addr.eq(nxt_addr),
+        ]
+
+        # We present the next address to the read memory port to
+        # anticipate one clock cycle. A newly completed bank is only
+        # read one cycle after being marked full, to let its last write
+        # land in memory.
+        m.d.comb += [
+            mem_rp.addr.eq(Cat(nxt_addr, nxt_bank)),
+            mem_rp.en.eq(1),
+            source.valid.eq(full[rd_bank] & full_d[rd_bank]),
+            source.data.eq(mem_rp.data),
+            source.last.eq(rd_last),
+        ]
+
+        return m
+
+
+def rle_encode(data, max_run=256):
+    """ Run-length encode `data` into a list of (value, count) runs,
+    with at most `max_run` repetitions per run. """
+    runs = []
+    for value in data:
+        if runs and runs[-1][0] == value and runs[-1][1] < max_run:
+            runs[-1] = (value, runs[-1][1] + 1)
+        else:
+            runs.append((value, 1))
+    return runs
+
+
 class MemoryStreamReader(Elaboratable):
     """ Read from a read-only memory with a stream interface.
 
@@ -119,17 +357,41 @@ class MemoryStreamReader(Elaboratable):
     - Read at most n values from the `source` stream.
     - Rewind [...]
 
+    A sub-range of the memory can be played by setting `offset` and
+    `length` along with `rewind`, e.g. to store several sequences in
+    a single ROM. A `length` of 0 reads up to the end of the memory.
+
+    The `init` buffer can be stored in less memory:
+    - `pack` elements are packed into each memory word, e.g. 4 bytes
+      per 36 bits block RAM word instead of one. `pack` must be a
+      power of 2.
+    - `rle` run-length encodes the buffer, each memory word holds a
+      value and its repeat count, up to `max_run`. When seeking into a
+      run-length encoded buffer, the runs before `offset` are skipped
+      at one run per clock cycle before the first value is sent.
+
+    In all cases values are read at full rate.
+
     The output stream is buffered by default, e.g. a sync gate is added
     to the output stream for critical path reduction, with an additional
     clock cycle delay cost at the beginning of the read operation.
     """
-    def __init__(self, dw, init, buffered=True):
+    def __init__(self, dw, init, buffered=True, pack=1, rle=False,
+                 max_run=256):
+        assert pack & (pack - 1) == 0
+        assert not (rle and pack > 1)
+
         self.dw = dw
         self.init = init
         self.buffered = buffered
+        self.pack = pack
+        self.rle = rle
+        self.max_run = max_run
 
         self.done = Signal()
         self.rewind = Signal()
+        self.offset = Signal(range(len(init)))
+        self.length = Signal(range(len(init) + 1))
         self.source = stream.Endpoint([("data", dw)], name="source_mem_o")
 
         if self.buffered:
@@ -139,6 +401,24 @@ class MemoryStreamReader(Elaboratable):
         else:
             self.source = stream.Endpoint([("data", dw)])
 
+    def _memory(self):
+        mask = 2**self.dw - 1
+
+        if self.rle:
+            runs = rle_encode(self.init, self.max_run)
+            cw = bits_for(self.max_run - 1)
+            init = [(value & mask) | ((count - 1) << self.dw)
+                    for value, count in runs]
+            return Memory(depth=len(init), width=self.dw + cw, init=init)
+
+        init = []
+        for i in range(0, len(self.init), self.pack):
+            word = 0
+            for j, value in enumerate(self.init[i:i + self.pack]):
+                word |= (value & mask) << (j * self.dw)
+            init.append(word)
+        return Memory(depth=len(init), width=self.dw * self.pack, init=init)
+
     def elaborate(self, platform):
         source = self.buffer.sink if self.buffered else self.source
 
@@ -149,21 +429,76 @@ class MemoryStreamReader(Elaboratable):
             m.submodules.buffer = self.buffer
 
         depth = len(self.init)
-        mem = Memory(depth=depth, width=self.dw, init=self.init)
+        mem = self._memory()
         m.submodules.mem_rp = mem_rp = mem.read_port(transparent=False)
 
         wait = Signal(reset=1)
 
-        addr_rd = Signal.like(mem_rp.addr)
-        addr_nxt = Signal.like(mem_rp.addr)
-
-        last = addr_rd == (depth - 1)
+        # Element indexes
+        addr_rd = Signal(range(depth))
+        addr_nxt = Signal.like(addr_rd)
+
+        end = Signal(range(2 * depth + 1), reset=depth)
+        last = (addr_rd == (end - 1)) | (addr_rd == (depth - 1))
+
+        # Run-length decoding state: the current run, the repetitions
+        # already sent from it and the elements left to skip when seeking.
+        if self.rle:
+            run = Signal.like(mem_rp.addr)
+            run_nxt = Signal.like(mem_rp.addr)
+            rep = Signal(range(self.max_run))
+            rep_last = Signal(range(self.max_run))
+            skip = Signal.like(self.offset)
+            left = Signal(range(self.max_run + 1))
+
+            m.d.comb += [
+                rep_last.eq(mem_rp.data[self.dw:]),
+                left.eq(rep_last + 1 - rep),
+                run_nxt.eq(run),
+            ]
+            m.d.sync += run.eq(run_nxt)
+
+            seeking = skip != 0
+            step = source.valid & source.ready & (rep == rep_last)
+        else:
+            seeking = C(0)
 
-        # Rewind the memory to the beginning
+        # Rewind the memory to the beginning of the range
         with m.If(self.rewind):
             m.d.sync += self.done.eq(0)
-            m.d.sync += addr_rd.eq(0)
-            m.d.comb += addr_nxt.eq(0)
+            with m.If(self.length != 0):
+                m.d.sync += end.eq(self.offset + self.length)
+            with m.Else():
+                m.d.sync += end.eq(depth)
+
+            if self.rle:
+                # Decode from the first run and skip up to the offset
+                m.d.sync += [
+                    addr_rd.eq(0),
+                    rep.eq(0),
+                    skip.eq(self.offset),
+                ]
+                m.d.comb += run_nxt.eq(0)
+            else:
+                m.d.sync += addr_rd.eq(self.offset)
+                m.d.comb += addr_nxt.eq(self.offset)
+
+        # Skip the elements before the offset, one run per cycle
+        with m.Elif(~wait & seeking):
+            if self.rle:
+                with m.If(left <= skip):
+                    m.d.sync += [
+                        skip.eq(skip - left),
+                        addr_rd.eq(addr_rd + left),
+                        rep.eq(0),
+                    ]
+                    m.d.comb += run_nxt.eq(run + 1)
+                with m.Else():
+                    m.d.sync += [
+                        skip.eq(0),
+                        addr_rd.eq(addr_rd + skip),
+                        rep.eq(rep + skip),
+                    ]
 
         # We increment the address when reading,
         # and we already present the next address to the read memory port
@@ -172,6 +507,13 @@ class MemoryStreamReader(Elaboratable):
             m.d.comb += addr_nxt.eq(addr_rd + 1)
             m.d.sync += addr_rd.eq(addr_nxt)
 
+            if self.rle:
+                with m.If(step):
+                    m.d.sync += rep.eq(0)
+                    m.d.comb += run_nxt.eq(run + 1)
+                with m.Else():
+                    m.d.sync += rep.eq(rep + 1)
+
             with m.If(last):
                 m.d.sync += self.done.eq(1)
 
@@ -179,11 +521,23 @@ class MemoryStreamReader(Elaboratable):
             m.d.comb += addr_nxt.eq(addr_rd)
 
         # Read
+        if self.rle:
+            m.d.comb += [
+                mem_rp.addr.eq(run_nxt),
+                source.data.eq(mem_rp.data[:self.dw]),
+            ]
+        else:
+            # Select the element from the packed word
+            lane_bits = log2_int(self.pack)
+            m.d.comb += [
+                mem_rp.addr.eq(addr_nxt[lane_bits:]),
+                source.data.eq(mem_rp.data.word_select(
+                    addr_rd[:lane_bits], self.dw)),
+            ]
+
         m.d.comb += [
-            mem_rp.addr.eq(addr_nxt),
             mem_rp.en.eq(1),
-            source.valid.eq(~self.rewind & ~wait & ~self.done),
-            source.data.eq(mem_rp.data),
+            source.valid.eq(~self.rewind & ~wait & ~self.done & ~seeking),
             source.last.eq(last),
         ]
 
@@ -196,6 +550,7 @@ class MemoryStreamReader(Elaboratable):
 
 from amaranth.sim import *
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 
 
 def test_mem_stream():
@@ -231,7 +586,7 @@ def test_mem_stream():
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(rewind)
     sim.add_sync_process(receiver.sync_process)
-    with sim.write_vcd("tests/test_mem_stream.vcd"):
+    with trace_vcd(sim, "tests/test_mem_stream.vcd"):
         sim.run()
 
     receiver.verify(datas)
@@ -263,7 +618,7 @@ def test_mem_stream_reader():
     sim.add_clock(1e-6)
     sim.add_sync_process(receiver.sync_process)
     sim.add_sync_process(rewind)
-    with sim.write_vcd("tests/test_mem_stream_reader.vcd"):
+    with trace_vcd(sim, "tests/test_mem_stream_reader.vcd"):
         sim.run()
 
 
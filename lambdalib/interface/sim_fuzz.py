@@ -0,0 +1,202 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import os
+import json
+import pickle
+import random
+import itertools
+import statistics
+from concurrent.futures import ProcessPoolExecutor
+
+from .stream_sim import StreamSimReceiver
+from .sim_session import *
+
+
+__all__ = [
+    "StreamFuzzer",
+    "FuzzReport",
+]
+
+
+# One session per worker process and per design factory,
+# so that each worker elaborates the design only once.
+# Factories are keyed by their pickle, which is how they reach the
+# workers: `functools.partial` objects of different arguments differ.
+_sessions = {}
+
+
+def _get_session(make_dut):
+    key = pickle.dumps(make_dut)
+    if key not in _sessions:
+        dut = make_dut()
+        _sessions[key] = (dut, SimSession(dut))
+    return _sessions[key]
+
+
+def _run_one(make_dut, make_bench, config, max_cycles):
+    dut, session = _get_session(make_dut)
+
+    random.seed(config.get("seed"))
+    bench = make_bench(dut, **config)
+    if isinstance(bench, tuple):
+        processes, check = bench
+    else:
+        processes, check = bench, None
+
+    run = session.run(processes, check=check, seed=config.get("seed"),
+                      max_cycles=max_cycles, config=config)
+
+    transfers = sum(len(p.data["last"]) for p in processes
+                    if isinstance(p, StreamSimReceiver))
+
+    return {
+        "config":    config,
+        "ok":        run.ok,
+        "error":     None if run.ok else repr(run.error),
+        "cycles":    run.cycles,
+        "elapsed":   run.elapsed,
+        "transfers": transfers,
+    }
+
+
+def _run_chunk(make_dut, make_bench, configs, max_cycles):
+    return [_run_one(make_dut, make_bench, config, max_cycles)
+            for config in configs]
+
+
+class FuzzReport:
+    """ Aggregated results of a `StreamFuzzer` campaign.
+
+    Attributes:
+        runs:     one dict per run with the config, status, cycle count,
+                  wall time and number of transfers seen by receivers.
+        failures: the runs that failed, their config (including the seed)
+                  replays the exact same schedule.
+    """
+    def __init__(self, runs):
+        self.runs = runs
+        self.failures = [r for r in runs if not r["ok"]]
+
+    @property
+    def ok(self):
+        return not self.failures
+
+    def throughput(self):
+        """ Transfers per cycle statistics, grouped by speed combination. """
+        groups = {}
+        for r in self.runs:
+            if not r["ok"] or not r["cycles"]:
+                continue
+            key = tuple(sorted((k, v) for k, v in r["config"].items()
+                               if k != "seed"))
+            groups.setdefault(key, []).append(r["transfers"] / r["cycles"])
+
+        stats = {}
+        for key, values in groups.items():
+            stats[key] = {
+                "runs": len(values),
+                "min":  min(values),
+                "mean": statistics.mean(values),
+                "max":  max(values),
+            }
+        return stats
+
+    def save_failures(self, filename):
+        """ Write the failing configs to a JSON file for later replay. """
+        with open(filename, "w") as f:
+            json.dump(self.failures, f, indent=2)
+
+    def summary(self):
+        lines = [f"{len(self.runs)} runs, {len(self.failures)} failures"]
+        for key, s in self.throughput().items():
+            params = ", ".join(f"{k}={v}" for k, v in key)
+            lines.append(f"  {params}: {s['runs']} runs, throughput "
+                         f"min {s['min']:.3f} mean {s['mean']:.3f} "
+                         f"max {s['max']:.3f} per cycle")
+        for r in self.failures:
+            lines.append(f"  FAILED {r['config']}: {r['error']}")
+        return "\n".join(lines)
+
+
+class StreamFuzzer:
+    """ Run a stream testbench under many seeds and speeds in parallel.
+
+    `make_dut()` builds the design under test and `make_bench(dut, seed,
+    **params)` returns the list of processes of one run, or a (processes,
+    check) tuple. Both must be module level functions so that they can
+    be sent to the worker processes. Each worker elaborates the design
+    once and reuses it for all of its runs through a `SimSession`.
+
+    The bench is expected to pass `seed` (or seeds derived from it) to
+    its `StreamSimSender` and `StreamSimReceiver` instances, the global
+    `random` module is also seeded before each run.
+
+    Example:
+        fuzzer = StreamFuzzer(make_dut, make_bench,
+                              speed_tx=[0.1, 0.5, 1], speed_rx=[0.1, 0.5, 1])
+        report = fuzzer.run(seeds=range(100))
+        print(report.summary())
+        for failure in report.failures:
+            fuzzer.replay(failure["config"])
+    """
+    def __init__(self, make_dut, make_bench, max_cycles=None, **params):
+        self.make_dut = make_dut
+        self.make_bench = make_bench
+        self.max_cycles = max_cycles
+        self.params = params
+
+    def configs(self, seeds):
+        names = list(self.params.keys())
+        values = [self.params[k] for k in names]
+        for seed in seeds:
+            for combination in itertools.product(*values):
+                config = dict(zip(names, combination))
+                config["seed"] = seed
+                yield config
+
+    def run(self, seeds, workers=None, chunksize=None):
+        """ Fuzz all parameter combinations for each seed of `seeds`.
+
+        Runs are spread over `workers` processes (all CPUs by default),
+        `workers=0` runs everything in the current process.
+        """
+        configs = list(self.configs(seeds))
+        if workers is None:
+            workers = os.cpu_count() or 1
+
+        if workers == 0:
+            runs = _run_chunk(self.make_dut, self.make_bench,
+                              configs, self.max_cycles)
+            return FuzzReport(runs)
+
+        if chunksize is None:
+            chunksize = max(1, len(configs) // (4 * workers))
+        chunks = [configs[i:i + chunksize]
+                  for i in range(0, len(configs), chunksize)]
+
+        runs = []
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, self.make_dut, self.make_bench,
+                                   chunk, self.max_cycles)
+                       for chunk in chunks]
+            for future in futures:
+                runs += future.result()
+
+        return FuzzReport(runs)
+
+    def replay(self, config, raise_on_error=True):
+        """ Run a single config again in the current process,
+        e.g. a failing one from `FuzzReport.failures`. """
+        dut = self.make_dut()
+        session = SimSession(dut)
+
+        random.seed(config.get("seed"))
+        bench = self.make_bench(dut, **config)
+        if isinstance(bench, tuple):
+            processes, check = bench
+        else:
+            processes, check = bench, None
+
+        return session.run(processes, check=check, seed=config.get("seed"),
+                           max_cycles=self.max_cycles, config=config,
+                           raise_on_error=raise_on_error)
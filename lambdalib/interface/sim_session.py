@@ -0,0 +1,175 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import time
+import random
+
+from amaranth import *
+from amaranth.sim import *
+
+
+__all__ = [
+    "SimSession",
+    "SimRun",
+]
+
+
+class SimRun:
+    """ Result of one `SimSession` run.
+
+    Attributes:
+        config:  the configuration passed to the bench factory.
+        seed:    the seed of the `random` module for this run, if any.
+        cycles:  number of clock cycles simulated.
+        elapsed: wall clock time of the run, in seconds.
+        result:  value returned by the check function, if any.
+        error:   exception raised by the processes or the check, if any.
+    """
+    def __init__(self, config=None, seed=None):
+        self.config = config
+        self.seed = seed
+        self.cycles = 0
+        self.elapsed = 0.0
+        self.result = None
+        self.error = None
+
+    @property
+    def ok(self):
+        return self.error is None
+
+    def __repr__(self):
+        status = "ok" if self.ok else f"FAILED: {self.error!r}"
+        return "<SimRun config={} seed={} cycles={} elapsed={:.3f}s {}>".format(
+            self.config, self.seed, self.cycles, self.elapsed, status)
+
+
+class SimSession:
+    """ Elaborate a design once and run it against many stimulus sets.
+
+    Building a `Simulator` elaborates and compiles the whole design, which
+    often costs more than the simulation itself for short testbenches.
+    A session keeps a single simulator and resets it between runs: every
+    signal returns to its reset value and the processes of the new run
+    are started from scratch.
+
+    Processes are sync processes (generator functions) or objects with a
+    `sync_process` method such as `StreamSimSender` and `StreamSimReceiver`.
+
+    Example:
+        session = SimSession(dut)
+
+        def bench(speed):
+            tx = StreamSimSender(dut.sink, data, speed=speed)
+            rx = StreamSimReceiver(dut.source, length=len(data), speed=speed)
+            return [tx, rx], lambda: rx.verify({"data": data})
+
+        runs = session.sweep(bench, [{"speed": s} for s in (0.1, 0.5, 1)])
+        assert all(run.ok for run in runs)
+    """
+    def __init__(self, dut, period=1e-6, domain="sync"):
+        self.dut = dut
+        self.domain = domain
+
+        self.sim = Simulator(dut)
+        self.sim.add_clock(period, domain=domain)
+
+        self._procs = []
+        self._slots = 0
+        self._cycles = 0
+
+        self.sim.add_sync_process(self._counter, domain=domain)
+
+    def _counter(self):
+        self._cycles = 0
+        yield Passive()
+        while True:
+            yield
+            self._cycles += 1
+
+    def _slot(self, i):
+        # Slots are permanently registered into the simulator,
+        # each one runs the i-th process of the current run when
+        # the simulator is reset.
+        def process():
+            if i < len(self._procs):
+                yield from self._procs[i]()
+            else:
+                yield Passive()
+        return process
+
+    def _grow(self, n):
+        while self._slots < n:
+            self.sim.add_sync_process(self._slot(self._slots),
+                                      domain=self.domain)
+            self._slots += 1
+
+    def run(self, processes, check=None, seed=None, max_cycles=None,
+            config=None, raise_on_error=False):
+        """ Reset the design and run it with `processes`.
+
+        `check` is called after the simulation completes, its return
+        value is stored into the result. When `seed` is given, the global
+        `random` module is seeded before the run, making the randomized
+        stream simulators reproducible. The run fails with a
+        `TimeoutError` when it lasts more than `max_cycles`.
+        """
+        procs = []
+        for p in processes:
+            procs.append(p.sync_process if hasattr(p, "sync_process") else p)
+
+        res = SimRun(config=config, seed=seed)
+        self._procs = procs
+        self._grow(len(procs))
+
+        if seed is not None:
+            random.seed(seed)
+
+        start = time.perf_counter()
+        try:
+            self.sim.reset()
+            while self.sim.advance():
+                if max_cycles is not None and self._cycles >= max_cycles:
+                    raise TimeoutError(f"Run exceeded {max_cycles} cycles")
+            if check is not None:
+                res.result = check()
+        except Exception as e:
+            res.error = e
+            if raise_on_error:
+                raise
+        finally:
+            res.cycles = self._cycles
+            res.elapsed = time.perf_counter() - start
+            self._procs = []
+
+        return res
+
+    def sweep(self, factory, configs, seed=None, max_cycles=None,
+              raise_on_error=False, verbose=False):
+        """ Run `factory(**config)` for each config of `configs`.
+
+        The factory returns the list of processes of the run, or a
+        (processes, check) tuple. A "seed" key in a config is used to
+        seed the run and is not passed to the factory.
+
+        Returns the list of `SimRun` results.
+        """
+        runs = []
+        for config in configs:
+            config = dict(config)
+            run_seed = config.pop("seed", seed)
+
+            if run_seed is not None:
+                random.seed(run_seed)
+            bench = factory(**config)
+            if isinstance(bench, tuple):
+                processes, check = bench
+            else:
+                processes, check = bench, None
+
+            run = self.run(processes, check=check, seed=run_seed,
+                           max_cycles=max_cycles, config=config,
+                           raise_on_error=raise_on_error)
+            if verbose:
+                print(run)
+            runs.append(run)
+
+        return runs
@@ -0,0 +1,272 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import os
+import gzip
+import contextlib
+from collections import deque
+
+from amaranth import *
+from amaranth.hdl.rec import Record
+from amaranth.sim import Settle, Passive
+
+
+__all__ = [
+    "trace_vcd",
+    "SimTracer",
+]
+
+
+ENV_ENABLE   = "LAMBDALIB_VCD"
+ENV_COMPRESS = "LAMBDALIB_VCD_COMPRESS"
+ENV_WINDOW   = "LAMBDALIB_VCD_WINDOW"
+ENV_LAST     = "LAMBDALIB_VCD_LAST"
+
+
+def _env_flag(name, default=False):
+    val = os.environ.get(name)
+    if val is None:
+        return default
+    return val.strip().lower() not in ("", "0", "no", "false", "off")
+
+
+def _env_window():
+    val = os.environ.get(ENV_WINDOW)
+    if not val:
+        return None
+    start, _, stop = val.partition(":")
+    return (int(start) if start else None,
+            int(stop)  if stop  else None)
+
+
+def _env_last():
+    val = os.environ.get(ENV_LAST)
+    return int(val) if val else None
+
+
+def _collect(obj, scope, name, out, visited):
+    """ Flatten `obj` into a list of (scope, name, signal) tuples.
+
+    `obj` can be a Signal, a Record (e.g. a stream Endpoint), a list or
+    dict of those, or any object (typically an Elaboratable) whose public
+    attributes are collected recursively.
+    """
+    if id(obj) in visited:
+        return
+    visited.add(id(obj))
+
+    if isinstance(obj, Signal):
+        out.append((scope, name or obj.name, obj))
+
+    elif isinstance(obj, Record):
+        sub = (*scope, name or obj.name)
+        for k, v in obj.fields.items():
+            _collect(v, sub, k, out, visited)
+
+    elif isinstance(obj, dict):
+        for k, v in obj.items():
+            _collect(v, scope, k, out, visited)
+
+    elif isinstance(obj, (list, tuple, Array)):
+        for i, v in enumerate(obj):
+            _collect(v, scope, f"{name}_{i}" if name else None, out, visited)
+
+    elif hasattr(obj, "__dict__") and not isinstance(obj, Value):
+        sub = (*scope, name or type(obj).__name__.lower())
+        for k, v in vars(obj).items():
+            if not k.startswith("_"):
+                _collect(v, sub, k, out, visited)
+
+
+class SimTracer:
+    """ Selective VCD writer for the Amaranth simulator.
+
+    Unlike `Simulator.write_vcd` which dumps every signal of the design,
+    this tracer samples only the given `traces` once per clock cycle of
+    `domain`, from a passive simulation process.
+
+    Parameters
+    ----------
+    filename : str
+        Output VCD file. ".gz" is appended when compressing.
+    traces : list
+        Signals, Records, Endpoints or Elaboratables (all public signals of
+        the instance are traced, recursively) to record.
+    window : (int, int)
+        Optional (start, stop) cycle range to record, `None` meaning
+        unbounded on that side.
+    last : int
+        When set, only the last `last` cycles before the end of the
+        simulation are written, e.g. to look around a failing assertion.
+    compress : bool
+        Write gzip compressed output.
+    period : float
+        Clock period in seconds, used for the VCD timestamps.
+    """
+    def __init__(self, filename, traces, window=None, last=None,
+                 compress=False, domain="sync", period=1e-6):
+        if not traces:
+            raise ValueError("SimTracer requires at least one trace")
+
+        if compress and not filename.endswith(".gz"):
+            filename += ".gz"
+
+        self.filename = filename
+        self.window = window if window else (None, None)
+        self.last = last
+        self.compress = compress
+        self.domain = domain
+        self.period_ns = max(1, int(round(period * 1e9)))
+
+        self.signals = []
+        visited = set()
+        for t in traces:
+            _collect(t, ("top",), None, self.signals, visited)
+
+        self._history = deque()
+        self.cycle = 0
+
+    def _in_window(self, cycle):
+        start, stop = self.window
+        if start is not None and cycle < start:
+            return False
+        if stop is not None and cycle >= stop:
+            return False
+        return True
+
+    def sync_process(self):
+        signals = [sig for _, _, sig in self.signals]
+        masks = [(1 << len(sig)) - 1 for sig in signals]
+        prev = None
+
+        yield Passive()
+
+        while True:
+            yield Settle()
+            if self._in_window(self.cycle):
+                values = []
+                for sig, mask in zip(signals, masks):
+                    values.append((yield sig) & mask)
+                values = tuple(values)
+
+                # Only store cycles where something changed
+                if values != prev:
+                    self._history.append((self.cycle, values))
+                    prev = values
+
+                # Drop changes that are superseded before the last n cycles
+                if self.last:
+                    horizon = self.cycle - self.last
+                    while len(self._history) > 1 and \
+                            self._history[1][0] <= horizon:
+                        self._history.popleft()
+            yield
+            self.cycle += 1
+
+    def write(self):
+        from vcd import VCDWriter
+
+        if self.compress:
+            f = gzip.open(self.filename, "wt")
+        else:
+            f = open(self.filename, "w")
+
+        # In `last` mode, the oldest retained entry is rewritten at the
+        # start of the window so that every variable has a known value.
+        history = list(self._history)
+        if self.last and history:
+            first = max(0, self.cycle - self.last)
+            history[0] = (max(first, history[0][0]), history[0][1])
+
+        with f, VCDWriter(f, timescale="1 ns",
+                          comment="Generated by lambdalib") as vcd:
+            clk = vcd.register_var(("top",), "clk", "wire", size=1)
+            vcd_vars = []
+            names = set()
+            for scope, name, sig in self.signals:
+                while (scope, name) in names:
+                    name += "_"
+                names.add((scope, name))
+                vcd_vars.append(vcd.register_var(
+                    scope, name, "wire", size=len(sig)))
+
+            if not history:
+                return
+
+            start = history[0][0]
+            stop = self.cycle
+            if self.window[1] is not None:
+                stop = min(stop, self.window[1])
+
+            changes = dict(history)
+            half = self.period_ns // 2
+            for cycle in range(start, stop):
+                ts = cycle * self.period_ns
+                if cycle in changes:
+                    for var, val in zip(vcd_vars, changes[cycle]):
+                        vcd.change(var, ts, val)
+                vcd.change(clk, ts, 1)
+                vcd.change(clk, ts + half, 0)
+
+
+@contextlib.contextmanager
+def trace_vcd(sim, filename, traces=(), window=None, last=None,
+              compress=None, enable=None, domain="sync", period=1e-6):
+    """ Drop-in replacement for `Simulator.write_vcd` in testbenches.
+
+    Tracing is disabled by default, so CI runs do not pay for waveform
+    generation. It is enabled with `enable=True`, the `LAMBDALIB_VCD=1`
+    environment variable or `pytest --vcd`.
+
+    When `traces` is empty, the whole design is dumped by the Amaranth
+    simulator. Otherwise only the selected signals are recorded with
+    `SimTracer`, optionally restricted to a `window` of cycles or to the
+    `last` n cycles (the environment variables `LAMBDALIB_VCD_WINDOW=a:b`
+    and `LAMBDALIB_VCD_LAST=n` provide defaults, ignored by full dumps).
+
+    Output is gzip compressed with `compress=True` or
+    `LAMBDALIB_VCD_COMPRESS=1`.
+
+    Example:
+        with trace_vcd(sim, "tests/test_foo.vcd", traces=[dut.source]):
+            sim.run()
+    """
+    if enable is None:
+        enable = _env_flag(ENV_ENABLE)
+    if not enable:
+        yield None
+        return
+
+    if compress is None:
+        compress = _env_flag(ENV_COMPRESS)
+    if traces and window is None:
+        window = _env_window()
+    if traces and last is None:
+        last = _env_last()
+
+    dirname = os.path.dirname(filename)
+    if dirname:
+        os.makedirs(dirname, exist_ok=True)
+
+    if not traces:
+        # The environment defaults apply to selective traces only
+        if window is not None or last is not None:
+            raise ValueError("Cycle windows require explicit traces")
+
+        if compress:
+            if not filename.endswith(".gz"):
+                filename += ".gz"
+            with gzip.open(filename, "wt") as f:
+                with sim.write_vcd(f):
+                    yield None
+        else:
+            with sim.write_vcd(filename):
+                yield None
+        return
+
+    tracer = SimTracer(filename, traces, window=window, last=last,
+                       compress=compress, domain=domain, period=period)
+    sim.add_sync_process(tracer.sync_process, domain=domain)
+    try:
+        yield tracer
+    finally:
+        tracer.write()
@@ -14,10 +14,18 @@ __all__ = [
 ]
 
 
+def _make_rng(seed):
+    # A private generator makes the schedule reproducible for a given seed
+    # and independent from the other simulators, restarted on each run.
+    if seed is None:
+        return random
+    return random.Random(seed)
+
+
 class StreamSimSender:
     def __init__(self, sink, data, speed=0.5, initial_delay=0,
             verbose=False, callback=None, decimal=False, strname="",
-            randomize=True):
+            randomize=True, seed=None):
         self.sink = sink
         self.data = data
         self.speed = speed
@@ -27,6 +35,7 @@ class StreamSimSender:
         self.decimal = decimal
         self.strname = strname
         self.randomize = randomize
+        self.seed = seed
 
         if isinstance(self.data, list):
             self.data = {"data": self.data}
@@ -38,6 +47,7 @@ class StreamSimSender:
 
     def sync_process(self):
         sink = self.sink
+        rng = _make_rng(self.seed)
 
         assert (self.speed <= 1)
         interval = int(1 / self.speed)
@@ -52,7 +62,7 @@ class StreamSimSender:
                 yield getattr(sink, k).eq(v[i])
 
             if self.randomize:
-                trigger = (random.random() < self.speed)
+                trigger = (rng.random() < self.speed)
             else:
                 trigger = (((yieldcnt+1) % interval) == 0)
 
@@ -80,7 +90,8 @@ class StreamSimSender:
 
 class StreamSimReceiver:
     def __init__(self, source, length=None, speed=0.5, initial_delay=0,
-            verbose=False, callback=None, decimal=False, strname=""):
+            verbose=False, callback=None, decimal=False, strname="",
+            seed=None):
         self.source = source
         self.data = defaultdict(list)
         self.length = length
@@ -90,10 +101,12 @@ class StreamSimReceiver:
         self.callback = callback
         self.decimal = decimal
         self.strname = strname
+        self.seed = seed
 
     def sync_process(self):
         source = self.source
         fields = source.fields["payload"].fields.items()
+        rng = _make_rng(self.seed)
 
         if self.length is None:
             yield Passive()
@@ -103,7 +116,7 @@ class StreamSimReceiver:
 
         i = 0
         while not i == self.length:
-            if ((yield source.valid) and (random.random() < self.speed)) \
+            if ((yield source.valid) and (rng.random() < self.speed)) \
                     or self.speed == 1.0:
                 yield source.ready.eq(1)
             else:
@@ -161,17 +174,20 @@ class StreamSimReceiver:
 
 
 class StreamSimConnect:
-    def __init__(self, source, sink, omit=None, remap=None, speed=0.5):
+    def __init__(self, source, sink, omit=None, remap=None, speed=0.5,
+            seed=None):
         self.source = source
         self.sink = sink
         self.speed = speed
         self.omit = omit if omit else {}
         self.remap = remap if remap else {}
+        self.seed = seed
 
     def sync_process(self):
         source = self.source
         sink = self.sink
         fields = source.fields["payload"].fields.items()
+        rng = _make_rng(self.seed)
 
         yield Passive()
 
@@ -185,7 +201,7 @@ class StreamSimConnect:
 
             if not stored \
                     and (yield source.valid) \
-                    and (random.random() < self.speed):
+                    and (rng.random() < self.speed):
 
                 for name, sig in fields:
                     store[name] = (yield sig)
@@ -197,7 +213,7 @@ class StreamSimConnect:
                 yield source.ready.eq(1)
                 yield
 
-            elif stored and (random.random() < self.speed):
+            elif stored and (rng.random() < self.speed):
 
                 for name, sig in fields:
                     new = name
@@ -0,0 +1,24 @@
+""" Bit-true NumPy reference models of lambdalib datapath cores.
+
+These models produce exactly the same output as the gateware, including
+fixed-point truncations and wrap-arounds, so that expected results can be
+generated for large sample sets and compared against simulation.
+"""
+
+from . import float as _float
+from . import math as _math
+from . import filter as _filter
+from . import stream as _stream
+
+from .float import *
+from .math import *
+from .filter import *
+from .stream import *
+
+
+__all__ = [
+    *_float.__all__,
+    *_math.__all__,
+    *_filter.__all__,
+    *_stream.__all__,
+]
@@ -0,0 +1,32 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+
+
+def as_int64(data):
+    """ Cast `data` to a 1D int64 array. """
+    return np.asarray(data, dtype=np.int64).reshape(-1)
+
+
+def as_uint64(data):
+    """ Cast `data` to a 1D uint64 array, keeping the raw bit pattern. """
+    arr = np.asarray(data)
+    if arr.dtype.kind == "u":
+        return arr.astype(np.uint64).reshape(-1)
+    return arr.astype(np.int64).view(np.uint64).reshape(-1)
+
+
+def wrap(data, width, signed):
+    """ Truncate int64 `data` to `width` bits, like an assignment to a
+    `Signal(width)` or `Signal(signed(width))` does in gateware.
+
+    Arithmetic is done modulo 2**64 by NumPy, which is consistent with
+    any truncation to `width` <= 64 bits.
+    """
+    assert 0 < width <= 64
+    u = np.asarray(data, dtype=np.int64).view(np.uint64)
+    shift = np.uint64(64 - width)
+    u = u << shift
+    if signed:
+        return u.view(np.int64) >> shift.astype(np.int64)
+    return (u >> shift).view(np.int64)
@@ -0,0 +1,85 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+
+from ._utils import *
+
+
+__all__ = ["IIRFilterModel"]
+
+
+class IIRFilterModel:
+    """ Model of `cores.filter.iir.IIRFilter`.
+
+    Uses the same fixed point coefficients and the same `shift_c` and
+    `shift_s` scaling as the gateware, with the same accumulator and
+    register widths, so that the output is bit exact.
+
+    The feed-forward (B) part is computed for all samples at once,
+    only the feedback (A) recursion is evaluated sample by sample.
+
+    Example:
+        dut = IIRFilter(...)
+        expected = IIRFilterModel.from_core(dut)(samples)
+    """
+    def __init__(self, b_fp, a_fp, shift_c, width=16, multiply_width=(25, 36)):
+        self.b_fp = [int(v) for v in b_fp]
+        self.a_fp = [int(v) for v in a_fp]
+        self.shift_c = shift_c
+        self.width = width
+        self.width_s, self.width_c = multiply_width
+        self.shift_s = self.width_s - width
+        self.width_acc = self.width_s + self.width_c
+
+        assert len(self.b_fp) == len(self.a_fp)
+        assert self.shift_s >= 0
+        if self.width_acc > 64:
+            raise ValueError(f"Accumulator width {self.width_acc} exceeds 64 bits")
+
+    @classmethod
+    def from_core(cls, core):
+        return cls(core.b_fp, core.a_fp, core.shift_c, width=core.width,
+                   multiply_width=(core.width_s, core.width_c))
+
+    def __call__(self, data):
+        size = len(self.a_fp)
+        width_s = self.width_s
+        width_c = self.width_c
+        width_acc = self.width_acc
+
+        x = wrap(as_int64(data), self.width, True)
+        n = len(x)
+
+        # Input registers: i_regs[k] == x[n-k] << shift_s
+        i_reg = wrap(x << self.shift_s, width_s, True)
+
+        # Feed-forward sum of B x I products, independent of the outputs
+        b = wrap(np.array(self.b_fp, dtype=np.int64), width_c, True)
+        fir = np.zeros(n, dtype=np.int64)
+        for k in range(size):
+            fir[k:] += b[k] * i_reg[:n - k]
+
+        # Feedback sum of A x O products, the gateware stores
+        # the negated `a` coefficients.
+        a = [int(v) for v in wrap(-np.array(self.a_fp, dtype=np.int64), width_c, True)]
+        acc_mask = (1 << width_acc) - 1
+        acc_sign = 1 << (width_acc - 1)
+        reg_mask = (1 << width_s) - 1
+        reg_sign = 1 << (width_s - 1)
+
+        out = np.zeros(n, dtype=np.int64)
+        o_regs = [0] * size
+        for i, s in enumerate(fir.tolist()):
+            for k in range(1, size):
+                s += a[k] * o_regs[k - 1]
+            s &= acc_mask
+            if s & acc_sign:
+                s -= 1 << width_acc
+            out[i] = s
+
+            o = (s >> self.shift_c) & reg_mask
+            if o & reg_sign:
+                o -= 1 << width_s
+            o_regs = [o] + o_regs[:-1]
+
+        return wrap(out >> (self.shift_c + self.shift_s), self.width, True)
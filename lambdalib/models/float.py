@@ -0,0 +1,63 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+
+from ._utils import *
+
+
+__all__ = [
+    "clz",
+    "int2float",
+]
+
+
+def clz(data):
+    """ Model of `cores.float.clz.CLZ`.
+
+    Count the leading zeros of 32-bit values. The result saturates
+    at 31 for a zero input, as the 5-bit gateware output does.
+    """
+    d = as_uint64(data) & np.uint64(0xffffffff)
+    res = np.zeros(d.shape, dtype=np.int64)
+
+    # Same 5 stages binary search as the gateware
+    for i in range(5):
+        sh = np.uint64(16 >> i)
+        mask = np.uint64((1 << (16 >> i)) - 1)
+        hi = (d >> sh) & mask
+        lo = d & mask
+        zero = (hi == 0)
+        res |= zero.astype(np.int64) << (4 - i)
+        d = np.where(zero, lo, hi)
+
+    return res
+
+
+def int2float(data):
+    """ Model of `cores.float.i2f.Int2Float`.
+
+    Convert 32-bit two's complement integers to IEEE 754 single precision
+    bit patterns. The mantissa is truncated, not rounded.
+
+    Returns the raw 32-bit patterns as an int64 array, use
+    `.astype(np.uint32).view(np.float32)` to get the float values.
+    """
+    d = as_uint64(data) & np.uint64(0xffffffff)
+
+    sign = (d >> np.uint64(31)) & np.uint64(1)
+    low = d & np.uint64(0x7fffffff)
+    zero = (low == 0)
+
+    # The gateware negates only the 31 lower bits
+    neg = (np.uint64(0x80000000) - low) & np.uint64(0x7fffffff)
+    abs_ = np.where(sign.astype(bool), neg, low)
+
+    n = clz((abs_ << np.uint64(1)) | np.uint64(1)).astype(np.uint64)
+    mant = (abs_ << n) & np.uint64(0x7fffffff)
+    expn = np.where(zero, np.uint64(0), (np.uint64(157) - n) & np.uint64(0xff))
+
+    res = ((mant >> np.uint64(7)) & np.uint64(0x7fffff)) \
+        | (expn << np.uint64(23)) \
+        | (sign << np.uint64(31))
+
+    return res.astype(np.int64)
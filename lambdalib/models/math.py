@@ -0,0 +1,27 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import Shape
+
+from ._utils import *
+
+
+__all__ = ["multiply"]
+
+
+def multiply(a, b, shape_a, shape_b):
+    """ Model of `cores.math.multiplier.Multiplier`.
+
+    The operands are truncated to their shapes and the product to
+    the `multiplier_layout_o` shape, as the gateware does.
+    """
+    shape_a = Shape.cast(shape_a)
+    shape_b = Shape.cast(shape_b)
+    width_c = shape_a.width + shape_b.width
+    signed_c = shape_a.signed or shape_b.signed
+    if width_c > 64:
+        raise ValueError(f"Product width {width_c} exceeds 64 bits")
+
+    a = wrap(as_int64(a), shape_a.width, shape_a.signed)
+    b = wrap(as_int64(b), shape_b.width, shape_b.signed)
+
+    return wrap(a * b, width_c, signed_c)
@@ -0,0 +1,110 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+
+from ._utils import *
+
+
+__all__ = [
+    "convert",
+    "up_convert",
+    "down_convert",
+]
+
+
+def up_convert(data, nbits_from, ratio, reverse=False, last=None):
+    """ Model of `interface.stream._UpConverter`.
+
+    Packs `ratio` words of `nbits_from` bits into one word, the first
+    received word in the LSBs (MSBs when `reverse`). A `last` input word
+    flushes a partially filled output word: like the gateware, the slots
+    that were not written keep the value of the previous output word.
+
+    Returns the (data, last) arrays of the output stream.
+    """
+    nbits_to = nbits_from * ratio
+    if nbits_to > 64:
+        raise ValueError(f"Output width {nbits_to} exceeds 64 bits")
+
+    d = as_uint64(data) & np.uint64((1 << nbits_from) - 1)
+    n = len(d)
+    l = np.zeros(n, dtype=bool) if last is None \
+        else np.asarray(last, dtype=bool).reshape(-1)
+
+    slots = np.arange(ratio, dtype=np.uint64)
+    if reverse:
+        slots = slots[::-1]
+    shifts = slots * np.uint64(nbits_from)
+
+    # Fast path: packets are multiples of `ratio` words
+    ends = np.flatnonzero(l)
+    if (n % ratio == 0) and np.all((ends % ratio) == ratio - 1):
+        words = d.reshape(-1, ratio) << shifts
+        out = np.bitwise_or.reduce(words, axis=1)
+        out_last = l.reshape(-1, ratio)[:, -1]
+        return out.astype(np.int64), out_last
+
+    out = []
+    out_last = []
+    reg = [np.uint64(0)] * ratio
+    demux = 0
+    for v, is_last in zip(d, l):
+        reg[demux] = v
+        if demux == ratio - 1 or is_last:
+            word = np.uint64(0)
+            for i in range(ratio):
+                word |= reg[i] << shifts[i]
+            out.append(word)
+            out_last.append(bool(is_last))
+            demux = 0
+        else:
+            demux += 1
+
+    return np.array(out, dtype=np.uint64).astype(np.int64), \
+           np.array(out_last, dtype=bool)
+
+
+def down_convert(data, nbits_to, ratio, reverse=False, last=None):
+    """ Model of `interface.stream._DownConverter`.
+
+    Splits each word into `ratio` words of `nbits_to` bits, LSBs first
+    (MSBs first when `reverse`). `last` is set on the final chunk of a
+    word that had `last` set.
+
+    Returns the (data, last) arrays of the output stream.
+    """
+    d = as_uint64(data)
+    n = len(d)
+    l = np.zeros(n, dtype=bool) if last is None \
+        else np.asarray(last, dtype=bool).reshape(-1)
+
+    slots = np.arange(ratio, dtype=np.uint64)
+    if reverse:
+        slots = slots[::-1]
+    shifts = slots * np.uint64(nbits_to)
+    mask = np.uint64((1 << nbits_to) - 1)
+
+    out = (d[:, None] >> shifts[None, :]) & mask
+    out_last = np.zeros((n, ratio), dtype=bool)
+    out_last[:, -1] = l
+
+    return out.reshape(-1).astype(np.int64), out_last.reshape(-1)
+
+
+def convert(data, nbits_from, nbits_to, reverse=False, last=None):
+    """ Model of `interface.stream.Converter` (any clock domains). """
+    if nbits_from > nbits_to:
+        if nbits_from % nbits_to:
+            raise ValueError("Ratio must be an int")
+        return down_convert(data, nbits_to, nbits_from // nbits_to,
+                            reverse=reverse, last=last)
+    elif nbits_from < nbits_to:
+        if nbits_to % nbits_from:
+            raise ValueError("Ratio must be an int")
+        return up_convert(data, nbits_from, nbits_to // nbits_from,
+                          reverse=reverse, last=last)
+    else:
+        d = as_uint64(data) & np.uint64((1 << nbits_from) - 1)
+        l = np.zeros(len(d), dtype=bool) if last is None \
+            else np.asarray(last, dtype=bool).reshape(-1)
+        return d.astype(np.int64), l
@@ -0,0 +1,146 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+"""Columnar storage of ILA captures.
+
+A capture is saved as a directory holding one NumPy `.npy` file per
+signal, plus the sample times when known, and a small JSON metadata file.
+Signals are opened lazily as memory-mapped arrays, so that analysis
+scripts can slice deep captures without loading or parsing them:
+
+    capture = load_capture("capture")
+    sda = capture["sda"][1000000:2000000]
+"""
+import json
+import os
+
+import numpy as np
+
+
+__all__ = ["save_capture", "load_capture", "Capture"]
+
+
+METADATA_FILE = "capture.json"
+TIMES_FILE = "times.npy"
+
+
+def field_dtype(width):
+    """Smallest unsigned dtype holding `width` bits, None above 64 bits."""
+    for dtype in (np.uint8, np.uint16, np.uint32, np.uint64):
+        if width <= np.iinfo(dtype).bits:
+            return dtype
+    return None
+
+
+def _field_array(values, width):
+    dtype = field_dtype(width)
+    if dtype is not None:
+        return np.asarray(values).astype(dtype)
+
+    # Wider signals are stored as little endian byte rows
+    nbytes = (width + 7) // 8
+    rows = np.zeros((len(values), nbytes), dtype=np.uint8)
+    for i, value in enumerate(values):
+        rows[i] = np.frombuffer(int(value).to_bytes(nbytes, byteorder='little'),
+                                dtype=np.uint8)
+    return rows
+
+
+def save_capture(directory, signals, fields, trigger=None, times=None,
+                 period=1000, **metadata):
+    """Save a capture as one `.npy` file per signal.
+
+    Args:
+        directory: Output directory, created if needed
+        signals: List of (name, width) tuples
+        fields: One array of values per signal, see `unpack_fields`
+        trigger: Index of the trigger sample
+        times: Time of each sample in periods, default to one sample per period
+        period: Sample period in ns
+        metadata: Additional JSON serializable metadata
+
+    Returns:
+        Number of samples saved
+    """
+    os.makedirs(directory, exist_ok=True)
+    count = len(fields[0]) if fields else 0
+
+    description = []
+    for (name, width), values in zip(signals, fields):
+        filename = f"{name}.npy"
+        if filename in (METADATA_FILE, TIMES_FILE):
+            raise ValueError(f"Reserved signal name '{name}'")
+        np.save(os.path.join(directory, filename), _field_array(values, width))
+        description.append({"name": name, "width": width, "file": filename})
+
+    if times is not None:
+        np.save(os.path.join(directory, TIMES_FILE),
+                np.asarray(times, dtype=np.int64))
+
+    with open(os.path.join(directory, METADATA_FILE), "w") as f:
+        json.dump({
+            "signals": description,
+            "count": count,
+            "trigger": trigger,
+            "period": period,
+            "times": TIMES_FILE if times is not None else None,
+            "metadata": metadata,
+        }, f, indent=2)
+
+    return count
+
+
+class Capture:
+    """A saved capture, with signals loaded on first access.
+
+    Signals are memory-mapped read only arrays indexed by name. Signals
+    wider than 64 bits are (samples, bytes) little endian uint8 arrays.
+
+    Attributes:
+        signals: List of (name, width) tuples
+        trigger: Index of the trigger sample, or None
+        period: Sample period in ns
+        metadata: Additional metadata given to `save_capture`
+    """
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, METADATA_FILE)) as f:
+            self._description = json.load(f)
+
+        self.signals = [(s["name"], s["width"])
+                        for s in self._description["signals"]]
+        self.trigger = self._description["trigger"]
+        self.period = self._description["period"]
+        self.metadata = self._description["metadata"]
+
+        self._files = {s["name"]: s["file"] for s in self._description["signals"]}
+        self._arrays = {}
+
+    def __len__(self):
+        return self._description["count"]
+
+    def __contains__(self, name):
+        return name in self._files
+
+    def __getitem__(self, name):
+        if name not in self._arrays:
+            if name not in self._files:
+                raise KeyError(f"Unknown signal '{name}'")
+            self._arrays[name] = self._load(self._files[name])
+        return self._arrays[name]
+
+    def _load(self, filename):
+        return np.load(os.path.join(self.directory, filename), mmap_mode="r")
+
+    @property
+    def times(self):
+        """Time of each sample in periods."""
+        if self._description["times"] is None:
+            return np.arange(len(self), dtype=np.int64)
+        if "times" not in self._arrays:
+            self._arrays["times"] = self._load(self._description["times"])
+        return self._arrays["times"]
+
+
+def load_capture(directory):
+    """Open a capture saved by `save_capture`."""
+    return Capture(directory)
@@ -0,0 +1,220 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+"""Protocol decoders for ILA captures.
+
+The decoders take the captured lines as arrays, e.g. the columns of a
+capture loaded with `load_capture`, and return the list of transactions
+found, with the time of their first sample. Bus conditions are detected
+on all the samples at once with NumPy, only the decoded bits are then
+assembled one by one.
+
+Times are sample indices, or the values of the `times` array when given,
+e.g. `Capture.times` for timestamped or decimated captures.
+"""
+from collections import namedtuple
+
+import numpy as np
+
+from .i2c.bus import I2C_READ
+
+
+__all__ = [
+    "I2CTransaction",
+    "SPITransfer",
+    "UARTFrame",
+    "decode_i2c",
+    "decode_spi",
+    "decode_uart",
+]
+
+
+I2CTransaction = namedtuple("I2CTransaction", ["time", "addr", "read", "data", "acks"])
+I2CTransaction.__doc__ = """An I2C transaction from a START to the next STOP or repeated START.
+
+`data` holds the bytes transferred after the address, `acks` whether each
+byte, address included, was acknowledged.
+"""
+
+SPITransfer = namedtuple("SPITransfer", ["time", "mosi", "miso"])
+SPITransfer.__doc__ = """The words exchanged while `cs_n` is asserted."""
+
+UARTFrame = namedtuple("UARTFrame", ["time", "data", "error"])
+UARTFrame.__doc__ = """A UART character, `error` is set on a framing error."""
+
+
+def _times(count, times):
+    if times is None:
+        return np.arange(count)
+    return np.asarray(times)
+
+
+def _bits_to_words(bits, width):
+    """Pack MSB first bits into words, incomplete words are dropped."""
+    count = len(bits) // width
+    weights = 1 << np.arange(width - 1, -1, -1, dtype=np.uint64)
+    words = bits[:count * width].reshape(count, width).astype(np.uint64) @ weights
+    return [int(w) for w in words]
+
+
+def decode_i2c(scl, sda, times=None):
+    """Decode I2C transactions.
+
+    Bus conditions are the ones of `I2CBusDriver`: START is SDA falling
+    while SCL is high, STOP is SDA rising while SCL is high, and bits are
+    sampled on SCL rising edges, MSB first, followed by the acknowledge
+    bit (low for ACK).
+
+    Args:
+        scl, sda: Captured lines
+        times: Time of each sample
+
+    Returns:
+        List of `I2CTransaction`
+    """
+    scl = np.asarray(scl, dtype=bool)
+    sda = np.asarray(sda, dtype=bool)
+    times = _times(len(scl), times)
+
+    scl_r, sda_r = scl[:-1], sda[:-1]
+    scl_i, sda_i = scl[1:], sda[1:]
+
+    # Event indices, in the sample following the condition
+    starts = np.flatnonzero(scl_i & sda_r & ~sda_i) + 1
+    stops = np.flatnonzero(scl_i & ~sda_r & sda_i) + 1
+    samples = np.flatnonzero(~scl_r & scl_i) + 1
+
+    # Merge the events in time order: 0 start, 1 stop, 2 bit
+    indices = np.concatenate((starts, stops, samples))
+    kinds = np.concatenate((np.zeros(len(starts), dtype=np.int8),
+                            np.ones(len(stops), dtype=np.int8),
+                            np.full(len(samples), 2, dtype=np.int8)))
+    order = np.argsort(indices, kind="stable")
+
+    transactions = []
+    current = None
+    byte = []
+
+    def close():
+        if current is not None and current["addr"] is not None:
+            transactions.append(I2CTransaction(**current))
+
+    for index, kind in zip(indices[order].tolist(), kinds[order].tolist()):
+        if kind == 0:
+            close()
+            current = {"time": times[index].item(), "addr": None,
+                       "read": False, "data": [], "acks": []}
+            byte = []
+        elif kind == 1:
+            close()
+            current = None
+        elif current is not None:
+            byte.append(int(sda[index]))
+            if len(byte) == 9:
+                value = int("".join(map(str, byte[:8])), 2)
+                if current["addr"] is None:
+                    current["addr"] = value >> 1
+                    current["read"] = (value & 1) == I2C_READ
+                else:
+                    current["data"].append(value)
+                current["acks"].append(byte[8] == 0)
+                byte = []
+
+    close()
+    return transactions
+
+
+def decode_spi(clk, mosi, miso=None, cs_n=None, cpol=0, cpha=0, width=8,
+               times=None):
+    """Decode SPI transfers.
+
+    Bits are sampled MSB first on the clock edge given by the mode, as in
+    `SPIPHYSlave`: rising edges for modes (0, 0) and (1, 1), falling
+    edges otherwise. A transfer lasts while `cs_n` is low, incomplete
+    words at its end are dropped.
+
+    Args:
+        clk, mosi: Captured lines
+        miso: Captured line, optional
+        cs_n: Captured chip select, the whole capture is one transfer if None
+        cpol, cpha: SPI mode
+        width: Word width in bits
+        times: Time of each sample
+
+    Returns:
+        List of `SPITransfer`, with empty `miso` words if not captured
+    """
+    clk = np.asarray(clk, dtype=bool)
+    mosi = np.asarray(mosi, dtype=bool)
+    times = _times(len(clk), times)
+    if cs_n is None:
+        cs_n = np.zeros(len(clk), dtype=bool)
+    cs_n = np.asarray(cs_n, dtype=bool)
+    if miso is not None:
+        miso = np.asarray(miso, dtype=bool)
+
+    en = ~cs_n[1:]
+    rise = en & ~clk[:-1] & clk[1:]
+    fall = en & clk[:-1] & ~clk[1:]
+    sample = rise if (cpol, cpha) in ((0, 0), (1, 1)) else fall
+    samples = np.flatnonzero(sample) + 1
+
+    # Transfers start when cs_n is asserted
+    selected = np.flatnonzero(cs_n[:-1] & ~cs_n[1:]) + 1
+    if not cs_n[0]:
+        selected = np.concatenate(([0], selected))
+    transfer = np.searchsorted(selected, samples, side="right") - 1
+
+    transfers = []
+    for i, start in enumerate(selected.tolist()):
+        bits = samples[transfer == i]
+        transfers.append(SPITransfer(
+            time=times[start].item(),
+            mosi=_bits_to_words(mosi[bits], width),
+            miso=_bits_to_words(miso[bits], width) if miso is not None else [],
+        ))
+    return transfers
+
+
+def decode_uart(line, divisor, data_bits=8, times=None):
+    """Decode UART characters.
+
+    The framing is the one of the `AsyncSerial` cores: a low start bit,
+    `data_bits` LSB first and a high stop bit, each `divisor` cycles long.
+    Bits are sampled in their middle.
+
+    Args:
+        line: Captured line
+        divisor: Bit period, in samples or in the unit of `times`
+        data_bits: Number of data bits
+        times: Time of each sample
+
+    Returns:
+        List of `UARTFrame`
+    """
+    line = np.asarray(line, dtype=bool)
+    times = _times(len(line), times)
+
+    falls = np.flatnonzero(line[:-1] & ~line[1:]) + 1
+    # Middle of the start, data and stop bits, from the falling edge
+    offsets = (np.arange(data_bits + 2) + 0.5) * divisor
+    weights = 1 << np.arange(data_bits)
+
+    frames = []
+    end = times[0] - 1 if len(times) else 0
+    for fall in falls.tolist():
+        start = times[fall]
+        if start < end:
+            continue  # Falling edge within the previous character
+        if start + offsets[-1] > times[-1]:
+            break
+
+        # Value of the line at the middle of each bit
+        bits = line[np.searchsorted(times, start + offsets, side="right") - 1]
+        frames.append(UARTFrame(
+            time=start.item(),
+            data=int(bits[1:-1] @ weights),
+            error=bool(bits[0] or not bits[-1]),
+        ))
+        end = start + offsets[-1]
+
+    return frames
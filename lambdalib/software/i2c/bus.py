@@ -12,11 +12,48 @@ I2C_READ    = 1
 STATUS_OK   = 0
 STATUS_ERR  = 1
 
+# Bus clock configuration and write then read headers, see I2CProto
+HEADER_CONFIG       = (0x04 << 1) | I2C_READ
+HEADER_WRITE_READ   = (0x05 << 1) | I2C_READ
+
 
 class I2CBus:
-    def __init__(self, dev, reg_addr_width=8):
+    """Host side of an I2CProto bridge.
+
+    Args:
+        dev: Byte stream to the bridge, with `write` and `read` methods
+        reg_addr_width: Width of the register addresses, in bits
+        repeated_start: Read registers with a single transaction, the
+            register address then a repeated start and the read. Requires
+            an I2CProto with HEADER_WRITE_READ support, otherwise the
+            address is written and read in two transactions.
+    """
+    def __init__(self, dev, reg_addr_width=8, repeated_start=False):
         self.dev = dev
         self.reg_addr_width = reg_addr_width
+        self.repeated_start = repeated_start
+
+    def set_timing(self, period_cyc, low_cyc=None, hs_period_cyc=None, hs_low_cyc=None):
+        """Set the bus period and SCL low time, in system clock cycles,
+        e.g. `set_timing(**i2c_timing(sys_clk_freq, "fast-plus"))`.
+
+        The new timing applies from the next transaction. The Hs-mode
+        timing is fixed when building the gateware, `hs_period_cyc` and
+        `hs_low_cyc` are ignored.
+
+        Returns:
+            True if the timing was accepted
+        """
+        if low_cyc is None:
+            low_cyc = period_cyc // 2
+
+        buffer = bytearray([HEADER_CONFIG, 4,
+                            *int(period_cyc).to_bytes(2, "little"),
+                            *int(low_cyc).to_bytes(2, "little")])
+        self.dev.write(buffer)
+
+        status = self.dev.read(1)[0]
+        return status == STATUS_OK
 
     def write_byte_data(self, addr, reg, data):
         self.write_block_data(addr, reg, [data])
@@ -53,17 +90,23 @@ class I2CBus:
             reg = reg >> 8
         reg_addr_array.reverse()
 
-        # write register address
-        buffer = bytearray([(addr << 1) | I2C_WRITE, reg_addr_size, *reg_addr_array])
-        self.dev.write(buffer)
+        if self.repeated_start:
+            # write register address, repeated start and read block
+            buffer = bytearray([HEADER_WRITE_READ, (addr << 1) | I2C_WRITE,
+                                reg_addr_size, length, *reg_addr_array])
+            self.dev.write(buffer)
+        else:
+            # write register address
+            buffer = bytearray([(addr << 1) | I2C_WRITE, reg_addr_size, *reg_addr_array])
+            self.dev.write(buffer)
 
-        status = self.dev.read(1)[0]
-        if status != STATUS_OK:
-            return None
+            status = self.dev.read(1)[0]
+            if status != STATUS_OK:
+                return None
 
-        # read block
-        buffer = bytearray([(addr << 1) | I2C_READ, length])
-        self.dev.write(buffer)
+            # read block
+            buffer = bytearray([(addr << 1) | I2C_READ, length])
+            self.dev.write(buffer)
 
         status = self.dev.read(1)[0]
         if status != STATUS_OK:
@@ -1,8 +1,34 @@
 """Host-side software for ILA"""
+import os
 from argparse import ArgumentParser
+from collections import namedtuple
+from contextlib import nullcontext
 from serial import Serial
 from vcd import VCDWriter
 
+import numpy as np
+
+from lambdalib.software.capture import save_capture
+
+
+# Commands and status flags of the ILA host link, see `ILA`
+CMD_ARM     = 0x01
+CMD_FORCE   = 0x02
+CMD_ABORT   = 0x03
+CMD_STATUS  = 0x04
+CMD_READ    = 0x05
+CMD_TRIGGER = 0x06
+
+STATUS_ARMED     = 0x01
+STATUS_TRIGGERED = 0x02
+STATUS_CAPTURED  = 0x04
+STATUS_FILLED    = 0x08
+
+# Capture description header, see `ila_header`
+HEADER_MAGIC          = b"ILA1"
+HEADER_FLAG_RLE       = 0x01
+HEADER_FLAG_TIMESTAMP = 0x02
+
 
 def parse_layout(layout_str):
     """Parse signal layout string into list of (name, width) tuples.
@@ -61,81 +87,746 @@ def extract_signal_value(data_value, bit_offset, width):
     return (data_value >> bit_offset) & mask
 
 
-if __name__ == "__main__":
+def encode_trigger(stages, width, counter_width=16):
+    """Encode the configuration of an ILA programmable trigger.
+
+    Args:
+        stages: List of dicts, one per trigger stage, with the optional keys
+            'value', 'mask', 'edge', 'count' and 'timeout' (default 0), see
+            `ILATrigger` for their meaning.
+        width: Width of the data matched by the trigger
+        counter_width: Width of the trigger counters
+
+    Returns:
+        Bytes to write to the trigger configuration stream
+
+    Example:
+        # Bit 0 rising, then data[15:8] == 0x42 within 100 cycles
+        encode_trigger([
+            {"value": 0x1, "mask": 0x1, "edge": 0x1},
+            {"value": 0x4200, "mask": 0xff00, "timeout": 100},
+        ], width=16)
+    """
+    if not stages:
+        raise ValueError("At least one trigger stage is required")
+
+    fields = [("value", width), ("mask", width), ("edge", width),
+              ("count", counter_width), ("timeout", counter_width)]
+    record_bytes = (sum(w for _, w in fields) + 7) // 8
+
+    data = b""
+    for stage in stages:
+        unknown = set(stage) - {name for name, _ in fields}
+        if unknown:
+            raise ValueError(f"Unknown trigger stage fields {sorted(unknown)}")
+
+        record = 0
+        offset = 0
+        for name, field_width in fields:
+            value = stage.get(name, 0)
+            if not 0 <= value < (1 << field_width):
+                raise ValueError(f"Trigger field '{name}' out of range: {value}")
+            record |= value << offset
+            offset += field_width
+        data += record.to_bytes(record_bytes, byteorder='little')
+
+    return data
+
+
+def parse_trigger_stage(stage_str):
+    """Parse a trigger stage string into a dict for `encode_trigger`.
+
+    Args:
+        stage_str: String like 'value=0x42,mask=0xff,edge=1,count=3,timeout=100'
+
+    Returns:
+        Dict of the stage fields
+
+    Raises:
+        ValueError: If stage string is malformed
+    """
+    stage = {}
+    for field_def in stage_str.split(','):
+        if '=' not in field_def:
+            raise ValueError(f"Invalid trigger field '{field_def.strip()}'. Expected format 'name=value'")
+        name, value = field_def.split('=', 1)
+        try:
+            stage[name.strip()] = int(value.strip(), 0)
+        except ValueError:
+            raise ValueError(f"Invalid value for trigger field '{name.strip()}': {value.strip()}")
+    return stage
+
+
+class BufferedPort:
+    """Serve reads of any length from a port read in fixed size chunks.
+
+    USB bulk endpoints must be read a whole number of packets at a time
+    and may return less than requested, wrap a `USBEndpoint` so that it
+    can be used like a serial port by the functions below.
+
+    Args:
+        port: Object with a `read(length)` method, e.g. a `USBEndpoint`
+        chunk_size: Number of bytes requested from `port` on each read
+    """
+    def __init__(self, port, chunk_size=512):
+        self.port = port
+        self.chunk_size = chunk_size
+        self.buffer = bytearray()
+
+    def write(self, data):
+        return self.port.write(data)
+
+    def read(self, length):
+        while len(self.buffer) < length:
+            chunk = self.port.read(self.chunk_size)
+            if not chunk:
+                break
+            self.buffer += bytes(chunk)
+        data = bytes(self.buffer[:length])
+        del self.buffer[:length]
+        return data
+
+
+def read_exact(port, length, chunk_size=1 << 16):
+    """Read exactly `length` bytes from `port`, at most `chunk_size` bytes
+    at a time.
+
+    Short reads are retried until `port` returns no data.
+
+    Raises:
+        EOFError: If the port returns less data (e.g. on timeout)
+    """
+    data = bytearray()
+    while len(data) < length:
+        chunk = port.read(min(length - len(data), chunk_size))
+        if not chunk:
+            break
+        data += bytes(chunk)
+    if len(data) < length:
+        raise EOFError(f"Expected {length} bytes, got {len(data)}")
+    return bytes(data)
+
+
+def read_rows(port, count, row_bytes):
+    """Read `count` fixed size records of `row_bytes` bytes from `port`.
+
+    Returns:
+        A (count, row_bytes) uint8 array
+    """
+    data = read_exact(port, count * row_bytes)
+    return np.frombuffer(data, dtype=np.uint8).reshape(count, row_bytes)
+
+
+def rows_to_int(rows):
+    """Convert little endian byte rows to integers.
+
+    Returns:
+        A uint64 array for rows up to 8 bytes, otherwise an object array
+        of Python integers
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    if rows.shape[1] <= 8:
+        padded = np.zeros((rows.shape[0], 8), dtype=np.uint8)
+        padded[:, :rows.shape[1]] = rows
+        return padded.view("<u8").ravel()
+
+    values = np.empty(rows.shape[0], dtype=object)
+    for i, row in enumerate(rows):
+        values[i] = int.from_bytes(row.tobytes(), byteorder='little')
+    return values
+
+
+def unpack_fields(rows, signals):
+    """Split packed samples into their signals, all samples at once.
+
+    Args:
+        rows: (samples, bytes) uint8 array of little endian samples
+        signals: List of (name, width) tuples, LSB first
+
+    Returns:
+        One array of values per signal
+    """
+    rows = np.asarray(rows, dtype=np.uint8)
+    fields = []
+    bit_offset = 0
+
+    if rows.shape[1] <= 8:
+        values = rows_to_int(rows)
+        for _, width in signals:
+            mask = np.uint64((1 << width) - 1)
+            fields.append((values >> np.uint64(bit_offset)) & mask)
+            bit_offset += width
+    else:
+        bits = np.unpackbits(rows, axis=1, bitorder="little")
+        for _, width in signals:
+            field_bits = bits[:, bit_offset:bit_offset + width]
+            fields.append(rows_to_int(np.packbits(field_bits, axis=1,
+                                                  bitorder="little")))
+            bit_offset += width
+
+    return fields
+
+
+def unwrap_timestamps(timestamps, timestamp_width):
+    """Unwrap timestamps from a counter of `timestamp_width` bits, assuming
+    it does not wrap between two samples, relative to the first one."""
+    timestamps = np.asarray(timestamps, dtype=np.uint64)
+    if len(timestamps) == 0:
+        return np.zeros(0, dtype=np.int64)
+    modulo = np.uint64(1 << timestamp_width) if timestamp_width < 64 else None
+    deltas = np.diff(timestamps)  # Wraps around at 64 bits
+    if modulo is not None:
+        deltas %= modulo
+    return np.concatenate(([0], np.cumsum(deltas, dtype=np.uint64))).astype(np.int64)
+
+
+def send_command(port, command):
+    """Send a single byte command (CMD_*) to the ILA."""
+    port.write(bytes([command]))
+
+
+def send_trigger(port, config):
+    """Write the programmable trigger configuration with CMD_TRIGGER.
+
+    Args:
+        port: Port to write to
+        config: Configuration bytes, from `encode_trigger`
+    """
+    if not 0 < len(config) < 256:
+        raise ValueError(f"Trigger configuration of {len(config)} bytes, "
+                         f"1 to 255 supported")
+    port.write(bytes([CMD_TRIGGER, len(config)]) + bytes(config))
+
+
+def read_status(port):
+    """Query the ILA state.
+
+    Returns:
+        The status byte, made of the STATUS_* flags
+    """
+    send_command(port, CMD_STATUS)
+    return read_exact(port, 1)[0]
+
+
+def read_timestamped_rows(port, depth, data_width, timestamp_width):
+    """Read `depth` samples stored with their timestamp from `port`.
+
+    Returns:
+        A tuple (rows, times) with the (depth, bytes) uint8 array of the
+        samples, and their unwrapped time in clock cycles, see
+        `unwrap_timestamps`
+    """
+    value_bytes = (data_width + 7) // 8
+    rows = read_rows(port, depth, value_bytes + timestamp_width // 8)
+    times = unwrap_timestamps(rows_to_int(rows[:, value_bytes:]), timestamp_width)
+    return rows[:, :value_bytes], times
+
+
+def read_rle_rows(port, data_width, rle_width=16):
+    """Read a run-length encoded capture from `port`.
+
+    Returns:
+        A tuple (rows, repeats, trigger) with the (entries, bytes) uint8
+        array of the entry values, the number of samples of each entry,
+        and the index of the trigger sample in the expanded capture
+    """
+    value_bytes = (data_width + 7) // 8
+    entry_bytes = value_bytes + rle_width // 8
+
+    count = int.from_bytes(read_exact(port, entry_bytes), byteorder='little')
+    trigger_entry = int.from_bytes(read_exact(port, entry_bytes), byteorder='little')
+
+    rows = read_rows(port, count, entry_bytes)
+    repeats = rows_to_int(rows[:, value_bytes:]).astype(np.int64) + 1
+    trigger = int(repeats[:trigger_entry].sum())
+    return rows[:, :value_bytes], repeats, trigger
+
+
+ILAHeader = namedtuple("ILAHeader", ["signals", "depth", "pre_trigger", "clk_freq",
+                                     "decimation", "rle_width", "timestamp_width"])
+ILAHeader.__doc__ = """Description of a capture sent by an ILA built with named signals."""
+
+
+def read_header(port):
+    """Read the description of a capture, see `ila_header`.
+
+    Returns:
+        An `ILAHeader`
+
+    Raises:
+        ValueError: If the data is not a capture description
+    """
+    magic = read_exact(port, len(HEADER_MAGIC))
+    if magic != HEADER_MAGIC:
+        raise ValueError(f"Invalid capture header {magic!r}, expected {HEADER_MAGIC!r}")
+
+    data = read_exact(port, 18)
+    flags = data[0]
+    depth, pre_trigger, clk_freq = (int.from_bytes(data[i:i + 4], byteorder='little')
+                                    for i in (1, 5, 9))
+    decimation = int.from_bytes(data[13:15], byteorder='little')
+    rle_width, timestamp_width, count = data[15:18]
+
+    signals = []
+    for _ in range(count):
+        field = read_exact(port, 3)
+        width = int.from_bytes(field[:2], byteorder='little')
+        name = read_exact(port, field[2]).decode("ascii")
+        signals.append((name, width))
+
+    return ILAHeader(
+        signals=signals,
+        depth=depth,
+        pre_trigger=pre_trigger,
+        clk_freq=clk_freq,
+        decimation=decimation,
+        rle_width=rle_width if flags & HEADER_FLAG_RLE else 0,
+        timestamp_width=timestamp_width if flags & HEADER_FLAG_TIMESTAMP else 0,
+    )
+
+
+def read_capture(port, header=None):
+    """Read a capture from an ILA built with named signals.
+
+    The capture is decoded according to its description, read first
+    unless already given.
+
+    Returns:
+        A tuple (header, fields, trigger, times) with the `ILAHeader`, one
+        array of values per signal, the index of the trigger sample, and
+        the time of each sample in clock cycles, or None when not
+        timestamped
+    """
+    if header is None:
+        header = read_header(port)
+    data_width = sum(width for _, width in header.signals)
+
+    times = None
+    trigger = header.pre_trigger
+    if header.rle_width:
+        rows, repeats, trigger = read_rle_rows(port, data_width, header.rle_width)
+        fields = [np.repeat(values, repeats)
+                  for values in unpack_fields(rows, header.signals)]
+    elif header.timestamp_width:
+        rows, times = read_timestamped_rows(port, header.depth, data_width,
+                                            header.timestamp_width)
+        fields = unpack_fields(rows, header.signals)
+    else:
+        rows = read_rows(port, header.depth, (data_width + 7) // 8)
+        fields = unpack_fields(rows, header.signals)
+
+    return header, fields, trigger, times
+
+
+def read_hub_fields(port, headers):
+    """Read one capture of each ILA behind an `ILAHub` from `port`.
+
+    Args:
+        port: Port to read from
+        headers: List of `ILAHeader` describing the capture of each ILA,
+            in the order of the hub, or None for the ILAs built with named
+            signals, whose description is read from `port`
+
+    Returns:
+        The (header, fields, trigger, times) tuple of each ILA, in the
+        order of the hub, see `read_capture`
+
+    Raises:
+        ValueError: On an unknown ILA tag
+    """
+    captures = [None] * len(headers)
+    while any(capture is None for capture in captures):
+        tag = read_exact(port, 1)[0]
+        if tag >= len(headers):
+            raise ValueError(f"Unknown ILA tag {tag}")
+        captures[tag] = read_capture(port, headers[tag])
+    return captures
+
+
+def write_vcd(vcd_file, signals, samples, trigger=None, period=1000, times=None):
+    """Write packed sample values to a VCD file, see `write_vcd_fields`.
+
+    Args:
+        vcd_file: Output text file
+        signals: List of (name, width) tuples, LSB first
+        samples: Iterable of packed sample values
+        trigger: Index of the trigger sample, marked by the 'trigger' signal
+        period: Sample period in VCD time units (1 ns)
+        times: Time of each sample in periods, e.g. from timestamps,
+            default to one sample per period
+
+    Returns:
+        Number of samples written
+    """
+    row_bytes = max(1, (sum(width for _, width in signals) + 7) // 8)
+    data = b"".join(int(value).to_bytes(row_bytes, byteorder='little') for value in samples)
+    rows = np.frombuffer(data, dtype=np.uint8).reshape(-1, row_bytes)
+    return write_vcd_fields(vcd_file, signals, unpack_fields(rows, signals),
+                            trigger=trigger, period=period, times=times, clock=True)
+
+
+def _vcd_field_events(vcd, scope, signals, fields, timestamps, trigger, clock, period,
+                      variables, events):
+    # Register the signals of `scope` in `variables`, and add their changes
+    # to `events` as (timestamps, variable index, values)
+    count = len(timestamps)
+
+    if clock:
+        variables.append(vcd.register_var(scope, "clk", "wire", size=1))
+        index = len(variables) - 1
+        events.append(([0], index, [0]))
+        events.append((timestamps, index, np.ones(count, dtype=np.uint8)))
+        events.append((timestamps + period // 2, index, np.zeros(count, dtype=np.uint8)))
+
+    if trigger is not None:
+        variables.append(vcd.register_var(scope, "trigger", "wire", size=1))
+        index = len(variables) - 1
+        events.append(([0], index, [0]))
+        if trigger < count:
+            events.append((timestamps[trigger:trigger + 2], index,
+                           [1, 0][:len(timestamps[trigger:trigger + 2])]))
+
+    for (name, width), values in zip(signals, fields):
+        variables.append(vcd.register_var(scope, name, "wire", size=width))
+        values = np.asarray(values)
+        changes = np.flatnonzero(values[1:] != values[:-1]) + 1
+        if count:
+            changes = np.concatenate(([0], changes))
+        events.append((timestamps[changes], len(variables) - 1, values[changes]))
+
+
+def _vcd_write_events(vcd, variables, events):
+    # Merge all the changes in time order
+    event_times = np.concatenate([np.asarray(t, dtype=np.int64) for t, _, _ in events])
+    event_vars = np.concatenate([np.full(len(t), i) for t, i, _ in events])
+    event_values = np.concatenate([np.asarray(v, dtype=object) for _, _, v in events])
+    for i in np.argsort(event_times, kind="stable"):
+        vcd.change(variables[event_vars[i]], int(event_times[i]), int(event_values[i]))
+
+
+def write_vcd_fields(vcd_file, signals, fields, trigger=None, period=1000,
+                     times=None, clock=False, timescale="1 ns"):
+    """Write captured signals to a VCD file, emitting only their changes.
+
+    The changes of every signal are found with NumPy, so that the time
+    spent is proportional to the number of changes rather than to the
+    number of samples.
+
+    Args:
+        vcd_file: Output text file
+        signals: List of (name, width) tuples
+        fields: One array of values per signal, see `unpack_fields`
+        trigger: Index of the trigger sample, marked by the 'trigger' signal
+        period: Sample period in VCD time units
+        times: Time of each sample in periods, default to one sample per period
+        clock: Add a 'clk' signal with a rising edge on each sample
+        timescale: VCD time unit
+
+    Returns:
+        Number of samples written
+    """
+    count = len(fields[0]) if fields else 0
+    if times is not None:
+        timestamps = np.asarray(times, dtype=np.int64) * period
+    else:
+        timestamps = np.arange(count, dtype=np.int64) * period
+
+    with VCDWriter(vcd_file, timescale=timescale) as vcd:
+        variables = []
+        events = []
+        _vcd_field_events(vcd, "ila", signals, fields, timestamps, trigger, clock, period,
+                          variables, events)
+        _vcd_write_events(vcd, variables, events)
+
+    return count
+
+
+def write_vcd_scopes(vcd_file, captures, period=1000, clock=True, timescale="1 ns"):
+    """Write the captures of several ILAs to a VCD file, one scope per ILA.
+
+    The captures are aligned on their trigger sample.
+
+    Args:
+        vcd_file: Output text file
+        captures: List of (scope, signals, fields, trigger, times) tuples,
+            with the signals as (name, width) tuples, one array of values
+            per signal, see `unpack_fields`, the index of the trigger
+            sample, and the time of each sample in periods or None,
+            optionally followed by the period of this capture
+        period: Default sample period in VCD time units
+        clock: Add a 'clk' signal with a rising edge on each sample
+        timescale: VCD time unit
+
+    Returns:
+        Total number of samples written
+    """
+    # Time of each sample and of the trigger sample, in VCD time units
+    sample_times = []
+    trigger_times = []
+    periods = []
+    for _, _, fields, trigger, times, *capture_period in captures:
+        capture_period = capture_period[0] if capture_period else period
+        count = len(fields[0]) if fields else 0
+        if times is not None:
+            times = np.asarray(times, dtype=np.int64) * capture_period
+        else:
+            times = np.arange(count, dtype=np.int64) * capture_period
+        sample_times.append(times)
+        trigger_times.append(int(times[trigger]) if trigger < count else count * capture_period)
+        periods.append(capture_period)
+    offset = max(trigger_times)
+
+    total = 0
+    with VCDWriter(vcd_file, timescale=timescale) as vcd:
+        variables = []
+        events = []
+        for (scope, signals, fields, trigger, *_), times, trigger_time, capture_period in \
+                zip(captures, sample_times, trigger_times, periods):
+            timestamps = times + offset - trigger_time
+            _vcd_field_events(vcd, scope, signals, fields, timestamps, trigger, clock,
+                              capture_period, variables, events)
+            total += len(times)
+        _vcd_write_events(vcd, variables, events)
+
+    return total
+
+
+def _build_parser():
     parser = ArgumentParser(description="ILA Capture Tool")
-    parser.add_argument("port", help="Serial port for ILA data")
-    parser.add_argument("output", help="Output VCD file")
+    parser.add_argument("port", help="Serial port for ILA data, or VID:PID with --usb (e.g. ffff:1234)")
+    parser.add_argument("output", help="Output VCD file, or directory with --format npy")
+    parser.add_argument("--format", choices=["vcd", "npy"], default="vcd",
+                        help="Output format: VCD, or one .npy file per signal and a JSON metadata file, see load_capture (default: vcd)")
     parser.add_argument("--baudrate", type=int, default=115200, help="Baud rate for serial communication (default: 115200)")
-    parser.add_argument("--depth", type=int, required=True, help="Number of samples captured by ILA")
-    parser.add_argument("--layout", type=str, required=True, help="Signal layout description (e.g. 'data_in:10,trigger:1,address:8')")
-    args = parser.parse_args()
+    parser.add_argument("--depth", type=int, help="Number of samples captured by ILA")
+    parser.add_argument("--layout", type=str, help="Signal layout description (e.g. 'data_in:10,trigger:1,address:8'), "
+                                                   "read from the capture header if omitted (ILA built with named signals)")
+    parser.add_argument("--ila", nargs="+", action="append", metavar="NAME DEPTH PRE_TRIGGER LAYOUT [OPTIONS]",
+                        help="ILA behind an ILAHub, once per ILA in the order of the hub, replaces --depth and --layout, "
+                             "OPTIONS override the capture options of this ILA (e.g. 'rle=8' or 'timestamp=16,decimation=4')")
+    parser.add_argument("--hub", type=int, metavar="COUNT",
+                        help="Number of ILAs behind an ILAHub, all built with named signals, "
+                             "their layouts are read from the capture headers")
+    parser.add_argument("--rle", action="store_true", help="Capture is run-length encoded (ILA built with rle=True)")
+    parser.add_argument("--rle-width", type=int, default=16, help="Width of the run-length repeat counts (default: 16)")
+    parser.add_argument("--timestamp-width", type=int, default=0, help="Width of the sample timestamps (ILA built with timestamp_width)")
+    parser.add_argument("--decimation", type=int, default=1, help="Cycles per sample (ILA built with decimation)")
+    parser.add_argument("--clock", action="store_true", help="Add a sample clock signal to the VCD file")
+    parser.add_argument("--usb", action="store_true", help="Read from a USB bulk endpoint (ILA built with readout='stream')")
+    parser.add_argument("--endpoint", type=int, default=1, help="USB IN endpoint number (default: 1)")
+    parser.add_argument("--bulksize", type=int, default=512, help="USB bulk packet size (default: 512)")
+    parser.add_argument("--captures", type=int, default=1, help="Number of captures, re-arming the ILA after each one (default: 1)")
+    parser.add_argument("--arm", action="store_true", help="Also arm the ILA before the first capture, discarding the current one")
+    parser.add_argument("--force", action="store_true", help="Force the trigger after arming")
+    parser.add_argument("--reread", action="store_true", help="Read the stored capture out again instead of waiting for a new one")
+    parser.add_argument("--trigger", action="append", metavar="STAGE",
+                        help="Program a trigger stage before arming, once per stage (e.g. 'value=0x42,mask=0xff,timeout=100'), "
+                             "see encode_trigger (ILA built with trigger_stages)")
+    parser.add_argument("--trigger-width", type=int, help="Width of the data matched by the trigger (default: layout width)")
+    parser.add_argument("--trigger-counter-width", type=int, default=16,
+                        help="Width of the trigger counters (default: 16)")
+    return parser
+
+
+def _parse_ilas(args):
+    # The ILAs to read, as (name, header) tuples: no name without a hub,
+    # no header when read from the capture
+    options = {"rle": args.rle_width if args.rle else 0,
+               "timestamp": args.timestamp_width, "decimation": args.decimation}
+
+    def header(signals, depth, pre_trigger, options):
+        return ILAHeader(signals=signals, depth=depth, pre_trigger=pre_trigger,
+                         clk_freq=0, decimation=options["decimation"],
+                         rle_width=options["rle"], timestamp_width=options["timestamp"])
+
+    if args.hub is not None:
+        return [(f"ila{index}", None) for index in range(args.hub)]
+
+    if args.ila is not None:
+        ilas = []
+        for ila in args.ila:
+            if len(ila) not in (4, 5):
+                raise ValueError("--ila expects NAME DEPTH PRE_TRIGGER LAYOUT [OPTIONS]")
+            ila_options = dict(options)
+            for option in ila[4].split(',') if len(ila) == 5 else []:
+                key, _, value = option.partition('=')
+                if key.strip() not in ila_options:
+                    raise ValueError(f"Unknown ILA option '{key.strip()}'")
+                ila_options[key.strip()] = int(value, 0)
+            ilas.append((ila[0], header(parse_layout(ila[3]), int(ila[1]), int(ila[2]),
+                                        ila_options)))
+        return ilas
+
+    if args.layout is not None:
+        # The trigger position is only known with rle
+        return [(None, header(parse_layout(args.layout), args.depth, None, options))]
+
+    return [(None, None)]
+
+
+def _trigger_config(args, ilas):
+    # Programmable trigger configuration, matching the common data width
+    if not args.trigger:
+        return None
+
+    width = args.trigger_width
+    if width is None:
+        widths = {sum(w for _, w in header.signals) for _, header in ilas
+                  if header is not None}
+        if len(widths) != 1 or any(header is None for _, header in ilas):
+            raise ValueError("--trigger-width is required with --trigger here")
+        width, = widths
+
+    stages = [parse_trigger_stage(stage) for stage in args.trigger]
+    return encode_trigger(stages, width, args.trigger_counter_width)
+
+
+def _open_port(args):
+    if args.usb:
+        from lambdalib.software.usb.device import USBDevice
+
+        vid, pid = (int(v, 16) for v in args.port.split(":"))
+        device = USBDevice(args.bulksize, pid=pid, vid=vid)
+        endpoint = device.get_endpoint(args.endpoint)
+        return nullcontext(BufferedPort(endpoint, args.bulksize))
+    return Serial(args.port, args.baudrate, timeout=None)
+
+
+def _read_captures(port, ilas):
+    # One (header, fields, trigger, times) tuple per ILA
+    if ilas[0][0] is None:
+        return [read_capture(port, ilas[0][1])]
+    return read_hub_fields(port, [header for _, header in ilas])
+
+
+def _cycle_ps(header):
+    # Capture clock cycle, 1000 ns when unknown
+    return round(1e12 / header.clk_freq) if header.clk_freq else 1000000
+
+
+def _write_output(output, args, ilas, captures):
+    # Write the captures, one directory or VCD scope per ILA of a hub
+    count = 0
+    if args.format == "npy":
+        for (name, _), (header, fields, trigger, times) in zip(ilas, captures):
+            # Timestamps count cycles, not samples
+            period = _cycle_ps(header) / 1000
+            if times is None:
+                period *= header.decimation
+            metadata = {}
+            if header.clk_freq:
+                metadata = {"clk_freq": header.clk_freq, "decimation": header.decimation}
+            directory = output if name is None else os.path.join(output, name)
+            count += save_capture(directory, header.signals, fields, trigger=trigger,
+                                  times=times, period=period, **metadata)
+        return count
+
+    with open(output, "w") as vcd_file:
+        if ilas[0][0] is None:
+            header, fields, trigger, times = captures[0]
+            period = _cycle_ps(header)
+            if times is None:
+                period *= header.decimation
+            return write_vcd_fields(vcd_file, header.signals, fields, trigger=trigger,
+                                    period=period, times=times, clock=args.clock,
+                                    timescale="1 ps")
+
+        # Time of each sample in cycles, timestamped or not
+        scopes = []
+        for (name, _), (header, fields, trigger, times) in zip(ilas, captures):
+            if times is None:
+                times = np.arange(len(fields[0]) if fields else 0) * header.decimation
+            scopes.append((name, header.signals, fields, trigger, times, _cycle_ps(header)))
+        return write_vcd_scopes(vcd_file, scopes, clock=args.clock, timescale="1 ps")
+
+
+def main(argv=None, port=None):
+    """Capture tool, see `--help`.
+
+    Args:
+        argv: Command line arguments, default to `sys.argv`
+        port: Open port to use instead of the one given by the arguments
+
+    Returns:
+        Exit status
+    """
+    parser = _build_parser()
+    args = parser.parse_args(argv)
+
+    if args.layout is not None and args.depth is None:
+        parser.error("--depth is required with --layout")
+    if args.hub is not None and (args.ila is not None or args.layout is not None):
+        parser.error("--hub replaces --ila and --layout")
 
-    # Parse and validate the layout
     try:
-        signals = parse_layout(args.layout)
+        ilas = _parse_ilas(args)
     except ValueError as e:
         print(f"Error parsing layout: {e}")
-        exit(1)
-    
-    # Calculate data width from layout
-    data_width = sum(width for _, width in signals)
-    
-    print(f"Parsed layout: {signals}")
-    print(f"Inferred data width: {data_width} bits")
-    print(f"Waiting for {args.depth} samples of {data_width}-bit data from {args.port}")
+        return 1
+    try:
+        trigger_config = _trigger_config(args, ilas)
+    except ValueError as e:
+        print(f"Error parsing trigger: {e}")
+        return 1
+
+    if args.hub is not None:
+        print(f"{args.hub} ILAs, layouts read from the capture headers")
+    elif args.ila is not None:
+        for name, header in ilas:
+            print(f"ILA {name}: {header.depth} samples, layout {header.signals}")
+    elif args.layout is not None:
+        signals = ilas[0][1].signals
+        data_width = sum(width for _, width in signals)
+        print(f"Parsed layout: {signals}")
+        print(f"Inferred data width: {data_width} bits")
+        print(f"Waiting for {args.depth} {'entries' if args.rle else 'samples'} "
+              f"of {data_width}-bit data from {args.port}")
+    else:
+        print("Layout, depth and clock read from the capture header")
 
     try:
-        with Serial(args.port, args.baudrate, timeout=None) as ser, open(args.output, "w") as vcd_file:
-            with VCDWriter(vcd_file, timescale="1 ns") as vcd:
-                # Register clock signal
-                clk_signal = vcd.register_var("ila", "clk", "wire", size=1)
-                
-                # Register all signals in the VCD
-                vcd_signals = []
-                for name, width in signals:
-                    vcd_signal = vcd.register_var("ila", name, "wire", size=width)
-                    vcd_signals.append(vcd_signal)
-                
-                # Initialize clock signal to low
-                vcd.change(clk_signal, 0, 0)
-                
-                # Capture and decode samples
-                bytes_to_read = (data_width + 7) // 8  # Round up to nearest byte
+        with (nullcontext(port) if port is not None else _open_port(args)) as ser:
+            for index in range(args.captures):
+                output = args.output
+                if args.captures > 1:
+                    base, ext = os.path.splitext(args.output)
+                    output = f"{base}_{index}{ext}"
+
+                if trigger_config is not None and index == 0:
+                    send_trigger(ser, trigger_config)
+                if args.reread:
+                    send_command(ser, CMD_READ)
+                elif index > 0 or args.arm:
+                    send_command(ser, CMD_ARM)
+                if args.force and not args.reread:
+                    send_command(ser, CMD_FORCE)
+
                 print(f"Waiting for data on {args.port}... (Press Ctrl+C to abort)")
-                
-                for sample_index in range(args.depth):
-                    # Read raw data from serial port - this will block until data is available
-                    raw_data = ser.read(bytes_to_read)
-                    
-                    if len(raw_data) < bytes_to_read:
-                        print(f"Incomplete data received at sample {sample_index}. Expected {bytes_to_read} bytes, got {len(raw_data)}. Exiting.")
-                        break
-                    
-                    # Convert bytes to integer (little-endian)
-                    data_value = int.from_bytes(raw_data, byteorder='little')
-                    
-                    # Extract and log individual signal values
-                    bit_offset = 0
-                    timestamp = sample_index * 1000  # 1ns timestep, 1us per sample
-                    
-                    # Generate clock signal - rising edge at start of each sample
-                    vcd.change(clk_signal, timestamp, 1)
-                    
-                    for (name, width), vcd_signal in zip(signals, vcd_signals):
-                        signal_value = extract_signal_value(data_value, bit_offset, width)
-                        vcd.change(vcd_signal, timestamp, signal_value)
-                        bit_offset += width
-
-                    # Falling edge at middle of sample period
-                    vcd.change(clk_signal, timestamp + 500, 0)
-                        
-                    if sample_index % 100 == 0:  # Progress indicator
-                        print(f"Processed {sample_index + 1}/{args.depth} samples")
-                        
-        print(f"Data capture complete. Output written to {args.output}")
-        
+
+                try:
+                    captures = _read_captures(ser, ilas)
+                except EOFError as e:
+                    print(f"Incomplete data received: {e}. Exiting.")
+                    break
+
+                for (name, described), (header, *_) in zip(ilas, captures):
+                    if described is None:
+                        label = f"ILA {name}: capture" if name is not None else "Capture"
+                        print(f"{label} of {header.depth} samples at {header.clk_freq} Hz, "
+                              f"layout {header.signals}")
+
+                count = _write_output(output, args, ilas, captures)
+                print(f"Decoded {count} samples")
+                print(f"Data capture complete. Output written to {output}")
+
     except KeyboardInterrupt:
         print(f"\nCapture interrupted by user. Partial data written to {args.output}")
     except Exception as e:
         print(f"Error during capture: {e}")
-        exit(1)
+        return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,170 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import random
+import threading
+from collections import deque
+
+from amaranth import *
+from amaranth.sim import *
+
+from ..interface.stream_sim import *
+
+
+__all__ = ["SimStreamDevice"]
+
+
+class SimStreamDevice:
+    """ Host transport backed by a simulated stream core.
+
+    Provides the same `write` / `read` interface as a serial port or a
+    `USBEndpoint`, so that host software such as `I2CBus` can run against
+    simulated gateware, e.g. an `I2CProto` instance, without a board.
+
+    Bytes written are fed into the `sink` stream of the design, bytes
+    coming out of the `source` stream are collected by a
+    `StreamSimReceiver` and returned by `read`.
+
+    Parameters
+    ----------
+    dut : Elaboratable
+        The design to simulate.
+    sink, source : stream.Endpoint
+        The byte streams of the design, default to `dut.sink` and
+        `dut.source`.
+    processes : list
+        Additional sync processes, e.g. bus device models.
+    speed : float
+        Probability for the host side to accept or present data on each
+        clock cycle, as for `StreamSimSender`.
+    threaded : bool
+        When True, the simulator runs continuously in a background thread,
+        otherwise it only advances while `read` is waiting for data.
+    timeout : int or float
+        Maximum number of cycles (or seconds, when threaded) that `read`
+        waits for data. A partial buffer is returned on timeout.
+
+    Example:
+        dut = I2CProto(sys_clk_freq, i2c_pins=pins)
+        with SimStreamDevice(dut, processes=[target]) as dev:
+            bus = I2CBus(dev)
+            bus.write_byte_data(0x50, 0x00, 0xaa)
+    """
+    def __init__(self, dut, sink=None, source=None, processes=(),
+                 speed=1.0, seed=None, threaded=False, timeout=None,
+                 period=1e-6, domain="sync"):
+        self.dut = dut
+        self.sink = sink if sink is not None else dut.sink
+        self.source = source if source is not None else dut.source
+        self.speed = speed
+        self.seed = seed
+        self.threaded = threaded
+        self.timeout = timeout
+
+        self._tx = deque()
+        self._rx = deque()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._running = False
+        self.cycles = 0
+
+        self.receiver = StreamSimReceiver(self.source, length=None,
+                                          speed=speed, seed=seed,
+                                          callback=self._on_receive)
+
+        self.sim = Simulator(dut)
+        self.sim.add_clock(period, domain=domain)
+        self.sim.add_sync_process(self._sender, domain=domain)
+        self.sim.add_sync_process(self.receiver.sync_process, domain=domain)
+        self.sim.add_sync_process(self._counter, domain=domain)
+        for p in processes:
+            self.sim.add_sync_process(
+                p.sync_process if hasattr(p, "sync_process") else p,
+                domain=domain)
+
+        if threaded:
+            self.start()
+
+    def _on_receive(self, current):
+        with self._cond:
+            self._rx.append(current["data"])
+            self._cond.notify_all()
+
+    def _counter(self):
+        yield Passive()
+        while True:
+            yield
+            self.cycles += 1
+
+    def _sender(self):
+        # Same handshake as StreamSimSender, fed from a queue
+        # that grows as the host writes.
+        sink = self.sink
+        rng = random.Random(self.seed) if self.seed is not None else random
+
+        yield Passive()
+
+        while True:
+            if self._tx:
+                yield sink.data.eq(self._tx[0])
+                if not (yield sink.valid) and rng.random() < self.speed:
+                    yield sink.valid.eq(1)
+            yield
+
+            if (yield sink.valid) and (yield sink.ready):
+                self._tx.popleft()
+                # Present the next byte right away, unless throttled
+                if not self._tx or rng.random() >= self.speed:
+                    yield sink.valid.eq(0)
+
+    def _advance(self, cycles=1):
+        end = self.cycles + cycles
+        while self.cycles < end:
+            self.sim.advance()
+
+    def _run_thread(self):
+        while self._running:
+            self._advance(64)
+
+    def start(self):
+        if self._thread is None:
+            self._running = True
+            self._thread = threading.Thread(target=self._run_thread,
+                                            daemon=True)
+            self._thread.start()
+
+    def close(self):
+        if self._thread is not None:
+            self._running = False
+            self._thread.join()
+            self._thread = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def run(self, cycles):
+        """ Advance the simulation, when not threaded. """
+        assert not self.threaded
+        self._advance(cycles)
+
+    def write(self, data):
+        self._tx.extend(bytes(data))
+        return len(data)
+
+    def read(self, length):
+        if self.threaded:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._rx) >= length,
+                                    timeout=self.timeout)
+        else:
+            waited = 0
+            while len(self._rx) < length:
+                if self.timeout is not None and waited >= self.timeout:
+                    break
+                self._advance()
+                waited += 1
+
+        n = min(length, len(self._rx))
+        return bytes(self._rx.popleft() for _ in range(n))
@@ -1,13 +1,18 @@
 # 2022 - LambdaConcept - po@lambdaconcept.com
 
+import pytest
+
 from amaranth import *
 from amaranth.lib.io import Pin
 
+from lambdalib.cores.i2c.i2c import *
 from lambdalib.cores.i2c.stream import *
 from lambdalib.cores.i2c.proto import *
+from lambdalib.cores.i2c.sim import *
 
 from amaranth.sim import *
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 
 
 class I2C_Pins_Stub:
@@ -41,7 +46,7 @@ def test_i2c_stream_writer():
     sim.add_clock(1e-6)
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(pins.sync_process)
-    with sim.write_vcd("tests/test_i2c_stream_writer.vcd"):
+    with trace_vcd(sim, "tests/test_i2c_stream_writer.vcd"):
         sim.run()
 
 
@@ -72,10 +77,300 @@ def test_i2c_stream():
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(receiver.sync_process)
     sim.add_sync_process(pins.sync_process)
-    with sim.write_vcd("tests/test_i2c_stream.vcd"):
+    with trace_vcd(sim, "tests/test_i2c_stream.vcd"):
         sim.run()
 
 
+class I2CBusMonitor:
+    """Records the cycles of the start and stop conditions on the bus,
+    and the SCL low and high times."""
+    def __init__(self, pins):
+        self.pins = pins
+        self.starts = []
+        self.stops = []
+        self.lows = []
+        self.highs = []
+
+    def sync_process(self):
+        yield Passive()
+        prev_scl = prev_sda = 1
+        cycle = 0
+        edge = None
+        while True:
+            scl = yield self.pins.scl.i
+            sda = yield self.pins.sda.i
+            if scl and prev_scl and prev_sda and not sda:
+                self.starts.append(cycle)
+            if scl and prev_scl and not prev_sda and sda:
+                self.stops.append(cycle)
+            if scl != prev_scl and self.starts:
+                if edge is not None:
+                    (self.highs if prev_scl else self.lows).append(cycle - edge)
+                edge = cycle
+            prev_scl, prev_sda = scl, sda
+            cycle += 1
+            yield
+
+
+def test_i2c_stream_restart():
+    pins = I2C_Pins_Stub()
+    dut = I2CStream(pins, 16, clk_stretch=False)
+    sim = Simulator(dut)
+
+    target = I2CTargetSim(pins, 0x50, regs=list(range(0x80, 0x90)))
+    monitor = I2CBusMonitor(pins)
+
+    # Register read: the address phase ends with a repeated start
+    datas = {
+        "data":    [0x50 << 1, 0x04, (0x50 << 1) | 1, 0, 0],
+        "r_wn":    [0,         0,    0,               1, 1],
+        "last":    [0,         1,    0,               0, 1],
+        "restart": [0,         1,    0,               0, 0],
+    }
+
+    sender = StreamSimSender(dut.sink, datas, speed=0.9)
+    receiver = StreamSimReceiver(dut.source, length=2, speed=1)
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    sim.add_sync_process(target.sync_process)
+    sim.add_sync_process(monitor.sync_process)
+    sim.run_until(2e-3, run_passive=True)
+
+    assert receiver.data["data"] == [0x84, 0x85]
+    assert receiver.data["last"] == [0, 1]
+    assert len(monitor.starts) == 2
+    assert len(monitor.stops) == 1
+    assert monitor.starts[1] < monitor.stops[0]
+
+
+def test_i2c_stream_queue():
+    pins = I2C_Pins_Stub()
+    dut = I2CStream(pins, 16, queue_depth=16, clk_stretch=False)
+    sim = Simulator(dut)
+
+    target = I2CTargetSim(pins, 0x50)
+    monitor = I2CBusMonitor(pins)
+
+    # Two register writes, queued at once
+    datas = {
+        "data": [0x50 << 1, 0x10, 0xa5, 0x50 << 1, 0x20, 0x5a],
+        "last": [0,         0,    1,    0,         0,    1],
+    }
+    accepted = []
+
+    def sender():
+        for i in range(len(datas["data"])):
+            yield dut.sink.valid.eq(1)
+            yield dut.sink.data.eq(datas["data"][i])
+            yield dut.sink.last.eq(datas["last"][i])
+            yield
+            while not (yield dut.sink.ready):
+                yield
+        yield dut.sink.valid.eq(0)
+        accepted.append(len(monitor.stops))
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender)
+    sim.add_sync_process(target.sync_process)
+    sim.add_sync_process(monitor.sync_process)
+    sim.run_until(2e-3, run_passive=True)
+
+    # Everything was queued before the first transaction ended
+    assert accepted == [0]
+    assert target.regs[0x10] == 0xa5
+    assert target.regs[0x20] == 0x5a
+
+    # The second start follows the first stop without going idle
+    assert len(monitor.starts) == 2 and len(monitor.stops) == 2
+    assert monitor.starts[1] - monitor.stops[0] < 2 * 16
+
+
+def test_i2c_stream_queue_nak():
+    pins = I2C_Pins_Stub()
+    dut = I2CStream(pins, 16, queue_depth=16, clk_stretch=False)
+    sim = Simulator(dut)
+
+    target = I2CTargetSim(pins, 0x50)
+    monitor = I2CBusMonitor(pins)
+
+    # A write to an absent device, then a write to the target
+    datas = {
+        "data": [0x51 << 1, 0x10, 0xa5, 0x50 << 1, 0x20, 0x5a],
+        "last": [0,         0,    1,    0,         0,    1],
+    }
+    errors = []
+
+    def sender():
+        for i in range(len(datas["data"])):
+            yield dut.sink.valid.eq(1)
+            yield dut.sink.data.eq(datas["data"][i])
+            yield dut.sink.last.eq(datas["last"][i])
+            yield
+            while not (yield dut.sink.ready):
+                yield
+        yield dut.sink.valid.eq(0)
+
+    def error_monitor():
+        yield Passive()
+        while True:
+            if (yield dut.error):
+                errors.append(1)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender)
+    sim.add_sync_process(error_monitor)
+    sim.add_sync_process(target.sync_process)
+    sim.add_sync_process(monitor.sync_process)
+    sim.run_until(2e-3, run_passive=True)
+
+    assert errors == [1]
+    assert len(monitor.starts) == 2 and len(monitor.stops) == 2
+    assert target.regs[0x10] == 0
+    assert target.regs[0x20] == 0x5a
+
+
+def test_i2c_timing():
+    sys_clk_freq = 100e6
+    for mode, (freq, t_low, t_high) in I2C_MODES.items():
+        timing = i2c_timing(sys_clk_freq, mode)
+        if mode == "high-speed":
+            assert timing["period_cyc"] == i2c_timing(sys_clk_freq, "fast")["period_cyc"]
+            period_cyc, low_cyc = timing["hs_period_cyc"], timing["hs_low_cyc"]
+        else:
+            period_cyc, low_cyc = timing["period_cyc"], timing["low_cyc"]
+        assert period_cyc >= sys_clk_freq / freq
+        assert low_cyc >= t_low * sys_clk_freq
+        assert period_cyc - low_cyc >= t_high * sys_clk_freq
+
+    with pytest.raises(ValueError):
+        i2c_timing(sys_clk_freq, "ultra-fast")
+    with pytest.raises(ValueError):
+        i2c_timing(4e6, "high-speed")
+
+
+@pytest.mark.parametrize("mode", ["fast-plus", "high-speed"])
+def test_i2c_stream_modes(mode):
+    sys_clk_freq = 40e6
+    pins = I2C_Pins_Stub()
+    timing = i2c_timing(sys_clk_freq, mode)
+    dut = I2CStream(pins, **timing)
+    sim = Simulator(dut)
+
+    target = I2CTargetSim(pins, 0x50, regs=list(range(0x80, 0x90)))
+    monitor = I2CBusMonitor(pins)
+
+    datas = {
+        "data":    [0x50 << 1, 0x04, (0x50 << 1) | 1, 0, 0],
+        "r_wn":    [0,         0,    0,               1, 1],
+        "last":    [0,         1,    0,               0, 1],
+        "restart": [0,         1,    0,               0, 0],
+    }
+
+    sender = StreamSimSender(dut.sink, datas, speed=1)
+    receiver = StreamSimReceiver(dut.source, length=2, speed=1)
+
+    sim.add_clock(1 / sys_clk_freq)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    sim.add_sync_process(target.sync_process)
+    sim.add_sync_process(monitor.sync_process)
+    sim.run_until(200e-6, run_passive=True)
+
+    assert receiver.data["data"] == [0x84, 0x85]
+    assert len(monitor.stops) == 1
+
+    _, t_low, t_high = I2C_MODES[mode]
+    assert min(monitor.lows) >= t_low * sys_clk_freq
+    assert min(monitor.highs) >= t_high * sys_clk_freq
+
+    if mode == "high-speed":
+        # Master code at Fast-mode speed, then a repeated start in Hs-mode
+        assert len(monitor.starts) == 3
+        fast_cycles = [low + high for low, high in zip(monitor.lows[:8], monitor.highs[:8])]
+        hs_cycles = [low + high for low, high in zip(monitor.lows[-9:], monitor.highs[-9:])]
+        assert min(fast_cycles) >= timing["period_cyc"]
+        assert max(hs_cycles) < 2 * timing["hs_period_cyc"]
+    else:
+        assert len(monitor.starts) == 2
+        assert max(monitor.lows) < timing["period_cyc"]
+
+
+def test_i2c_stream_programmable():
+    pins = I2C_Pins_Stub()
+    dut = I2CStream(pins, 16, programmable=True, clk_stretch=False)
+    sim = Simulator(dut)
+
+    target = I2CTargetSim(pins, 0x50)
+    monitor = I2CBusMonitor(pins)
+
+    def write(reg, value):
+        for data, last in [(0x50 << 1, 0), (reg, 0), (value, 1)]:
+            yield dut.sink.valid.eq(1)
+            yield dut.sink.data.eq(data)
+            yield dut.sink.last.eq(last)
+            yield
+            while not (yield dut.sink.ready):
+                yield
+        yield dut.sink.valid.eq(0)
+
+    lows = []
+
+    def bench():
+        yield from write(0x10, 0xa5)
+        while len(monitor.stops) < 1:
+            yield
+        lows.append(monitor.lows[:])
+
+        # Slower, with a longer SCL low time
+        yield dut.period.eq(64)
+        yield dut.low.eq(40)
+        yield from write(0x11, 0x5a)
+        while len(monitor.stops) < 2:
+            yield
+        lows.append(monitor.lows[len(lows[0]):])
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(target.sync_process)
+    sim.add_sync_process(monitor.sync_process)
+    sim.run()
+
+    assert target.regs[0x10:0x12] == [0xa5, 0x5a]
+    assert max(lows[0]) <= 8 + 2
+    assert min(lows[1]) >= 40
+
+
+@pytest.mark.parametrize("low_cyc", [None, 5])
+def test_i2c_programmable_reset(low_cyc):
+    # Same bus timing out of reset with or without the timing registers
+    def run(programmable):
+        pins = I2C_Pins_Stub()
+        dut = I2CStream(pins, 8, low_cyc=low_cyc, programmable=programmable,
+                        clk_stretch=False)
+        sim = Simulator(dut)
+
+        target = I2CTargetSim(pins, 0x50)
+        monitor = I2CBusMonitor(pins)
+        sender = StreamSimSender(dut.sink, {
+            "data": [0x50 << 1, 0x10, 0xa5],
+            "last": [0, 0, 1],
+        }, speed=1)
+
+        sim.add_clock(1e-6)
+        sim.add_sync_process(sender.sync_process)
+        sim.add_sync_process(target.sync_process)
+        sim.add_sync_process(monitor.sync_process)
+        sim.run_until(1e-3, run_passive=True)
+
+        assert target.regs[0x10] == 0xa5
+        return monitor.starts, monitor.stops, monitor.lows, monitor.highs
+
+    assert run(True) == run(False)
+
+
 def test_i2c_proto():
     pins = I2C_Pins_Stub()
     dut = I2CProto(100e6, i2c_pins=pins, i2c_freq=400e3, clk_stretch=False)
@@ -99,7 +394,7 @@ def test_i2c_proto():
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(receiver.sync_process)
     sim.add_sync_process(pins.sync_process)
-    with sim.write_vcd("tests/test_i2c_proto.vcd"):
+    with trace_vcd(sim, "tests/test_i2c_proto.vcd"):
         sim.run()
 
 
@@ -130,7 +425,7 @@ def test_i2c_reg_stream():
     sim.add_clock(1e-6)
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(receiver.sync_process)
-    with sim.write_vcd("tests/test_i2c_reg_command_generator.vcd"):
+    with trace_vcd(sim, "tests/test_i2c_reg_command_generator.vcd"):
         sim.run()
 
     assert receiver.data["data"] == out_stream
@@ -139,5 +434,7 @@ def test_i2c_reg_stream():
 if __name__ == "__main__":
     test_i2c_stream_writer()
     test_i2c_stream()
+    test_i2c_stream_restart()
+    test_i2c_stream_queue()
     test_i2c_proto()
     test_i2c_reg_stream()
@@ -0,0 +1,617 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import io
+
+import numpy as np
+import pytest
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.cores.ila import *
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
+from lambdalib.software.ila import *
+from lambdalib.software.sim import SimStreamDevice
+
+
+DIVISOR = 4
+
+
+class UARTSimReceiver:
+    """ Decode the bytes sent on a serial `tx` line. """
+    def __init__(self, tx, divisor=DIVISOR):
+        self.tx = tx
+        self.divisor = divisor
+        self.data = []
+
+    def sync_process(self):
+        yield Passive()
+        while True:
+            yield
+            if (yield self.tx):
+                continue
+
+            # Sample in the middle of each bit
+            for _ in range(self.divisor // 2):
+                yield
+            byte = 0
+            for i in range(8):
+                for _ in range(self.divisor):
+                    yield
+                byte |= (yield self.tx) << i
+            for _ in range(self.divisor):
+                yield
+            self.data.append(byte)
+
+
+def samples(data, width):
+    nbytes = (width + 7) // 8
+    return [int.from_bytes(bytes(data[i:i + nbytes]), "little")
+            for i in range(0, len(data), nbytes)]
+
+
+@pytest.mark.parametrize("pre_trigger", [0, 5, 15])
+def test_ila_pre_trigger(pre_trigger):
+    depth = 16
+    dut = ILA(data_width=12, depth=depth, sys_clk_freq=DIVISOR, baudrate=1,
+              pre_trigger=pre_trigger)
+    sim = Simulator(dut)
+
+    uart = UARTSimReceiver(dut.tx)
+    trigger_at = 40
+
+    def bench():
+        # The captured value is the cycle number
+        for cycle in range(200):
+            yield dut.data_in.eq(cycle)
+            yield dut.trigger.eq(cycle == trigger_at)
+            yield
+        while len(uart.data) < 2 * depth:
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(uart.sync_process)
+    with trace_vcd(sim, "tests/test_ila_pre_trigger.vcd"):
+        sim.run()
+
+    start = trigger_at - pre_trigger
+    assert samples(uart.data, 12) == list(range(start, start + depth))
+
+
+def test_ila_early_trigger():
+    # A trigger before the pre-trigger samples are stored is ignored
+    depth = 16
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, baudrate=1,
+              pre_trigger=8)
+    sim = Simulator(dut)
+
+    uart = UARTSimReceiver(dut.tx)
+
+    def bench():
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield dut.trigger.eq(cycle in (3, 30))
+            yield
+        while len(uart.data) < depth:
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(uart.sync_process)
+    sim.run()
+
+    assert uart.data == list(range(30 - 8, 30 - 8 + depth))
+
+
+def test_ila_pre_trigger_range():
+    with pytest.raises(ValueError):
+        ILA(data_width=8, depth=16, sys_clk_freq=DIVISOR, pre_trigger=16)
+
+
+def run_trigger(stages, data, width=8):
+    dut = ILATrigger(width, stages=4)
+    sim = Simulator(dut)
+
+    config = encode_trigger(stages, width)
+    sender = StreamSimSender(dut.sink, {
+        "data": list(config),
+        "last": [0] * (len(config) - 1) + [1],
+    }, speed=1)
+
+    triggers = []
+    def bench():
+        # Wait for the configuration
+        for _ in range(len(config) + 4):
+            yield
+        for i, value in enumerate(data):
+            yield dut.data.eq(value)
+            yield Settle()
+            if (yield dut.trigger):
+                triggers.append(i)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(bench)
+    with trace_vcd(sim, "tests/test_ila_trigger.vcd"):
+        sim.run()
+
+    return triggers
+
+
+def test_ila_trigger_value():
+    data = [0, 1, 0x42, 0x43, 0x42, 0xc2]
+    assert run_trigger([{"value": 0x42, "mask": 0xff}], data) == [2, 4]
+    assert run_trigger([{"value": 0x42, "mask": 0x7f}], data) == [2, 4, 5]
+
+
+def test_ila_trigger_edge_count():
+    # Rising edges of bit 0, third one triggers
+    data = [0, 1, 1, 0, 1, 0, 0, 1, 1, 0, 1]
+    stage = {"value": 1, "mask": 1, "edge": 1, "count": 3}
+    assert run_trigger([stage], data) == [7]
+
+
+def test_ila_trigger_sequence():
+    # 0xaa then 0x55 within 4 cycles
+    stages = [
+        {"value": 0xaa, "mask": 0xff},
+        {"value": 0x55, "mask": 0xff, "timeout": 4},
+    ]
+    data = [0x55, 0xaa, 0, 0, 0x55, 0xaa, 0, 0, 0, 0, 0x55, 0x55]
+    assert run_trigger(stages, data) == [4]
+
+
+def test_ila_programmable_trigger():
+    depth = 8
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, baudrate=1,
+              pre_trigger=2, trigger_stages=2)
+    sim = Simulator(dut)
+
+    config = encode_trigger([{"value": 0x30, "mask": 0xf0}], 8)
+    sender = StreamSimSender(dut.trigger_config, {
+        "data": list(config),
+        "last": [0] * (len(config) - 1) + [1],
+    }, speed=1)
+    uart = UARTSimReceiver(dut.tx)
+
+    def bench():
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield
+        while len(uart.data) < depth:
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(uart.sync_process)
+    sim.run()
+
+    assert uart.data == list(range(0x30 - 2, 0x30 - 2 + depth))
+
+
+def test_ila_trigger_command():
+    depth = 8
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=2,
+              trigger_stages=2, readout="stream")
+    sim = Simulator(dut)
+
+    # The configuration comes from the host, behind a status request
+    config = encode_trigger([{"value": 0x30, "mask": 0xf0}], 8)
+    command = [CMD_STATUS, CMD_TRIGGER, len(config)] + list(config)
+    sender = StreamSimSender(dut.sink, {
+        "data": command,
+        "last": [0] * (len(command) - 1) + [1],
+    }, speed=0.5, seed=0)
+    receiver = StreamSimReceiver(dut.source, length=1 + depth)
+
+    def bench():
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    assert receiver.data["data"][1:] == list(range(0x30 - 2, 0x30 - 2 + depth))
+
+
+@pytest.mark.parametrize("pre_trigger", [0, 3])
+def test_ila_rle(pre_trigger):
+    depth = 8
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, baudrate=1,
+              pre_trigger=pre_trigger, rle=True, rle_width=8)
+    sim = Simulator(dut)
+
+    uart = UARTSimReceiver(dut.tx)
+    trigger_at = 1000
+
+    def value(cycle):
+        # Slowly changing, with runs longer than the repeat counter
+        return (cycle // 100) if cycle < 1100 else (cycle // 300)
+
+    def bench():
+        for cycle in range(3000):
+            yield dut.data_in.eq(value(cycle))
+            yield dut.trigger.eq(cycle == trigger_at)
+            yield
+        while len(uart.data) < 2 * (depth + 2):
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(uart.sync_process)
+    sim.run()
+
+    rows, repeats, trigger = read_rle_rows(io.BytesIO(bytes(uart.data)), 8, 8)
+    assert len(rows) == depth
+    assert all(repeats <= 256)
+
+    # The expanded capture is the input, sample accurate
+    samples = np.repeat(rows_to_int(rows), repeats).tolist()
+    start = trigger_at - trigger
+    assert samples == [value(c) for c in range(start, start + len(samples))]
+
+    # Entries before the trigger are kept
+    assert trigger > 0 if pre_trigger else trigger == 0
+    assert len(samples) > depth * 100
+
+
+def test_ila_stream_readout():
+    depth = 16
+    dut = ILA(data_width=16, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=4,
+              readout="stream")
+    sim = Simulator(dut)
+
+    # Backpressure from the host side, e.g. a USB IN endpoint
+    receiver = StreamSimReceiver(dut.source, length=2 * depth,
+                                 speed=0.5, seed=0)
+    trigger_at = 20
+
+    def bench():
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield dut.trigger.eq(cycle == trigger_at)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    start = trigger_at - 4
+    expected = b"".join(v.to_bytes(2, "little")
+                        for v in range(start, start + depth))
+    receiver.verify({
+        "data": list(expected),
+        "last": [0] * (2 * depth - 1) + [1],
+    })
+
+
+def test_ila_described_capture():
+    depth = 16
+    layout = [("counter", 12), ("strobe", 1), ("state", 3)]
+    dut = ILA(layout, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=4,
+              readout="stream", clk_freq=50_000_000)
+    sim = Simulator(dut)
+
+    header = ila_header(layout, depth, 4, 50_000_000)
+    receiver = StreamSimReceiver(dut.source, length=len(header) + 2 * depth,
+                                 speed=0.5, seed=0)
+    trigger_at = 20
+
+    def bench():
+        for cycle in range(120):
+            yield dut.probes.counter.eq(cycle)
+            yield dut.probes.strobe.eq(cycle % 2)
+            yield dut.probes.state.eq(cycle % 5)
+            yield dut.trigger.eq(cycle == trigger_at)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    header, fields, trigger, times = read_capture(io.BytesIO(bytes(receiver.data["data"])))
+    assert header.signals == layout
+    assert (header.depth, header.pre_trigger, header.clk_freq) == (depth, 4, 50_000_000)
+    assert (header.rle_width, header.timestamp_width) == (0, 0)
+    assert trigger == 4 and times is None
+
+    cycles = range(trigger_at - 4, trigger_at - 4 + depth)
+    assert fields[0].tolist() == list(cycles)
+    assert fields[1].tolist() == [c % 2 for c in cycles]
+    assert fields[2].tolist() == [c % 5 for c in cycles]
+    assert receiver.data["last"][-1] == 1
+
+
+def test_ila_described_layout():
+    with pytest.raises(ValueError):
+        ILA([], depth=16, sys_clk_freq=DIVISOR)
+    with pytest.raises(ValueError):
+        ILA([("a", 0)], depth=16, sys_clk_freq=DIVISOR)
+
+    ila = ILA([("a", 3), ("b", 5)], depth=16, sys_clk_freq=DIVISOR)
+    assert len(ila.data_in) == 8
+    assert ILA(8, depth=16, sys_clk_freq=DIVISOR).probes is None
+
+
+def test_ila_readout_mode():
+    with pytest.raises(ValueError):
+        ILA(data_width=8, depth=16, sys_clk_freq=DIVISOR, readout="usb")
+
+
+def test_ila_commands():
+    depth = 8
+    dut = ILA(data_width=16, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=2,
+              readout="stream")
+
+    def counter():
+        # The captured value is the cycle number
+        yield Passive()
+        cycle = 0
+        while True:
+            yield dut.data_in.eq(cycle)
+            yield dut.trigger.eq(cycle == 20)
+            yield
+            cycle += 1
+
+    def capture(dev):
+        data = rows_to_int(read_rows(dev, depth, 2)).tolist()
+        assert data == list(range(data[0], data[0] + depth))
+        return data
+
+    with SimStreamDevice(dut, processes=[counter], timeout=1000) as dev:
+        # Armed out of reset, read out on the trigger
+        assert capture(dev)[2] == 20
+        assert read_status(dev) == STATUS_CAPTURED | STATUS_FILLED
+
+        # Read the same capture again
+        send_command(dev, CMD_READ)
+        first = capture(dev)
+        assert first[2] == 20
+
+        # Re-arm, nothing happens until forced
+        send_command(dev, CMD_ARM)
+        dev.run(50)
+        assert read_status(dev) == STATUS_ARMED | STATUS_FILLED
+        send_command(dev, CMD_FORCE)
+        assert capture(dev)[0] > first[0] + 50
+
+        # Abort an armed capture
+        send_command(dev, CMD_ARM)
+        send_command(dev, CMD_ABORT)
+        assert read_status(dev) & ~STATUS_FILLED == 0
+        dev.run(50)
+        assert dev.read(1) == b""
+
+
+@pytest.mark.parametrize("rle", [False, True])
+def test_ila_read_empty(rle):
+    dut = ILA(data_width=8, depth=8, sys_clk_freq=DIVISOR, pre_trigger=2,
+              readout="stream", rle=rle, rle_width=8)
+
+    def hold():
+        # Nothing is ever stored
+        yield Passive()
+        yield dut.qualifier.eq(0)
+
+    with SimStreamDevice(dut, processes=[hold], timeout=1000) as dev:
+        send_command(dev, CMD_ARM)
+        send_command(dev, CMD_ABORT)
+        send_command(dev, CMD_READ)
+        if rle:
+            rows, repeats, trigger = read_rle_rows(dev, 8, 8)
+            assert len(rows) == 0 and trigger == 0
+        dev.run(50)
+        assert dev.read(1) == b""
+
+        # Still answering, and armed again
+        assert read_status(dev) == 0
+        send_command(dev, CMD_ARM)
+        assert read_status(dev) == STATUS_ARMED
+
+
+def test_ila_qualifier_timestamps():
+    depth = 8
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=3,
+              readout="stream", timestamp_width=16)
+    sim = Simulator(dut)
+
+    receiver = StreamSimReceiver(dut.source, length=3 * depth, speed=1)
+
+    def bench():
+        # Store every 5 cycles, trigger on an unqualified sample
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield dut.qualifier.eq(cycle % 5 == 0)
+            yield dut.trigger.eq(cycle == 41)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    rows, times = read_timestamped_rows(
+        io.BytesIO(bytes(receiver.data["data"])), depth, 8, 16)
+    samples = rows_to_int(rows).tolist()
+    assert samples == [30, 35, 40, 41, 45, 50, 55, 60]
+    assert times.tolist() == [s - 30 for s in samples]
+
+
+def test_ila_decimation():
+    depth = 8
+    dut = ILA(data_width=8, depth=depth, sys_clk_freq=DIVISOR, pre_trigger=2,
+              readout="stream", decimation=4)
+    sim = Simulator(dut)
+
+    receiver = StreamSimReceiver(dut.source, length=depth, speed=1)
+
+    def bench():
+        for cycle in range(100):
+            yield dut.data_in.eq(cycle)
+            yield dut.trigger.eq(cycle == 41)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    # One sample every 4 cycles, plus the trigger sample
+    data = receiver.data["data"]
+    assert data[2] == 41
+    ticks = data[:2] + data[3:]
+    assert ticks == list(range(ticks[0], ticks[0] + 4 * len(ticks), 4))
+
+
+class ILAFastDomain(Elaboratable):
+    def __init__(self, **kwargs):
+        self.ila = ILA(domain="fast", **kwargs)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.domains.fast = ClockDomain()
+        m.submodules.ila = self.ila
+        return m
+
+
+def test_ila_domain():
+    depth = 16
+    top = ILAFastDomain(data_width=16, depth=depth, sys_clk_freq=DIVISOR,
+                        pre_trigger=4, readout="stream", trigger_stages=1)
+    dut = top.ila
+    sim = Simulator(top)
+
+    config = encode_trigger([{"value": 100, "mask": 0xffff}], 16)
+    sender = StreamSimSender(dut.trigger_config, {
+        "data": list(config),
+        "last": [0] * (len(config) - 1) + [1],
+    }, speed=1)
+    receiver = StreamSimReceiver(dut.source, length=2 * depth, speed=1)
+
+    def fast():
+        # The captured value is the fast cycle number
+        for cycle in range(500):
+            yield dut.data_in.eq(cycle)
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_clock(0.3e-6, domain="fast")
+    sim.add_sync_process(fast, domain="fast")
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    assert samples(receiver.data["data"], 16) == list(range(96, 96 + depth))
+
+
+class HubBench(Elaboratable):
+    def __init__(self, first={}, second={}):
+        first = {"data_width": 8, **first}
+        second = {"data_width": 16, **second}
+        self.ilas = [
+            ILA(depth=8, sys_clk_freq=DIVISOR, pre_trigger=2, readout="stream",
+                **first),
+            ILA(depth=4, sys_clk_freq=DIVISOR, pre_trigger=1, readout="stream",
+                **second),
+        ]
+        self.hub = ILAHub(self.ilas, sys_clk_freq=DIVISOR, readout="stream")
+        self.cycle = Signal(16)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.hub = self.hub
+        m.d.sync += self.cycle.eq(self.cycle + 1)
+        first, second = (ila.data_in if ila.probes is None else ila.probes
+                         for ila in self.ilas)
+        m.d.comb += [
+            first.eq(self.cycle),
+            second.eq(self.cycle + 1000),
+            self.ilas[1].trigger.eq(self.cycle == 40),
+        ]
+        return m
+
+
+def test_ila_hub():
+    bench = HubBench()
+    hub = bench.hub
+
+    with SimStreamDevice(bench, sink=hub.sink, source=hub.source,
+                         timeout=1000) as dev:
+        first, second = (fields[0].tolist() for _, fields, _, _ in read_hub_fields(dev, [
+            ILAHeader([("data", 8)], 8, 2, 0, 1, 0, 0),
+            ILAHeader([("data", 16)], 4, 1, 0, 1, 0, 0),
+        ]))
+
+        # The second ILA triggered the first one
+        assert second == [1039, 1040, 1041, 1042]
+        assert first == list(range(39, 47))
+
+        # Broadcast commands, replies are tagged
+        send_command(dev, CMD_STATUS)
+        data = read_exact(dev, 4)
+        replies = dict(data[i:i + 2] for i in (0, 2))
+        assert replies == {0: STATUS_CAPTURED | STATUS_FILLED,
+                           1: STATUS_CAPTURED | STATUS_FILLED}
+
+
+def test_ila_hub_formats():
+    # Run-length encoded and timestamped captures behind the hub
+    bench = HubBench(first={"rle": True, "rle_width": 8},
+                     second={"timestamp_width": 16})
+    hub = bench.hub
+
+    with SimStreamDevice(bench, sink=hub.sink, source=hub.source,
+                         timeout=1000) as dev:
+        first, second = read_hub_fields(dev, [
+            ILAHeader([("data", 8)], 8, 2, 0, 1, 8, 0),
+            ILAHeader([("data", 16)], 4, 1, 0, 1, 0, 16),
+        ])
+
+    _, fields, trigger, times = first
+    assert fields[0].tolist() == list(range(39, 47))
+    assert trigger == 2 and times is None
+
+    _, fields, trigger, times = second
+    assert fields[0].tolist() == [1039, 1040, 1041, 1042]
+    assert trigger == 1 and times.tolist() == [0, 1, 2, 3]
+
+
+def test_ila_hub_described():
+    # Each capture of the hub starts with its own description
+    bench = HubBench(first={"data_width": [("low", 4), ("high", 4)]},
+                     second={"data_width": [("value", 16)], "timestamp_width": 16,
+                             "clk_freq": 48_000_000})
+    hub = bench.hub
+
+    with SimStreamDevice(bench, sink=hub.sink, source=hub.source,
+                         timeout=1000) as dev:
+        first, second = read_hub_fields(dev, [None, None])
+
+    header, fields, trigger, times = first
+    assert header.signals == [("low", 4), ("high", 4)]
+    assert header.clk_freq == DIVISOR
+    assert [f.tolist() for f in fields] == [[v & 0xf for v in range(39, 47)],
+                                            [v >> 4 for v in range(39, 47)]]
+    assert trigger == 2 and times is None
+
+    header, fields, trigger, times = second
+    assert header.signals == [("value", 16)]
+    assert header.clk_freq == 48_000_000 and header.timestamp_width == 16
+    assert fields[0].tolist() == [1039, 1040, 1041, 1042]
+    assert trigger == 1 and times.tolist() == [0, 1, 2, 3]
+
+
+def test_ila_hub_readout():
+    with pytest.raises(ValueError):
+        ILAHub([ILA(data_width=8, depth=8, sys_clk_freq=DIVISOR)],
+               sys_clk_freq=DIVISOR)
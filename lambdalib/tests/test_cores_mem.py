@@ -0,0 +1,276 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
+from lambdalib.cores.mem.stream import *
+
+
+def frames_to_stream(frames):
+    data = {"data": [], "last": []}
+    for frame in frames:
+        data["data"] += frame
+        data["last"] += [0] * (len(frame) - 1) + [1]
+    return data
+
+
+def test_mem_stream_pingpong():
+    frames = [list(range(i * 16, i * 16 + n)) for i, n in
+              enumerate([16, 5, 1, 16, 9, 12])]
+    datas = frames_to_stream(frames)
+    length = len(datas["data"])
+
+    for speed_tx, speed_rx in [(1, 1), (0.3, 0.9), (0.9, 0.3)]:
+        dut = MemoryStreamPingPong(8, 16)
+        sim = Simulator(dut)
+
+        sender = StreamSimSender(dut.sink, datas, speed=speed_tx, seed=0)
+        receiver = StreamSimReceiver(dut.source, length=length,
+                                     speed=speed_rx, seed=1)
+
+        cycles = []
+        def count():
+            yield Passive()
+            while True:
+                yield
+                cycles.append(1)
+
+        sim.add_clock(1e-6)
+        sim.add_sync_process(sender.sync_process)
+        sim.add_sync_process(receiver.sync_process)
+        sim.add_sync_process(count)
+        with trace_vcd(sim, "tests/test_mem_stream_pingpong.vcd"):
+            sim.run()
+
+        receiver.verify(datas)
+
+        # Fill and drain overlap: at full rate the whole transfer takes
+        # about one cycle per element, not two.
+        if speed_tx == speed_rx == 1:
+            assert len(cycles) < length + 40
+
+
+def test_mem_stream_pingpong_swap_repeat():
+    dut = MemoryStreamPingPong(8, 8, repeat=True)
+    sim = Simulator(dut)
+
+    receiver = StreamSimReceiver(dut.source, length=None, speed=1)
+
+    def writer():
+        # First frame delimited by swap instead of last
+        for v in [1, 2, 3]:
+            yield dut.sink.data.eq(v)
+            yield dut.sink.valid.eq(1)
+            yield
+        yield dut.sink.valid.eq(0)
+        yield dut.swap.eq(1)
+        yield
+        yield dut.swap.eq(0)
+
+        # The first frame is replayed while nothing new is written
+        for i in range(20):
+            yield
+
+        for v in [4, 5]:
+            yield dut.sink.data.eq(v)
+            yield dut.sink.last.eq(v == 5)
+            yield dut.sink.valid.eq(1)
+            yield
+        yield dut.sink.valid.eq(0)
+
+        for i in range(20):
+            yield
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(writer)
+    sim.add_sync_process(receiver.sync_process)
+    with trace_vcd(sim, "tests/test_mem_stream_pingpong_repeat.vcd"):
+        sim.run()
+
+    data = receiver.data["data"]
+    last = receiver.data["last"]
+    split = data.index(4)
+    assert split >= 6
+    assert data[:split] == [1, 2, 3] * (split // 3)
+    assert last[:split] == [0, 0, 1] * (split // 3)
+    assert set(data[split:]) == {4, 5}
+    assert data[split:split + 4] == [4, 5, 4, 5]
+
+
+def run_replays(dut, replays, prologue=None):
+    """ Rewind `dut` to each (offset, length) of `replays` and
+    collect the data read until `last`. """
+    sim = Simulator(dut)
+    frames = []
+
+    def bench():
+        if prologue is not None:
+            yield from prologue()
+
+        for offset, length in replays:
+            yield dut.offset.eq(offset)
+            yield dut.length.eq(length)
+            yield dut.rewind.eq(1)
+            yield
+            yield dut.rewind.eq(0)
+            yield dut.source.ready.eq(1)
+
+            frame = []
+            while True:
+                yield
+                if (yield dut.source.valid):
+                    frame.append((yield dut.source.data))
+                    if (yield dut.source.last):
+                        break
+            yield dut.source.ready.eq(0)
+            frames.append(frame)
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    with trace_vcd(sim, "tests/test_mem_stream_seek.vcd"):
+        sim.run()
+
+    return frames
+
+
+def test_mem_stream_seek():
+    data = list(range(0x10, 0x20))
+    dut = MemoryStream(8, 32)
+
+    def fill():
+        for v in data:
+            yield dut.sink.data.eq(v)
+            yield dut.sink.valid.eq(1)
+            yield
+        yield dut.sink.valid.eq(0)
+
+    replays = [(0, 0), (4, 3), (15, 1), (10, 20), (0, 16)]
+    frames = run_replays(dut, replays, prologue=fill)
+
+    assert frames[0] == data
+    assert frames[1] == data[4:7]
+    assert frames[2] == data[15:16]
+    assert frames[3] == data[10:]
+    assert frames[4] == data
+
+
+def test_mem_stream_reader_seek():
+    data = list(range(0x40, 0x50))
+
+    for buffered in [True, False]:
+        dut = MemoryStreamReader(8, data, buffered=buffered)
+        replays = [(0, 0), (2, 5), (15, 0), (12, 4), (7, 1)]
+        frames = run_replays(dut, replays)
+
+        assert frames[0] == data
+        assert frames[1] == data[2:7]
+        assert frames[2] == data[15:]
+        assert frames[3] == data[12:16]
+        assert frames[4] == data[7:8]
+
+
+def test_mem_stream_reader_packed():
+    data = [0x00] * 9 + [0x11, 0x22, 0x22, 0x33] + [0xff] * 20 + [0x44]
+    replays = [(0, 0), (3, 8), (9, 4), (11, 0), (30, 3), (12, 1)]
+    expected = [data[o:o + l] if l else data[o:] for o, l in replays]
+
+    for kwargs in [{"pack": 2}, {"pack": 4}, {"rle": True},
+                   {"rle": True, "max_run": 4, "buffered": False}]:
+        dut = MemoryStreamReader(8, data, **kwargs)
+        assert run_replays(dut, replays) == expected
+
+    # Fewer memory words
+    assert len(rle_encode(data)) == 6
+    assert rle_encode(data, max_run=4) == \
+        [(0x00, 4), (0x00, 4), (0x00, 1), (0x11, 1), (0x22, 2), (0x33, 1),
+         (0xff, 4), (0xff, 4), (0xff, 4), (0xff, 4), (0xff, 4), (0x44, 1)]
+
+
+def test_mem_stream_reader_packed_rate():
+    data = list(range(64))
+
+    for kwargs in [{"pack": 4}, {"rle": True}]:
+        dut = MemoryStreamReader(8, data, **kwargs)
+        sim = Simulator(dut)
+
+        receiver = StreamSimReceiver(dut.source, length=len(data), speed=1)
+        cycles = []
+        def count():
+            while len(receiver.data["data"]) < len(data):
+                cycles.append(1)
+                yield
+
+        sim.add_clock(1e-6)
+        sim.add_sync_process(receiver.sync_process)
+        sim.add_sync_process(count)
+        sim.run()
+
+        assert receiver.data["data"] == data
+        assert len(cycles) <= len(data) + 4
+
+
+def test_mem_stream_occupancy():
+    dut = MemoryStream(8, 8)
+    sim = Simulator(dut)
+
+    def bench():
+        yield dut.watermark.eq(6)
+
+        for i in range(10):
+            yield dut.sink.data.eq(i)
+            yield dut.sink.valid.eq(1)
+            yield
+            yield Settle()
+            assert (yield dut.level) == min(i + 1, 8)
+            assert (yield dut.full) == (i >= 7)
+            assert (yield dut.almost_full) == (i >= 5)
+            # The 9th value is refused
+            assert (yield dut.overflow) == (i >= 8)
+        yield dut.sink.valid.eq(0)
+
+        yield dut.rewind.eq(1)
+        yield
+        yield dut.rewind.eq(0)
+        yield Settle()
+        assert not (yield dut.full)
+        assert not (yield dut.overflow)
+        assert not (yield dut.almost_full)
+        assert (yield dut.level) == 8
+
+        # Data up to depth is kept
+        yield dut.source.ready.eq(1)
+        data = []
+        while True:
+            yield
+            if (yield dut.source.valid):
+                data.append((yield dut.source.data))
+                if (yield dut.source.last):
+                    break
+        assert data == list(range(8))
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(bench)
+    sim.run()
+
+
+def test_mem_stream_circular():
+    for count in [5, 8, 21]:
+        data = list(range(0x80, 0x80 + count))
+        dut = MemoryStream(8, 8, circular=True)
+
+        def fill():
+            for v in data:
+                yield dut.sink.data.eq(v)
+                yield dut.sink.valid.eq(1)
+                yield
+            yield dut.sink.valid.eq(0)
+
+        stored = data[-8:]
+        replays = [(0, 0), (2, 3), (0, 0)]
+        frames = run_replays(dut, replays, prologue=fill)
+
+        assert frames[0] == stored
+        assert frames[1] == stored[2:5]
+        assert frames[2] == stored
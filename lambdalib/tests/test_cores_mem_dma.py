@@ -0,0 +1,188 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import random
+
+import pytest
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.cores.mem.dma import *
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
+
+
+class WishboneRAM(Elaboratable):
+    """ Wishbone RAM model with wait states driven by `wait`.
+
+    In classic mode it supports registered feedback bursts, acking one
+    word per cycle during incrementing or constant address bursts.
+    In pipelined mode responses come back `latency` cycles after each
+    accepted request.
+    """
+    def __init__(self, bus, depth, pipelined=False, latency=3):
+        self.bus = bus
+        self.depth = depth
+        self.pipelined = pipelined
+        self.latency = latency
+        self.wait = Signal()
+        self.mem = Memory(width=len(bus.dat_w), depth=depth)
+
+    def elaborate(self, platform):
+        bus = self.bus
+
+        m = Module()
+        m.submodules.wp = wp = self.mem.write_port()
+        m.submodules.rp = rp = self.mem.read_port(transparent=False)
+
+        if self.pipelined:
+            accept = bus.cyc & bus.stb & ~bus.stall
+            m.d.comb += [
+                bus.stall.eq(self.wait),
+                rp.addr.eq(bus.adr),
+                wp.addr.eq(bus.adr),
+                wp.data.eq(bus.dat_w),
+                wp.en.eq(accept & bus.we),
+            ]
+
+            # Response delay line
+            valid = Signal(self.latency)
+            datas = [Signal.like(bus.dat_r) for _ in range(self.latency)]
+            m.d.sync += valid.eq(Cat(accept, valid))
+            m.d.comb += datas[0].eq(rp.data)
+            for i in range(1, self.latency):
+                m.d.sync += datas[i].eq(datas[i - 1])
+            m.d.comb += [
+                bus.ack.eq(valid[-1] & bus.cyc),
+                bus.dat_r.eq(datas[-1]),
+            ]
+
+        else:
+            burst = (bus.cti == 0b001) | (bus.cti == 0b010)
+            done = bus.ack & bus.stb
+
+            with m.If(done & (bus.cti == 0b010)):
+                m.d.comb += rp.addr.eq(bus.adr + 1)
+            with m.Else():
+                m.d.comb += rp.addr.eq(bus.adr)
+
+            m.d.sync += bus.ack.eq(bus.cyc & bus.stb & ~self.wait &
+                                   ~(bus.ack & ~burst))
+            m.d.comb += [
+                bus.dat_r.eq(rp.data),
+                wp.addr.eq(bus.adr),
+                wp.data.eq(bus.dat_w),
+                wp.en.eq(done & bus.we),
+            ]
+
+        return m
+
+
+class DMABench(Elaboratable):
+    def __init__(self, dma_cls, pipelined):
+        self.dma = dma_cls(width=32, addr_width=8, pipelined=pipelined,
+                           max_pending=8)
+        self.ram = WishboneRAM(self.dma.bus, 256, pipelined=pipelined)
+
+    def elaborate(self, platform):
+        m = Module()
+        m.submodules.dma = self.dma
+        m.submodules.ram = self.ram
+        return m
+
+
+def waits(ram, rate, seed):
+    def process():
+        rng = random.Random(seed)
+        yield Passive()
+        while True:
+            yield ram.wait.eq(rng.random() < rate)
+            yield
+    return process
+
+
+DESCRIPTORS = [
+    # addr, length, fixed
+    (0x10, 16, 0),
+    (0x80, 1,  0),
+    (0x40, 4,  1),
+    (0xa0, 33, 0),
+]
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+@pytest.mark.parametrize("wait_rate", [0, 0.3])
+def test_stream_to_wishbone(pipelined, wait_rate):
+    bench = DMABench(StreamToWishbone, pipelined)
+    dma, ram = bench.dma, bench.ram
+    sim = Simulator(bench)
+
+    datas = list(range(0x1000, 0x1000 + sum(d[1] for d in DESCRIPTORS)))
+    descs = {"addr":   [d[0] for d in DESCRIPTORS],
+             "length": [d[1] for d in DESCRIPTORS],
+             "fixed":  [d[2] for d in DESCRIPTORS]}
+
+    desc_tx = StreamSimSender(dma.desc, descs, speed=1)
+    data_tx = StreamSimSender(dma.sink, datas, speed=1)
+
+    expected = {}
+    it = iter(datas)
+    for addr, length, fixed in DESCRIPTORS:
+        for i in range(length):
+            expected[addr if fixed else addr + i] = next(it)
+
+    cycles = []
+    def check():
+        yield
+        while (yield dma.sink.valid) or (yield dma.desc.valid) or \
+              (yield dma.busy):
+            cycles.append(1)
+            yield
+
+        for addr, value in expected.items():
+            assert (yield ram.mem[addr]) == value
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(desc_tx.sync_process)
+    sim.add_sync_process(data_tx.sync_process)
+    sim.add_sync_process(waits(ram, wait_rate, 0))
+    sim.add_sync_process(check)
+    with trace_vcd(sim, "tests/test_stream_to_wishbone.vcd"):
+        sim.run()
+
+    if wait_rate == 0:
+        assert len(cycles) < len(datas) + 4 * len(DESCRIPTORS) + 8
+
+
+@pytest.mark.parametrize("pipelined", [False, True])
+@pytest.mark.parametrize("wait_rate,speed_rx", [(0, 1), (0.3, 1), (0, 0.3)])
+def test_wishbone_to_stream(pipelined, wait_rate, speed_rx):
+    bench = DMABench(WishboneToStream, pipelined)
+    dma, ram = bench.dma, bench.ram
+
+    init = [0x5000 + i for i in range(256)]
+    ram.mem.init = init
+    sim = Simulator(bench)
+
+    descs = {"addr":   [d[0] for d in DESCRIPTORS],
+             "length": [d[1] for d in DESCRIPTORS],
+             "fixed":  [d[2] for d in DESCRIPTORS]}
+
+    expected = {"data": [], "last": []}
+    for addr, length, fixed in DESCRIPTORS:
+        for i in range(length):
+            expected["data"].append(init[addr if fixed else addr + i])
+            expected["last"].append(int(i == length - 1))
+
+    desc_tx = StreamSimSender(dma.desc, descs, speed=1)
+    receiver = StreamSimReceiver(dma.source, length=len(expected["data"]),
+                                 speed=speed_rx, seed=1)
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(desc_tx.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    sim.add_sync_process(waits(ram, wait_rate, 0))
+    with trace_vcd(sim, "tests/test_wishbone_to_stream.vcd"):
+        sim.run()
+
+    receiver.verify(expected)
@@ -4,6 +4,7 @@ from amaranth import *
 from amaranth.sim import *
 
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 from lambdalib.cores.regs import *
 
 
@@ -24,7 +25,7 @@ def test_regs():
 
     sim.add_clock(1e-6)
     sim.add_sync_process(sender.sync_process)
-    with sim.write_vcd("tests/test_stream_regs.vcd"):
+    with trace_vcd(sim, "tests/test_stream_regs.vcd"):
         sim.run()
 
 
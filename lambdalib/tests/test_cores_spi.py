@@ -18,6 +18,7 @@ from lambdalib.cores.spi.common import *
 
 from amaranth.sim import *
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 
 
 class MasterSlaveBench(Elaboratable):
@@ -173,7 +174,7 @@ def test_spi(bus_width=1):
     sim.add_sync_process(slave_rx.sync_process)
     sim.add_sync_process(slave_tx.sync_process)
     sim.add_sync_process(control)
-    with sim.write_vcd(f"tests/test_spi_x{bus_width}.vcd"):
+    with trace_vcd(sim, f"tests/test_spi_x{bus_width}.vcd"):
         sim.run()
 
     slave_rx.verify({k:master_data[k] for k in ["data", "len"]})
@@ -196,7 +197,7 @@ def test_spi_stream(bus_width=1):
     sim.add_clock(1e-6)
     sim.add_sync_process(stream_tx.sync_process)
     sim.add_sync_process(stream_rx.sync_process)
-    with sim.write_vcd(f"tests/test_spi_stream_x{bus_width}.vcd"):
+    with trace_vcd(sim, f"tests/test_spi_stream_x{bus_width}.vcd"):
         sim.run()
 
     stream_rx.verify(stream_data)
@@ -230,7 +231,7 @@ def test_spi_loop():
     sim.add_sync_process(master_tx.sync_process)
     sim.add_sync_process(master_rx.sync_process)
     sim.add_sync_process(control)
-    with sim.write_vcd("tests/test_spi_loop.vcd"):
+    with trace_vcd(sim, "tests/test_spi_loop.vcd"):
         sim.run()
 
 
@@ -256,7 +257,7 @@ def test_spi_wb_bridge():
     sim.add_clock(1e-6)
     sim.add_sync_process(recv)
     sim.add_sync_process(slave_tx.sync_process)
-    with sim.write_vcd("tests/test_spi_wb_bridge.vcd"):
+    with trace_vcd(sim, "tests/test_spi_wb_bridge.vcd"):
         sim.run()
 
 
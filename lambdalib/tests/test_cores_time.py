@@ -4,6 +4,7 @@ from amaranth import *
 from amaranth.sim import *
 
 from lambdalib.cores.time.timer import *
+from lambdalib.interface.sim_trace import *
 
 
 def test_timer():
@@ -24,7 +25,7 @@ def test_timer():
 
     sim.add_clock(1e-6)
     sim.add_sync_process(bench)
-    with sim.write_vcd("tests/test_time_timer.vcd"):
+    with trace_vcd(sim, "tests/test_time_timer.vcd"):
         sim.run()
 
 
@@ -53,7 +54,7 @@ def test_ntimer():
 
     sim.add_clock(1e-6)
     sim.add_sync_process(bench)
-    with sim.write_vcd("tests/test_time_timer.vcd"):
+    with trace_vcd(sim, "tests/test_time_timer.vcd"):
         sim.run()
 
 
@@ -0,0 +1,97 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from functools import partial
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.interface import stream
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_fuzz import *
+from lambdalib.interface.sim_fuzz import _get_session
+
+
+def make_fifo(depth=8):
+    return stream.SyncFIFO([("data", 8)], depth)
+
+
+def make_bench(dut, seed, speed_tx, speed_rx, length=32):
+    data = {"data": [(seed + i) & 0xff for i in range(length)]}
+    tx = StreamSimSender(dut.sink, data, speed=speed_tx, seed=seed)
+    rx = StreamSimReceiver(dut.source, length=length, speed=speed_rx,
+                           seed=seed + 1)
+    return [tx, rx], lambda: rx.verify(data)
+
+
+def make_broken_bench(dut, seed, speed_tx, speed_rx):
+    processes, check = make_bench(dut, seed, speed_tx, speed_rx)
+
+    def broken_check():
+        check()
+        # Pretend odd seeds trigger a bug
+        assert seed % 2 == 0
+    return processes, broken_check
+
+
+def test_stream_sim_seed():
+    runs = []
+    for _ in range(2):
+        dut = make_fifo()
+        sim = Simulator(dut)
+        tx, rx = make_bench(dut, 42, 0.5, 0.5)[0]
+        cycles = []
+
+        def count():
+            yield Passive()
+            while True:
+                yield
+                cycles.append((yield dut.source.ready))
+
+        sim.add_clock(1e-6)
+        sim.add_sync_process(tx.sync_process)
+        sim.add_sync_process(rx.sync_process)
+        sim.add_sync_process(count)
+        sim.run()
+        runs.append(cycles)
+
+    assert runs[0] == runs[1]
+
+
+def test_stream_fuzzer():
+    fuzzer = StreamFuzzer(make_fifo, make_bench,
+                          speed_tx=[0.2, 1], speed_rx=[0.3, 1])
+    report = fuzzer.run(seeds=range(4), workers=2)
+    print(report.summary())
+
+    assert report.ok
+    assert len(report.runs) == 16
+    stats = report.throughput()
+    full = stats[(("speed_rx", 1), ("speed_tx", 1))]
+    assert full["min"] > 0.5
+    assert stats[(("speed_rx", 0.3), ("speed_tx", 0.2))]["max"] < full["min"]
+
+
+def test_stream_fuzzer_replay(tmp_path):
+    fuzzer = StreamFuzzer(make_fifo, make_broken_bench,
+                          speed_tx=[0.5], speed_rx=[0.5])
+    report = fuzzer.run(seeds=range(4), workers=0)
+
+    assert [f["config"]["seed"] for f in report.failures] == [1, 3]
+    report.save_failures(tmp_path / "failures.json")
+
+    failure = report.failures[0]
+    run = fuzzer.replay(failure["config"], raise_on_error=False)
+    assert not run.ok
+    assert run.cycles == failure["cycles"]
+
+
+def test_stream_fuzzer_partial():
+    # Parametrized design factories, each with its own session
+    for depth in [8, 16]:
+        fuzzer = StreamFuzzer(partial(make_fifo, depth=depth), make_bench,
+                              speed_tx=[1], speed_rx=[0.5])
+        report = fuzzer.run(seeds=range(2), workers=0)
+        assert report.ok
+
+    assert _get_session(partial(make_fifo, depth=16))[0].depth == 16
+    assert _get_session(partial(make_fifo, depth=8))[0].depth == 8
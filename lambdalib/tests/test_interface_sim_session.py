@@ -0,0 +1,75 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.interface import stream
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_session import *
+from lambdalib.cores.mem.stream import *
+
+
+def test_sim_session_sweep():
+    dut = stream.SyncFIFO([("data", 8)], 8)
+    session = SimSession(dut)
+
+    def bench(length, speed_tx, speed_rx):
+        data = {"data": [i & 0xff for i in range(length)]}
+        tx = StreamSimSender(dut.sink, data, speed=speed_tx)
+        rx = StreamSimReceiver(dut.source, length=length, speed=speed_rx)
+        return [tx, rx], lambda: rx.verify(data)
+
+    configs = [
+        {"length": length, "speed_tx": tx, "speed_rx": rx, "seed": seed}
+        for length in (1, 16, 100)
+        for tx, rx in ((1, 1), (0.3, 0.9), (0.9, 0.2))
+        for seed in range(2)
+    ]
+    runs = session.sweep(bench, configs, verbose=True)
+
+    assert len(runs) == len(configs)
+    assert all(run.ok for run in runs)
+    assert all(run.cycles >= run.config["length"] for run in runs)
+
+    # Same seed, same schedule
+    again = session.sweep(bench, configs[-2:])
+    assert [r.cycles for r in again] == [r.cycles for r in runs[-2:]]
+
+
+def test_sim_session_failure():
+    dut = MemoryStream(8, 8)
+    session = SimSession(dut)
+
+    def bench(expected):
+        data = {"data": [1, 2, 3, 4]}
+        tx = StreamSimSender(dut.sink, data, speed=1)
+        rx = StreamSimReceiver(dut.source, length=4, speed=1,
+                               initial_delay=10)
+
+        def rewind():
+            for i in range(8):
+                yield
+            yield dut.rewind.eq(1)
+            yield
+            yield dut.rewind.eq(0)
+
+        return [tx, rx, rewind], lambda: rx.verify({"data": expected})
+
+    ok, ko, ok2 = session.sweep(bench, [
+        {"expected": [1, 2, 3, 4]},
+        {"expected": [1, 2, 3, 5]},
+        {"expected": [1, 2, 3, 4]},
+    ])
+    assert ok.ok and ok2.ok
+    assert isinstance(ko.error, AssertionError)
+
+    def stuck():
+        while True:
+            yield
+
+    run = session.run([stuck], max_cycles=100)
+    assert isinstance(run.error, TimeoutError)
+    assert run.cycles == 100
+
+    run = session.run(*bench([1, 2, 3, 4]))
+    assert run.ok
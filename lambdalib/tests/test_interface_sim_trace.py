@@ -0,0 +1,76 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import gzip
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.interface import stream
+from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
+
+
+def run_bench(filename, length=32, traces=lambda dut: (), **kwargs):
+    dut = stream.PipeValid([("data", 8)])
+    sim = Simulator(dut)
+
+    data = {"data": list(range(length))}
+    sender = StreamSimSender(dut.sink, data, speed=0.5)
+    receiver = StreamSimReceiver(dut.source, length=length, speed=0.5)
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    with trace_vcd(sim, filename, traces=traces(dut), **kwargs) as tracer:
+        sim.run()
+
+    receiver.verify(data)
+    return tracer
+
+
+def test_trace_disabled(tmp_path):
+    tracer = run_bench(str(tmp_path / "trace.vcd"), enable=False)
+    assert tracer is None
+    assert not list(tmp_path.iterdir())
+
+
+def test_trace_full(tmp_path):
+    run_bench(str(tmp_path / "trace.vcd"), enable=True)
+    content = (tmp_path / "trace.vcd").read_text()
+    assert "sink" in content
+    assert "source" in content
+
+
+def test_trace_selective_window(tmp_path):
+    tracer = run_bench(str(tmp_path / "trace.vcd"), enable=True,
+                       traces=lambda dut: [dut.source], window=(10, 20))
+
+    names = [name for _, name, _ in tracer.signals]
+    assert names == ["valid", "ready", "first", "last", "data"]
+    assert all(10 <= cycle < 20 for cycle, _ in tracer._history)
+
+    content = (tmp_path / "trace.vcd").read_text()
+    assert "sink" not in content
+    assert "#9000\n" not in content
+    assert "#19000\n" in content
+    assert "#20000\n" not in content
+
+
+def test_trace_compressed_last(tmp_path):
+    tracer = run_bench(str(tmp_path / "trace.vcd"), enable=True,
+                       traces=lambda dut: [dut], last=8, compress=True)
+
+    with gzip.open(tmp_path / "trace.vcd.gz", "rt") as f:
+        content = f.read()
+
+    first = (tracer.cycle - 8) * 1000
+    assert f"#{first}\n" in content
+    assert f"#{first - 1000}\n" not in content
+
+
+def test_trace_full_env_window(tmp_path, monkeypatch):
+    # Windows from the environment do not apply to full dumps
+    monkeypatch.setenv("LAMBDALIB_VCD_WINDOW", "10:20")
+    monkeypatch.setenv("LAMBDALIB_VCD_LAST", "8")
+    run_bench(str(tmp_path / "trace.vcd"), enable=True)
+    assert "source" in (tmp_path / "trace.vcd").read_text()
@@ -5,6 +5,7 @@ from amaranth.sim import *
 
 from lambdalib.interface import stream
 from lambdalib.interface.stream_sim import *
+from lambdalib.interface.sim_trace import *
 from lambdalib.interface.stream_utils import *
 
 
@@ -51,7 +52,7 @@ def test_splitter():
     sim.add_sync_process(receiver0.sync_process)
     sim.add_sync_process(receiver1.sync_process)
     sim.add_sync_process(receiver2.sync_process)
-    with sim.write_vcd("tests/test_stream_splitter.vcd"):
+    with trace_vcd(sim, "tests/test_stream_splitter.vcd"):
         sim.run()
 
 
@@ -91,7 +92,7 @@ def test_merger():
     sim.add_sync_process(sender1.sync_process)
     sim.add_sync_process(sender2.sync_process)
     sim.add_sync_process(receiver.sync_process)
-    with sim.write_vcd("tests/test_stream_merger.vcd"):
+    with trace_vcd(sim, "tests/test_stream_merger.vcd"):
         sim.run()
 
 
@@ -113,7 +114,7 @@ def test_last_inserter():
     sim.add_clock(1e-6)
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(receiver.sync_process)
-    with sim.write_vcd("tests/test_stream_last_inserter.vcd"):
+    with trace_vcd(sim, "tests/test_stream_last_inserter.vcd"):
         sim.run()
 
 
@@ -135,7 +136,7 @@ def test_last_timeout():
     sim.add_clock(1e-6)
     sim.add_sync_process(sender.sync_process)
     sim.add_sync_process(receiver.sync_process)
-    with sim.write_vcd("tests/test_stream_last_on_timeout.vcd"):
+    with trace_vcd(sim, "tests/test_stream_last_on_timeout.vcd"):
         sim.run()
 
 
@@ -0,0 +1,115 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import random
+
+import numpy as np
+
+from amaranth import *
+from amaranth.sim import *
+
+from lambdalib.interface import stream
+from lambdalib.interface.stream_sim import *
+from lambdalib.cores.float.clz import *
+from lambdalib.cores.float.i2f import *
+from lambdalib.cores.math.multiplier import *
+from lambdalib.cores.filter.iir import *
+from lambdalib.models import *
+
+
+def run_stream(dut, sink, source, data, length):
+    sim = Simulator(dut)
+
+    sender = StreamSimSender(sink, data, speed=0.8)
+    receiver = StreamSimReceiver(source, length=length, speed=0.8)
+
+    sim.add_clock(1e-6)
+    sim.add_sync_process(sender.sync_process)
+    sim.add_sync_process(receiver.sync_process)
+    sim.run()
+
+    return receiver.data
+
+
+def test_model_clz():
+    dut = CLZ()
+    sim = Simulator(dut)
+
+    values = [0, 1, 2, 0xffffffff, 0x80000000, 0x00010000] + \
+             [random.getrandbits(random.randint(1, 32)) for _ in range(100)]
+    expected = clz(values)
+
+    def bench():
+        for v, e in zip(values, expected):
+            yield dut.d.eq(v)
+            yield Settle()
+            assert (yield dut.clz) == e
+
+    sim.add_process(bench)
+    sim.run()
+
+
+def test_model_i2f():
+    dut = Int2Float()
+
+    values = [0, 1, 0x7fffffff, 0x80000000, 0xffffffff, 0x00000a76] + \
+             [random.getrandbits(32) for _ in range(100)]
+    data = {"data": values}
+    res = run_stream(dut, dut.sink, dut.source, data, len(values))
+
+    assert res["data"] == int2float(values).tolist()
+
+    # Check against numpy float conversion, mantissa is truncated.
+    small = np.array([-1000, -3, 0, 5, 12345], dtype=np.int32)
+    floats = int2float(small).astype(np.uint32).view(np.float32)
+    assert np.array_equal(floats, small.astype(np.float32))
+
+
+def test_model_multiplier():
+    dut = Multiplier(signed(12), 8)
+
+    a = [random.randint(-2**11, 2**11 - 1) for _ in range(50)]
+    b = [random.randint(0, 2**8 - 1) for _ in range(50)]
+    res = run_stream(dut, dut.i, dut.o, {"a": a, "b": b}, len(a))
+
+    expected = multiply(a, b, signed(12), 8)
+    assert res["c"] == expected.tolist()
+
+
+def test_model_converter():
+    data = [random.getrandbits(8) for _ in range(24)]
+    last = [0] * 10 + [1] + [0] * 12 + [1]
+
+    for nbits_to, reverse in [(32, False), (32, True), (16, False)]:
+        dut = stream.Converter(8, nbits_to, reverse=reverse)
+        exp_data, exp_last = convert(data, 8, nbits_to,
+                                     reverse=reverse, last=last)
+        res = run_stream(dut, dut.sink, dut.source,
+                         {"data": data, "last": last}, len(exp_data))
+        assert res["data"] == exp_data.tolist()
+        assert res["last"] == exp_last.astype(int).tolist()
+
+    dut = stream.Converter(32, 8)
+    words = [random.getrandbits(32) for _ in range(8)]
+    exp_data, exp_last = convert(words, 32, 8, last=[0] * 7 + [1])
+    res = run_stream(dut, dut.sink, dut.source,
+                     {"data": words, "last": [0] * 7 + [1]}, len(exp_data))
+    assert res["data"] == exp_data.tolist()
+    assert res["last"] == exp_last.astype(int).tolist()
+
+
+def test_model_iir():
+    dut = IIRFilter(2, 1e3, 48e3)
+    model = IIRFilterModel.from_core(dut)
+
+    x = [random.randint(-2**15, 2**15 - 1) for _ in range(40)]
+    res = run_stream(dut, dut.sink, dut.source, {"data": x}, len(x))
+
+    assert res["data"] == model(x).tolist()
+
+
+if __name__ == "__main__":
+    test_model_clz()
+    test_model_i2f()
+    test_model_multiplier()
+    test_model_converter()
+    test_model_iir()
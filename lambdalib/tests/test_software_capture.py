@@ -0,0 +1,52 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+import pytest
+
+from lambdalib.software.capture import *
+
+
+def test_capture_roundtrip(tmp_path):
+    signals = [("valid", 1), ("data", 16), ("wide", 80)]
+    count = 1000
+    fields = [
+        np.arange(count) % 2,
+        np.arange(count, dtype=np.uint64) * 3,
+        np.array([(i << 64) | i for i in range(count)], dtype=object),
+    ]
+    times = np.arange(count) * 4
+
+    directory = tmp_path / "capture"
+    assert save_capture(directory, signals, fields, trigger=10, times=times,
+                        period=20, design="test") == count
+
+    capture = load_capture(directory)
+    assert len(capture) == count
+    assert capture.signals == signals
+    assert capture.trigger == 10
+    assert capture.period == 20
+    assert capture.metadata == {"design": "test"}
+    assert "data" in capture and "unknown" not in capture
+
+    # Lazily memory-mapped, with the smallest dtype
+    data = capture["data"]
+    assert isinstance(data, np.memmap)
+    assert data.dtype == np.uint16
+    assert list(data[100:103]) == [300, 303, 306]
+    assert capture["valid"].dtype == np.uint8
+    assert list(capture.times[:3]) == [0, 4, 8]
+
+    # Wide signals are little endian byte rows
+    wide = capture["wide"]
+    assert wide.shape == (count, 10)
+    assert int.from_bytes(wide[5].tobytes(), "little") == (5 << 64) | 5
+
+    with pytest.raises(KeyError):
+        capture["unknown"]
+
+
+def test_capture_default_times(tmp_path):
+    save_capture(tmp_path, [("a", 4)], [np.zeros(5)])
+    capture = load_capture(tmp_path)
+    assert list(capture.times) == [0, 1, 2, 3, 4]
+    assert capture.trigger is None
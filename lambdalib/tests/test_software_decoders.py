@@ -0,0 +1,126 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import numpy as np
+import pytest
+
+from lambdalib.software.decoders import *
+
+
+class I2CWave:
+    """ Build SCL / SDA samples, 4 samples per bit. """
+    def __init__(self):
+        self.scl = [1, 1]
+        self.sda = [1, 1]
+
+    def add(self, scl, sda):
+        self.scl.append(scl)
+        self.sda.append(sda)
+
+    def start(self):
+        # (Repeated) START: SDA falls while SCL is high
+        self.add(0, 1)
+        self.add(1, 1)
+        self.add(1, 0)
+        self.add(0, 0)
+
+    def stop(self):
+        self.add(0, 0)
+        self.add(1, 0)
+        self.add(1, 1)
+        self.add(1, 1)
+
+    def bit(self, value):
+        for scl in (0, 1, 1, 0):
+            self.add(scl, value)
+
+    def byte(self, value, ack=True):
+        for i in reversed(range(8)):
+            self.bit((value >> i) & 1)
+        self.bit(0 if ack else 1)
+
+
+def test_decode_i2c():
+    wave = I2CWave()
+    wave.start()
+    wave.byte(0x50 << 1)
+    wave.byte(0x12)
+    wave.byte(0x34)
+    wave.start()
+    wave.byte((0x50 << 1) | 1)
+    wave.byte(0xab, ack=False)
+    wave.stop()
+    # Noise after the STOP is ignored
+    wave.bit(1)
+    wave.start()
+    wave.byte(0x21 << 1, ack=False)
+    wave.stop()
+
+    transactions = decode_i2c(wave.scl, wave.sda)
+    assert [t[1:] for t in transactions] == [
+        (0x50, False, [0x12, 0x34], [True, True, True]),
+        (0x50, True, [0xab], [True, False]),
+        (0x21, False, [], [False]),
+    ]
+    assert transactions[0].time == 4
+
+
+def spi_wave(words, cpol, cpha, width=8, gap=3):
+    """ Each word in its own transfer, MOSI and MISO carry the same bits. """
+    clk, data, cs_n = [cpol] * gap, [0] * gap, [1] * gap
+    for word in words:
+        for i in reversed(range(width)):
+            bit = (word >> i) & 1
+            # Data changes half a period before the sampling edge
+            if cpha:
+                clk += [1 - cpol, 1 - cpol, cpol, cpol]
+            else:
+                clk += [cpol, cpol, 1 - cpol, 1 - cpol]
+            data += [bit] * 4
+            cs_n += [0] * 4
+        clk += [cpol] * gap
+        data += [0] * gap
+        cs_n += [1] * gap
+    return clk, data, cs_n
+
+
+@pytest.mark.parametrize("cpol,cpha", [(0, 0), (0, 1), (1, 0), (1, 1)])
+def test_decode_spi(cpol, cpha):
+    clk, data, cs_n = spi_wave([0xa5, 0x3c], cpol, cpha)
+    transfers = decode_spi(clk, data, data, cs_n, cpol=cpol, cpha=cpha)
+    assert [(t.mosi, t.miso) for t in transfers] == [([0xa5], [0xa5]),
+                                                     ([0x3c], [0x3c])]
+    assert transfers[0].time == 3
+
+
+def test_decode_spi_words():
+    clk, data, _ = spi_wave([0x1234], 0, 0, width=16, gap=1)
+    transfers = decode_spi(clk, data, width=16)
+    assert transfers == [SPITransfer(0, [0x1234], [])]
+
+
+def uart_wave(chars, divisor, idle=5, bad_stop=()):
+    line = [1] * idle
+    for i, char in enumerate(chars):
+        bits = [0] + [(char >> b) & 1 for b in range(8)]
+        bits += [0 if i in bad_stop else 1]
+        for bit in bits:
+            line += [bit] * divisor
+        line += [1] * idle
+    return np.array(line)
+
+
+def test_decode_uart():
+    line = uart_wave([0x55, 0x00, 0xff, 0x81], 8, bad_stop=(2,))
+    frames = decode_uart(line, 8)
+    assert [(f.data, f.error) for f in frames] == \
+        [(0x55, False), (0x00, False), (0xff, True), (0x81, False)]
+    assert frames[0].time == 5
+
+
+def test_decode_uart_times():
+    # Decimated capture: one sample every 2 cycles, timestamps in cycles
+    line = uart_wave([0x42, 0x99], 16)
+    times = np.arange(len(line))[1::2]
+    frames = decode_uart(line[1::2], 16, times=times)
+    assert [f.data for f in frames] == [0x42, 0x99]
+    assert not any(f.error for f in frames)
@@ -0,0 +1,277 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+import io
+
+import numpy as np
+import pytest
+
+from lambdalib.software.capture import load_capture
+from lambdalib.software.ila import *
+
+
+def test_parse_layout():
+    assert parse_layout("data:8, valid:1,ready:1") == \
+        [("data", 8), ("valid", 1), ("ready", 1)]
+
+    for layout in ["", "data", "data:0", "data:x", ":8"]:
+        with pytest.raises(ValueError):
+            parse_layout(layout)
+
+
+def test_encode_trigger():
+    # value, mask, edge (8 bits each), count, timeout (16 bits each)
+    data = encode_trigger([{"value": 0x12, "mask": 0xff, "count": 3},
+                           {"edge": 0x01, "timeout": 0x1234}], width=8)
+    assert data == bytes([0x12, 0xff, 0x00, 0x03, 0x00, 0x00, 0x00,
+                          0x00, 0x00, 0x01, 0x00, 0x00, 0x34, 0x12])
+
+    with pytest.raises(ValueError):
+        encode_trigger([{"value": 0x100}], width=8)
+    with pytest.raises(ValueError):
+        encode_trigger([{"unknown": 1}], width=8)
+
+
+def test_send_trigger():
+    stage = parse_trigger_stage("value=0x42, mask=0xff,timeout=100")
+    assert stage == {"value": 0x42, "mask": 0xff, "timeout": 100}
+    for stage_str in ["value", "value=x"]:
+        with pytest.raises(ValueError):
+            parse_trigger_stage(stage_str)
+
+    port = io.BytesIO()
+    config = encode_trigger([stage], width=8)
+    send_trigger(port, config)
+    assert port.getvalue() == bytes([CMD_TRIGGER, len(config)]) + config
+
+    with pytest.raises(ValueError):
+        send_trigger(io.BytesIO(), bytes(256))
+
+
+def test_read_rle_rows():
+    # 12-bit samples, 8-bit repeat counts: 3 bytes per entry
+    raw = bytes([
+        3, 0, 0,            # 3 entries
+        1, 0, 0,            # the trigger is the second entry
+        0x23, 0x01, 4,
+        0xff, 0x0f, 0,
+        0x00, 0x00, 255,
+    ])
+    rows, repeats, trigger = read_rle_rows(io.BytesIO(raw), 12, rle_width=8)
+    assert rows_to_int(rows).tolist() == [0x123, 0xfff, 0]
+    assert repeats.tolist() == [5, 1, 256]
+    assert trigger == 5
+
+    with pytest.raises(EOFError):
+        read_rle_rows(io.BytesIO(raw[:-1]), 12, rle_width=8)
+
+
+def test_write_vcd():
+    signals = [("a", 4), ("b", 4)]
+    samples = [0x00, 0x01, 0x01, 0x11]
+
+    f = io.StringIO()
+    assert write_vcd(f, signals, samples, trigger=2) == 4
+    vcd = f.getvalue()
+
+    # Value changes are only written when a signal changes
+    body = vcd[vcd.index("$enddefinitions"):]
+    assert body.count("b1 ") == 2
+    assert "#2000\n1" in body
+
+
+class PacketPort:
+    """ Returns at most one packet per read, like a USB bulk endpoint. """
+    def __init__(self, data, packet_size):
+        self.data = data
+        self.packet_size = packet_size
+        self.lengths = []
+
+    def read(self, length):
+        self.lengths.append(length)
+        n = min(length, self.packet_size)
+        data, self.data = self.data[:n], self.data[n:]
+        return list(data)
+
+
+def test_read_exact_chunks():
+    port = PacketPort(bytes(range(10)), 4)
+    assert read_exact(port, 6) == bytes(range(6))
+    with pytest.raises(EOFError):
+        read_exact(port, 6)
+
+
+def test_buffered_port():
+    port = PacketPort(bytes(range(24)), 8)
+    buffered = BufferedPort(port, chunk_size=8)
+    assert rows_to_int(read_rows(buffered, 12, 2)).tolist() == \
+        [int.from_bytes(bytes([i, i + 1]), "little") for i in range(0, 24, 2)]
+    assert set(port.lengths) == {8}
+
+
+def test_read_timestamped_rows():
+    # 8-bit samples with 8-bit timestamps wrapping around
+    raw = bytes([0x10, 250, 0x11, 255, 0x12, 4, 0x13, 200])
+    rows, times = read_timestamped_rows(io.BytesIO(raw), 4, 8, 8)
+    assert rows_to_int(rows).tolist() == [0x10, 0x11, 0x12, 0x13]
+    assert times.tolist() == [0, 5, 10, 206]
+
+    vcd = io.StringIO()
+    signals = [("data", 8)]
+    write_vcd_fields(vcd, signals, unpack_fields(rows, signals), period=10, times=times)
+    assert "#2060" in vcd.getvalue()
+
+
+def test_write_vcd_scopes():
+    vcd = io.StringIO()
+    count = write_vcd_scopes(vcd, [
+        ("cpu", [("pc", 8)], [np.array([1, 2, 3, 4])], 2, None),
+        ("bus", [("data", 8)], [np.array([7, 8])], 0, None),
+    ], period=10)
+    assert count == 6
+
+    text = vcd.getvalue()
+    assert "$scope module cpu $end" in text
+    assert "$scope module bus $end" in text
+    # The bus trigger sample is aligned with the cpu one
+    times = [int(line[1:]) for line in text.splitlines() if line.startswith("#")]
+    assert times == sorted(times)
+    assert max(times) == 35
+
+    # Timestamped captures are aligned on the time of their trigger sample
+    vcd = io.StringIO()
+    write_vcd_scopes(vcd, [
+        ("cpu", [("pc", 8)], [np.array([1, 2, 3, 4])], 2, None),
+        ("bus", [("data", 8)], [np.array([7, 8])], 1, np.array([0, 5])),
+    ], period=10, clock=False)
+    times = [int(line[1:]) for line in vcd.getvalue().splitlines() if line.startswith("#")]
+    # The bus trigger is 5 periods after its first sample, the cpu one 2
+    assert times == [0, 30, 40, 50, 60]
+
+
+@pytest.mark.parametrize("signals", [
+    [("a", 3), ("b", 1), ("c", 12)],                # Up to 64 bits
+    [("a", 3), ("b", 70), ("c", 64), ("d", 1)],     # Wider
+])
+def test_unpack_fields(signals):
+    rng = np.random.default_rng(0)
+    width = sum(w for _, w in signals)
+    samples = [int(rng.integers(0, 2**32)) | int(rng.integers(0, 2**32)) << 32 |
+               int(rng.integers(0, 2**32)) << 64 | int(rng.integers(0, 2**32)) << 96
+               for _ in range(50)]
+    samples = [v & ((1 << width) - 1) for v in samples]
+
+    nbytes = (width + 7) // 8
+    raw = b"".join(v.to_bytes(nbytes, "little") for v in samples)
+    rows = read_rows(io.BytesIO(raw), len(samples), nbytes)
+    fields = unpack_fields(rows, signals)
+
+    offset = 0
+    for (_, w), values in zip(signals, fields):
+        assert [int(v) for v in values] == \
+            [extract_signal_value(v, offset, w) for v in samples]
+        offset += w
+
+
+def test_write_vcd_fields():
+    signals = [("data", 8), ("valid", 1)]
+    samples = [0x100, 0x101, 0x101, 0x005, 0x005, 0x005, 0x106]
+    rows = np.array([[v & 0xff, v >> 8] for v in samples], dtype=np.uint8)
+
+    def changes(text):
+        # Value changes per time, without the clock
+        ids = {}
+        out = set()
+        now = 0
+        for line in text.splitlines():
+            if line.startswith("$var"):
+                parts = line.split()
+                ids[parts[3]] = parts[4]
+            elif line.startswith("#"):
+                now = int(line[1:])
+            elif line and line[0] in "01b" and ids:
+                value, ident = line.split() if " " in line else (line[0], line[1:])
+                if ids.get(ident) != "clk":
+                    out.add((now, ids[ident], value))
+        return out
+
+    vcd = io.StringIO()
+    assert write_vcd_fields(vcd, signals, unpack_fields(rows, signals),
+                            trigger=2, period=10) == len(samples)
+    assert changes(vcd.getvalue()) == {
+        (0, "trigger", "0"), (20, "trigger", "1"), (30, "trigger", "0"),
+        (0, "data", "b0"), (10, "data", "b1"), (30, "data", "b101"), (60, "data", "b110"),
+        (0, "valid", "1"), (30, "valid", "0"), (60, "valid", "1"),
+    }
+    assert "clk" not in vcd.getvalue()
+
+    # Same changes from the packed values
+    expected = io.StringIO()
+    write_vcd(expected, signals, samples, trigger=2, period=10)
+    assert changes(expected.getvalue()) == changes(vcd.getvalue())
+
+
+def test_read_header():
+    signals = [("scl", 1), ("sda", 1), ("data", 80)]
+    data = (b"ILA1" + bytes([0x03])
+            + (1024).to_bytes(4, "little") + (100).to_bytes(4, "little")
+            + (48_000_000).to_bytes(4, "little") + (4).to_bytes(2, "little")
+            + bytes([16, 32, len(signals)]))
+    for name, width in signals:
+        data += width.to_bytes(2, "little") + bytes([len(name)]) + name.encode()
+
+    header = read_header(io.BytesIO(data))
+    assert header == ILAHeader(signals=signals, depth=1024, pre_trigger=100,
+                               clk_freq=48_000_000, decimation=4,
+                               rle_width=16, timestamp_width=32)
+
+    with pytest.raises(ValueError):
+        read_header(io.BytesIO(b"VCD0" + data[4:]))
+
+
+class FakePort:
+    """ Replays a capture, records the commands. """
+    def __init__(self, data):
+        self.data = io.BytesIO(data)
+        self.written = bytearray()
+
+    def read(self, length):
+        return self.data.read(length)
+
+    def write(self, data):
+        self.written += data
+
+
+def test_main(tmp_path):
+    samples = [0x21, 0x43, 0x65, 0x87]
+    signals = [("a", 4), ("b", 4)]
+
+    # Commands sent before the capture
+    port = FakePort(bytes(samples))
+    vcd = tmp_path / "capture.vcd"
+    assert main(["port", str(vcd), "--layout", "a:4,b:4", "--depth", "4",
+                 "--arm", "--trigger", "value=0x21,mask=0xff"], port=port) == 0
+    config = encode_trigger([{"value": 0x21, "mask": 0xff}], 8)
+    assert port.written == bytes([CMD_TRIGGER, len(config)]) + config + bytes([CMD_ARM])
+
+    expected = io.StringIO()
+    rows = np.array(samples, dtype=np.uint8).reshape(-1, 1)
+    write_vcd_fields(expected, signals, unpack_fields(rows, signals),
+                     period=1000000, timescale="1 ps")
+    strip = lambda text: text[text.index("$timescale"):]
+    assert strip(vcd.read_text()) == strip(expected.getvalue())
+
+    # Hub of two ILAs, one directory each
+    data = bytes([1, 0xaa, 0xbb, 0, 0x21, 0x43])
+    assert main(["port", str(tmp_path / "hub"), "--format", "npy",
+                 "--ila", "x", "2", "1", "a:4,b:4", "--ila", "y", "2", "0", "v:8"],
+                port=FakePort(data)) == 0
+    x = load_capture(str(tmp_path / "hub" / "x"))
+    assert [int(v) for v in x["b"]] == [2, 4] and x.trigger == 1
+    y = load_capture(str(tmp_path / "hub" / "y"))
+    assert [int(v) for v in y["v"]] == [0xaa, 0xbb]
+
+    # Incomplete capture, bad options
+    assert main(["port", str(vcd), "--layout", "a:8", "--depth", "8"],
+                port=FakePort(bytes(4))) == 0
+    assert main(["port", str(vcd), "--ila", "x", "2", "1", "a:8", "rle=8,bad=1"],
+                port=FakePort(b"")) == 1
@@ -0,0 +1,167 @@
+# 2026 - LambdaConcept - po@lambdaconcept.com
+
+from amaranth import *
+from amaranth.lib.io import Pin
+from amaranth.sim import Passive
+
+from lambdalib.interface import stream
+
+from lambdalib.cores.i2c.i2c import i2c_timing
+from lambdalib.cores.i2c.proto import *
+from lambdalib.cores.i2c.sim import *
+from lambdalib.software.i2c.bus import *
+from lambdalib.software.i2c.bus import HEADER_CONFIG, STATUS_OK, STATUS_ERR
+from lambdalib.software.sim import *
+
+
+class I2C_Pins:
+    def __init__(self):
+        self.scl = Pin(1, dir="io")
+        self.sda = Pin(1, dir="io")
+
+
+def make_device(programmable=False, **kwargs):
+    pins = I2C_Pins()
+    dut = I2CProto(4e6, i2c_pins=pins, i2c_freq=400e3, programmable=programmable)
+    target = I2CTargetSim(pins, 0x50)
+    dev = SimStreamDevice(dut, processes=[target], **kwargs)
+    return dev, target
+
+
+def test_sim_device_i2c_bus():
+    dev, target = make_device(timeout=100000)
+    bus = I2CBus(dev)
+
+    assert bus.write_block_data(0x50, 0x10, [0xde, 0xad, 0xbe, 0xef]) == 4
+    assert target.regs[0x10:0x14] == [0xde, 0xad, 0xbe, 0xef]
+
+    bus.write_byte_data(0x50, 0x20, 0x5a)
+    assert bus.read_byte_data(0x50, 0x20) == 0x5a
+    assert list(bus.read_block_data(0x50, 0x10, 4)) == [0xde, 0xad, 0xbe, 0xef]
+
+    # No device at this address
+    assert bus.write_byte_data(0x51, 0x00, 0x00) is None
+    assert bus.read_block_data(0x51, 0x00, 1) is None
+
+
+def test_sim_device_i2c_timing():
+    dev, target = make_device(programmable=True, timeout=100000)
+    bus = I2CBus(dev)
+
+    def transfer_cycles():
+        start = dev.cycles
+        bus.write_byte_data(0x50, 0x20, 0x5a)
+        assert bus.read_byte_data(0x50, 0x20) == 0x5a
+        return dev.cycles - start
+
+    fast = transfer_cycles()
+
+    # Slow the bus down 4 times
+    assert bus.set_timing(40, 20)
+    slow = transfer_cycles()
+    assert slow > 2 * fast
+
+    # Invalid low times are rejected
+    assert not bus.set_timing(40, 0)
+    assert not bus.set_timing(40, 40)
+    assert transfer_cycles() > 2 * fast
+
+
+class I2CConditions:
+    """Counts the start and stop conditions on the bus."""
+    def __init__(self, pins):
+        self.pins = pins
+        self.starts = 0
+        self.stops = 0
+
+    def sync_process(self):
+        yield Passive()
+        prev_scl = prev_sda = 1
+        while True:
+            scl = yield self.pins.scl.i
+            sda = yield self.pins.sda.i
+            if scl and prev_scl and prev_sda != sda:
+                if sda:
+                    self.stops += 1
+                else:
+                    self.starts += 1
+            prev_scl, prev_sda = scl, sda
+            yield
+
+
+def test_sim_device_i2c_write_read():
+    pins = I2C_Pins()
+    dut = I2CProto(4e6, i2c_pins=pins, i2c_freq=400e3)
+    target = I2CTargetSim(pins, 0x50, regs=list(range(256)))
+    conditions = I2CConditions(pins)
+    dev = SimStreamDevice(dut, processes=[target, conditions], timeout=100000)
+
+    # Separate write and read transactions by default
+    bus = I2CBus(dev)
+    assert list(bus.read_block_data(0x50, 0x10, 4)) == [0x10, 0x11, 0x12, 0x13]
+    dev.run(100)
+    assert (conditions.starts, conditions.stops) == (2, 2)
+
+    # Register address, repeated start and read, with a single STOP
+    bus = I2CBus(dev, repeated_start=True)
+    assert list(bus.read_block_data(0x50, 0x10, 4)) == [0x10, 0x11, 0x12, 0x13]
+    dev.run(100)
+    assert (conditions.starts, conditions.stops) == (4, 3)
+
+    # Absent device, then the bus is still usable
+    assert bus.read_block_data(0x51, 0x10, 4) is None
+    assert bus.read_byte_data(0x50, 0x20) == 0x20
+
+
+def test_sim_device_i2c_config():
+    dev, target = make_device(programmable=True, timeout=100000)
+    bus = I2CBus(dev)
+
+    # Hs-mode keys are accepted, only the Fast-mode timing is applied
+    assert bus.set_timing(**i2c_timing(16e6, "high-speed"))
+    bus.write_byte_data(0x50, 0x20, 0x5a)
+    assert bus.read_byte_data(0x50, 0x20) == 0x5a
+
+    # Raw commands: a wrong length is drained and rejected
+    dev.write(bytes([HEADER_CONFIG, 3, 40, 0, 20]))
+    assert dev.read(1) == bytes([STATUS_ERR])
+    dev.write(bytes([HEADER_CONFIG, 4, 40, 0, 20, 0]))
+    assert dev.read(1) == bytes([STATUS_OK])
+
+    # Low time out of [1, period - 1]
+    dev.write(bytes([HEADER_CONFIG, 4, 40, 0, 0, 0]))
+    assert dev.read(1) == bytes([STATUS_ERR])
+    dev.write(bytes([HEADER_CONFIG, 4, 40, 0, 40, 0]))
+    assert dev.read(1) == bytes([STATUS_ERR])
+
+    assert bus.read_byte_data(0x50, 0x20) == 0x5a
+
+    # Without the timing registers, the configuration is not supported
+    dev, target = make_device(timeout=100000)
+    bus = I2CBus(dev)
+    assert not bus.set_timing(40, 20)
+    bus.write_byte_data(0x50, 0x20, 0xa5)
+    assert bus.read_byte_data(0x50, 0x20) == 0xa5
+
+
+def test_sim_device_threaded():
+    dev, target = make_device(threaded=True, timeout=10, speed=0.5, seed=1)
+    with dev:
+        bus = I2CBus(dev)
+        bus.write_block_data(0x50, 0x00, [1, 2, 3])
+        assert list(bus.read_block_data(0x50, 0x00, 3)) == [1, 2, 3]
+    assert dev.cycles > 0
+
+
+def test_sim_device_timeout():
+    dev, target = make_device(timeout=1000)
+    # Nothing written, nothing to read
+    assert dev.read(1) == b""
+
+
+def test_sim_device_throughput():
+    # One byte per cycle at full speed
+    dev = SimStreamDevice(stream.SyncFIFO([("data", 8)], 8), timeout=1000)
+    dev.write(bytes(range(64)))
+    assert dev.read(64) == bytes(range(64))
+    assert dev.cycles <= 64 + 4